@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Arrow IPC 数据交换
+功能：
+1. 价格面板、动量分数矩阵、回测结果写成 Arrow IPC 文件（即 Feather v2，扩展名 .arrow），
+   不压缩，数值列按 Arrow 的内存布局原样落盘
+2. 读取时通过内存映射（memory map）打开文件：不解析文本、不复制数据，
+   Jupyter 和多个并行进程可以同时挂载同一份文件，物理内存中只有一份（操作系统页缓存）
+3. 股票代码、股票名称等重复字符串存为字典编码列（读回为 pandas 分类类型），文件更小
+4. 命令行：把现有的CSV输出一次性转换为 .arrow 文件
+
+   python arrow_exchange.py
+
+需要 pyarrow；未安装时各脚本照常只输出CSV。
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from date_utils import parse_dates
+
+ARROW_DIR = '../data/arrow'
+CATEGORY_COLUMNS = ['股票代码', '股票名称', 'stock_code', 'stock_name', '行业']
+
+
+def arrow_available():
+    """是否安装了 pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def write_arrow(df, path, categories=CATEGORY_COLUMNS):
+    """
+    把DataFrame写成未压缩的 Arrow IPC 文件（先写临时文件再重命名，读取方不会看到写了一半的文件）
+
+    Parameters:
+    df: DataFrame, 非默认的行索引（如日期索引）一并保存，读回时还原
+    path: str, 输出路径
+    categories: list, 需要字典编码的字符串列
+
+    Returns:
+    str: 输出路径
+    """
+    import pyarrow as pa
+
+    frame = df.copy(deep=False)
+    for col in categories:
+        if col in frame.columns and pd.api.types.is_string_dtype(frame[col].dtype):
+            frame[col] = frame[col].astype('category')
+    table = pa.Table.from_pandas(frame)
+
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_arrow(path, columns=None):
+    """
+    以内存映射方式打开 Arrow IPC 文件，返回 pyarrow.Table（数据仍在映射的文件页中，没有复制）
+
+    Parameters:
+    path: str, 文件路径
+    columns: list, 只取部分列
+    """
+    import pyarrow as pa
+
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def read_arrow(path, columns=None):
+    """
+    内存映射读取 Arrow IPC 文件并转换为DataFrame
+
+    split_blocks=True 时没有缺失值的数值列直接引用映射内存，不合并成二维块，转换几乎不复制数据。
+
+    Returns:
+    DataFrame: 与写入时相同的列、类型和行索引
+    """
+    return open_arrow(path, columns).to_pandas(split_blocks=True)
+
+
+def score_matrix(momentum_scores, value='动量分数'):
+    """
+    把每个调仓日的动量分数表整理为 日期 × 股票代码 的矩阵
+
+    Parameters:
+    momentum_scores: dict, 日期 -> calculate_momentum_score 的结果（MomentumBacktest.momentum_scores）
+    value: str, 取值的列
+
+    Returns:
+    DataFrame: 行为日期，列为股票代码，不在当期股票池中的为NaN
+    """
+    frames = [scores[['股票代码', value]].assign(日期=pd.Timestamp(date))
+              for date, scores in momentum_scores.items() if len(scores) > 0]
+    if not frames:
+        return pd.DataFrame()
+    long = pd.concat(frames, ignore_index=True)
+    matrix = long.pivot(index='日期', columns='股票代码', values=value).sort_index()
+    matrix.columns = matrix.columns.astype(str)
+    matrix.columns.name = None
+    return matrix
+
+
+def export_backtest(backtest, output_dir=ARROW_DIR, prefix='momentum'):
+    """
+    导出回测对象已加载的价格面板、动量分数矩阵和回测结果
+
+    Parameters:
+    backtest: MomentumBacktest, 已运行 run_backtest 的回测对象
+    output_dir: str, 输出目录
+    prefix: str, 文件名前缀
+
+    Returns:
+    dict: 名称 -> 输出路径
+    """
+    paths = {}
+    if backtest.df is not None:
+        paths['price_panel'] = write_arrow(backtest.df, os.path.join(output_dir, f'{prefix}_price_panel.arrow'))
+    if backtest.momentum_scores:
+        paths['score_matrix'] = write_arrow(score_matrix(backtest.momentum_scores),
+                                            os.path.join(output_dir, f'{prefix}_score_matrix.arrow'))
+    if backtest.portfolio_returns:
+        portfolio_df = pd.DataFrame(backtest.portfolio_returns)
+        portfolio_df['cumulative_return'] = (1 + portfolio_df['portfolio_return'] / 100).cumprod() - 1
+        paths['backtest_results'] = write_arrow(portfolio_df,
+                                                os.path.join(output_dir, f'{prefix}_backtest_results.arrow'))
+    if backtest.quantile_returns is not None:
+        paths['quantile_returns'] = write_arrow(backtest.quantile_returns,
+                                                os.path.join(output_dir, f'{prefix}_quantile_returns.arrow'))
+    if backtest.risk_report is not None:
+        paths['risk_report'] = write_arrow(backtest.risk_report,
+                                           os.path.join(output_dir, f'{prefix}_risk_report.arrow'))
+    return paths
+
+
+def convert_csv(csv_path, arrow_path, date_columns=(), index_col=None, code_columns=('股票代码',)):
+    """
+    把一个CSV输出转换为 Arrow IPC 文件
+
+    Parameters:
+    date_columns: tuple, 需要解析为日期的列
+    index_col: str, 作为行索引的列（如 nvda_analysis_results.csv 的 Date）
+    code_columns: tuple, 需要补齐为6位字符串的股票代码列
+    """
+    df = pd.read_csv(csv_path, dtype={c: str for c in code_columns})
+    for col in code_columns:
+        if col in df.columns:
+            df[col] = df[col].str.zfill(6)
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    if index_col is not None:
+        df = df.set_index(index_col)
+    return write_arrow(df, arrow_path)
+
+
+def main():
+    """把现有的CSV输出转换为 Arrow IPC 文件，并比较两种读取方式的耗时"""
+    print("Arrow IPC 数据交换")
+    print("=" * 50)
+
+    if not arrow_available():
+        print("未安装 pyarrow，无法导出 Arrow 文件")
+        return
+
+    conversions = [
+        ('../data/hs300_stock_data.csv', 'hs300_stock_data.arrow', ('日期',), None),
+        ('../data/momentum_scores.csv', 'momentum_scores.arrow', (), None),
+        ('../data/momentum_backtest_results.csv', 'momentum_backtest_results.arrow', ('date',), None),
+        ('../data/nvda_analysis_results.csv', 'nvda_analysis_results.arrow', ('Date',), 'Date'),
+    ]
+    for csv_path, file_name, date_columns, index_col in conversions:
+        if not os.path.exists(csv_path):
+            print(f"跳过不存在的文件: {csv_path}")
+            continue
+        arrow_path = convert_csv(csv_path, os.path.join(ARROW_DIR, file_name), date_columns, index_col)
+
+        start = time.perf_counter()
+        pd.read_csv(csv_path)
+        csv_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        frame = read_arrow(arrow_path)
+        arrow_seconds = time.perf_counter() - start
+
+        print(f"{arrow_path}: {len(frame)} 行，CSV读取 {csv_seconds * 1000:.1f} ms，"
+              f"内存映射读取 {arrow_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,57 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-def calculate_momentum_scores():
-    """计算沪深300成分股的动量分数"""
+from score_snapshots import ScoreSnapshotStore
+from arrow_exchange import ARROW_DIR, arrow_available, write_arrow
+from date_utils import parse_dates
+from data_quality import validate_history, clean_history, print_summary
+from lookback_index import LookbackIndex, LOOKBACK_MODES, CALENDAR_PERIODS, TRADING_DAY_PERIODS, percentile_scores
+
+def score_latest(df, lookback='calendar', max_gap=None, codes=None):
+    """
+    在最新交易日对全部股票打分（只保留最新交易日有交易的股票）
+    
+    Parameters:
+    df: DataFrame, 长格式历史数据（日期已解析，股票代码已补齐为6位）
+    lookback: str, 回看方式：calendar / trading
+    max_gap: int, trading 模式下回看窗口内允许的最多停牌交易日数
+    codes: list, 只对这些股票打分（None 表示全部）
+    
+    Returns:
+    DataFrame: 各周期收益率、百分位值和动量分数，按动量分数降序
+    """
+    latest_date = df['日期'].max()
+    periods = [name for name, _ in LOOKBACK_MODES[lookback]]
+    
+    # 为每只股票计算收益率：在 (股票代码, 日期) 有序数组上批量定位回看行号
+    index = LookbackIndex(df)
+    result_df = index.lookback_returns(latest_date, mode=lookback, codes=codes, max_gap=max_gap)
+    # 只保留最新日期有交易的股票
+    result_df = result_df[result_df['最新交易日'] == latest_date].drop(columns=['最新交易日'])
+    if lookback == 'calendar':
+        result_df = result_df.drop(columns=['停牌天数'])
+    result_df = result_df.reset_index(drop=True)
+    
+    # 计算百分位值和动量分数（百分位值的平均值），按动量分数排序
+    result_df = percentile_scores(result_df, periods)
+    return result_df.sort_values('动量分数', ascending=False)
+
+def calculate_momentum_scores(lookback='calendar', max_gap=None):
+    """
+    计算沪深300成分股的动量分数
+    
+    Parameters:
+    lookback: str, 回看方式：calendar（30/90/180/365个自然日）/ trading（21/63/126/252个交易日）
+    max_gap: int, trading 模式下回看窗口内允许的最多停牌交易日数
+    """
     
     # 读取数据文件
     print("正在读取数据文件...")
@@ -25,110 +68,38 @@ def calculate_momentum_scores():
     df['股票代码'] = df['股票代码'].astype(str).str.zfill(6)
     
     # 确保日期列是datetime类型
-    df['日期'] = pd.to_datetime(df['日期'])
+    df['日期'] = parse_dates(df['日期'])
+    
+    # 数据质量检查，去掉重复行和价格非正的行
+    print_summary(validate_history(df))
+    df = clean_history(df)
     
     # 获取最新的日期
     latest_date = df['日期'].max()
     print(f"数据最新日期: {latest_date}")
     
-    # 计算各个时间段的起始日期
-    one_month_ago = latest_date - timedelta(days=30)
-    three_months_ago = latest_date - timedelta(days=90)
-    six_months_ago = latest_date - timedelta(days=180)
-    twelve_months_ago = latest_date - timedelta(days=365)
-    
-    print(f"计算时间点:")
-    print(f"  1个月前: {one_month_ago}")
-    print(f"  3个月前: {three_months_ago}")
-    print(f"  6个月前: {six_months_ago}")
-    print(f"  12个月前: {twelve_months_ago}")
-    
-    # 为每只股票计算收益率
-    results = []
-    
-    for stock_code in df['股票代码'].unique():
-        stock_data = df[df['股票代码'] == stock_code].copy()
-        stock_data = stock_data.sort_values('日期')
-        
-        # 获取股票名称
-        stock_name = stock_data['股票名称'].iloc[0]
-        
-        # 获取各个时间点的收盘价
-        try:
-            # 最新收盘价
-            latest_close = stock_data[stock_data['日期'] == latest_date]['收盘'].values[0]
-            
-            # 1个月前收盘价（找最接近的日期）
-            one_month_data = stock_data[stock_data['日期'] <= one_month_ago]
-            if len(one_month_data) > 0:
-                one_month_close = one_month_data.iloc[-1]['收盘']
-                one_month_return = (latest_close / one_month_close - 1) * 100
-            else:
-                one_month_return = np.nan
-            
-            # 3个月前收盘价
-            three_months_data = stock_data[stock_data['日期'] <= three_months_ago]
-            if len(three_months_data) > 0:
-                three_months_close = three_months_data.iloc[-1]['收盘']
-                three_months_return = (latest_close / three_months_close - 1) * 100
-            else:
-                three_months_return = np.nan
-            
-            # 6个月前收盘价
-            six_months_data = stock_data[stock_data['日期'] <= six_months_ago]
-            if len(six_months_data) > 0:
-                six_months_close = six_months_data.iloc[-1]['收盘']
-                six_months_return = (latest_close / six_months_close - 1) * 100
-            else:
-                six_months_return = np.nan
-            
-            # 12个月前收盘价
-            twelve_months_data = stock_data[stock_data['日期'] <= twelve_months_ago]
-            if len(twelve_months_data) > 0:
-                twelve_months_close = twelve_months_data.iloc[-1]['收盘']
-                twelve_months_return = (latest_close / twelve_months_close - 1) * 100
-            else:
-                twelve_months_return = np.nan
-            
-            results.append({
-                '股票代码': stock_code,
-                '股票名称': stock_name,
-                '1个月收益率': one_month_return,
-                '3个月收益率': three_months_return,
-                '6个月收益率': six_months_return,
-                '12个月收益率': twelve_months_return
-            })
-            
-        except (IndexError, ValueError):
-            continue
-    
-    # 创建结果DataFrame
-    result_df = pd.DataFrame(results)
-    
-    # 计算百分位值
-    periods = ['1个月收益率', '3个月收益率', '6个月收益率', '12个月收益率']
-    
-    for period in periods:
-        # 计算该周期的百分位值
-        valid_returns = result_df[period].dropna()
-        if len(valid_returns) > 0:
-            result_df[f'{period}百分位值'] = result_df[period].apply(
-                lambda x: (valid_returns <= x).mean() * 100 if pd.notna(x) else np.nan
-            )
-        else:
-            result_df[f'{period}百分位值'] = np.nan
-    
-    # 计算动量分数（百分位值的平均值）
-    percentile_cols = [f'{period}百分位值' for period in periods]
-    result_df['动量分数'] = result_df[percentile_cols].mean(axis=1)
-    
-    # 按动量分数排序
-    result_df = result_df.sort_values('动量分数', ascending=False)
+    if lookback == 'calendar':
+        print(f"计算时间点:")
+        for name, days in CALENDAR_PERIODS:
+            print(f"  {name[:-3]}前: {latest_date - timedelta(days=days)}")
+    else:
+        print("回看方式: 交易日偏移（" + "/".join(str(n) for _, n in TRADING_DAY_PERIODS) + " 个交易日）")
+    
+    # 计算各周期收益率、百分位值和动量分数，按动量分数排序
+    result_df = score_latest(df, lookback, max_gap)
     
     # 保存结果到CSV文件
     output_file = '../data/momentum_scores.csv'
     result_df.to_csv(output_file, index=False, encoding='utf-8-sig')
     print(f"\n结果已保存到: {output_file}")
+    if arrow_available():
+        arrow_file = write_arrow(result_df, os.path.join(ARROW_DIR, 'momentum_scores.arrow'))
+        print(f"Arrow IPC 文件已保存到: {arrow_file}")
+    
+    # 追加到按日期分区的历史快照库（已有同日快照时不覆盖）
+    store = ScoreSnapshotStore('../data/score_snapshots')
+    if store.append(result_df, latest_date):
+        print(f"快照已追加到: {store.store_dir}（{latest_date.strftime('%Y-%m-%d')}）")
     
     # 打印结果
     print("\n动量分数排名前20的股票:")
@@ -150,4 +121,6 @@ def calculate_momentum_scores():
     return result_df
 
 if __name__ == "__main__":
-    calculate_momentum_scores()
+    # python calculate_momentum_score.py [calendar|trading] [最多停牌交易日数]
+    calculate_momentum_scores(sys.argv[1] if len(sys.argv) > 1 else 'calendar',
+                              int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回测检查点
+功能：
+1. 回测运行过程中定期把中间状态写入磁盘：已完成的调仓期（月收益率、净值）和每期持仓（股票、权重、收益率），
+   使用压缩的列式文件（有pyarrow时为Parquet，否则为gzip压缩CSV），每个文件先写临时文件再重命名；
+   每次只把上次写入之后新完成的调仓期追加为一个分块文件，写入量不随已完成期数增长
+2. 检查点记录回测配置和数据文件的指纹，配置或数据变化后旧检查点自动失效，不会混入不同条件下的结果
+3. 恢复时读回已完成的调仓期，回测只计算剩余的月份；参数扫描中已完成的配置直接从检查点读取汇总结果
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from results_writer import details_frame
+
+META_FILE = 'meta.json'
+
+
+def config_fingerprint(config, data_file=None):
+    """
+    回测配置指纹
+
+    Parameters:
+    config: dict, 影响回测结果的参数（需可JSON序列化）
+    data_file: str, 数据文件；其修改时间和大小一并计入，数据更新后指纹随之变化
+    """
+    payload = dict(config)
+    if data_file is not None and os.path.exists(data_file):
+        stat = os.stat(data_file)
+        payload['_data'] = [os.path.abspath(data_file), stat.st_mtime_ns, stat.st_size]
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class BacktestCheckpoint:
+    """
+    单个回测的检查点目录
+
+    Parameters:
+    path: str, 检查点目录
+    fingerprint: str, 配置指纹（config_fingerprint 的返回值）
+    fmt: str, 'parquet'（需要pyarrow）/ 'csv.gz'；None 表示自动选择
+
+    目录内容：meta.json（指纹、分块数、已完成期数、是否完成）、periods-00000.*（每期收益率）、
+    holdings-00000.*（每期持仓）…… 每次 flush 追加一对分块文件。
+    meta.json 最后写入，读取时只拼接其中记录的分块并按期数截断，中断在写分块和写 meta.json 之间时
+    多出的分块会被忽略（下次 flush 覆盖），读回的始终是一致的状态。
+    """
+
+    def __init__(self, path, fingerprint, fmt=None):
+        self.path = path
+        self.fingerprint = fingerprint
+        if fmt is None:
+            try:
+                import pyarrow  # noqa: F401
+                fmt = 'parquet'
+            except ImportError:
+                fmt = 'csv.gz'
+        self.fmt = fmt
+        self.periods = []
+        self.holdings = []
+        self.complete = False
+        # 已写入的分块数和其中的调仓期数
+        self.parts = 0
+        self.flushed = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name}.{self.fmt}')
+
+    def _write_table(self, frame, name):
+        tmp_path = self._file(name) + '.tmp'
+        if self.fmt == 'parquet':
+            frame.to_parquet(tmp_path, index=False, compression='zstd')
+        else:
+            frame.to_csv(tmp_path, index=False, compression='gzip', date_format='%Y-%m-%d')
+        os.replace(tmp_path, self._file(name))
+
+    @staticmethod
+    def _part_name(name, index):
+        return f'{name}-{index:05d}'
+
+    def _read_parts(self, name, parts):
+        """拼接前 parts 个分块"""
+        return pd.concat([self._read_table(self._part_name(name, i)) for i in range(parts)], ignore_index=True)
+
+    def _read_table(self, name):
+        if self.fmt == 'parquet':
+            return pd.read_parquet(self._file(name))
+        frame = pd.read_csv(self._file(name), compression='gzip', dtype={'stock_code': str}, parse_dates=['date'])
+        return frame
+
+    def _read_meta(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self):
+        """
+        读取检查点
+
+        Returns:
+        tuple: (每期收益率 DataFrame, 每期持仓 DataFrame)；没有可用检查点、指纹不一致或还没有完成任何调仓期时返回None
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        if (meta.get('fingerprint') != self.fingerprint or meta.get('format') != self.fmt
+                or 'parts' not in meta):
+            print(f"检查点 {self.path} 的配置或数据已变化，忽略旧检查点")
+            return None
+
+        completed = meta['completed']
+        if completed == 0:
+            # 没有任何调仓期（例如所选月份没有数据）：没有可恢复的内容，按全新回测处理
+            return None
+        parts = meta['parts']
+        periods = self._read_parts('periods', parts).head(completed)
+        holdings = self._read_parts('holdings', parts)
+        periods['date'] = pd.to_datetime(periods['date'])
+        holdings['date'] = pd.to_datetime(holdings['date'])
+        holdings = holdings[holdings['date'].isin(periods['date'])].reset_index(drop=True)
+
+        self.periods = periods.to_dict('records')
+        self.holdings = [group for _, group in holdings.groupby('date', sort=False)]
+        self.complete = bool(meta.get('complete')) and completed == len(self.periods)
+        self.parts = parts
+        self.flushed = len(self.periods)
+        return periods, holdings
+
+    def record(self, period, detail):
+        """
+        记录一个已完成的调仓期（只写内存，flush 时落盘）
+
+        Parameters:
+        period: dict, MomentumBacktest.portfolio_returns 中的一行
+        detail: dict, 该期持仓详情（stocks、returns、weights）
+        """
+        self.periods.append(dict(period))
+        self.holdings.append(details_frame(detail))
+
+    def flush(self, complete=False):
+        """把上次写入之后新记录的调仓期追加为一个分块文件，再更新 meta.json"""
+        os.makedirs(self.path, exist_ok=True)
+        if len(self.periods) > self.flushed:
+            self._write_table(pd.DataFrame(self.periods[self.flushed:]), self._part_name('periods', self.parts))
+            self._write_table(pd.concat(self.holdings[self.flushed:], ignore_index=True),
+                              self._part_name('holdings', self.parts))
+            self.parts += 1
+            self.flushed = len(self.periods)
+        self.complete = complete
+        meta = {'fingerprint': self.fingerprint, 'format': self.fmt, 'parts': self.parts,
+                'completed': len(self.periods), 'complete': complete}
+        tmp_path = os.path.join(self.path, META_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def clear(self):
+        """删除检查点目录"""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.periods = []
+        self.holdings = []
+        self.complete = False
+        self.parts = 0
+        self.flushed = 0
+
+
+def restore_details(holdings):
+    """
+    把检查点中的持仓表还原为回测使用的每期持仓详情字典
+
+    Parameters:
+    holdings: DataFrame, details_frame 格式的持仓表
+
+    Returns:
+    list: 每期一个 {year, month, date, stocks, returns, weights} 字典，按日期排序
+    """
+    details = []
+    for date, group in holdings.groupby('date', sort=True):
+        codes = group['stock_code'].astype(str).str.zfill(6).to_numpy()
+        valid = group['monthly_return'].notna().to_numpy()
+        details.append({
+            'year': int(group['year'].iloc[0]),
+            'month': int(group['month'].iloc[0]),
+            'date': pd.Timestamp(date),
+            'stocks': pd.DataFrame({
+                '股票代码': codes,
+                '股票名称': group['stock_name'].to_numpy(),
+                '动量分数': group['momentum_score'].to_numpy(),
+            }),
+            'returns': dict(zip(codes[valid], group['monthly_return'].to_numpy()[valid])),
+            'weights': dict(zip(codes, group['weight'].to_numpy())),
+        })
+    return details
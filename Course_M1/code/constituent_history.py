@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+指数成分股的时点（point-in-time）历史
+功能：
+1. 在本地保存成分股纳入/剔除日期表（每行一个区间：股票代码、纳入日期、剔除日期）
+2. 每次获取到最新成分股名单时，增量更新该表（新纳入的开区间、被剔除的关闭区间）
+3. 把区间表转换为 日期 × 股票 的布尔成分矩阵，回测时按调仓日直接取一行，
+   避免用今天的成分股名单回溯历史带来的幸存者偏差
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+MEMBERSHIP_COLUMNS = ['股票代码', '股票名称', '纳入日期', '剔除日期']
+
+
+def load_membership(file_path):
+    """读取成分股区间表，剔除日期为空表示目前仍是成分股"""
+    membership = pd.read_csv(file_path, dtype={'股票代码': str})
+    membership['股票代码'] = membership['股票代码'].str.zfill(6)
+    membership['纳入日期'] = pd.to_datetime(membership['纳入日期'], format='%Y-%m-%d')
+    membership['剔除日期'] = pd.to_datetime(membership['剔除日期'], format='%Y-%m-%d')
+    return membership
+
+
+def save_membership(membership, file_path):
+    """保存成分股区间表"""
+    out = membership[MEMBERSHIP_COLUMNS].sort_values(['纳入日期', '股票代码'])
+    out.to_csv(file_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+
+
+def record_snapshot(membership, constituents, snapshot_date, default_start=None):
+    """
+    用某一天的成分股名单更新区间表
+
+    Parameters:
+    membership: DataFrame or None, 现有区间表
+    constituents: DataFrame, 成分股名单（成分券代码、成分券名称，可选 纳入日期）
+    snapshot_date: str or datetime, 名单生效日期
+    default_start: str or datetime, 首次建表时缺少纳入日期的成分股使用的纳入日期
+
+    Returns:
+    DataFrame: 更新后的区间表
+
+    首次建表只能得到当前成分股的区间：首个快照之前已被剔除的股票不在表中，
+    缺少纳入日期的股票只能回溯到 default_start，这两部分都不是真实的时点数据，建表时会给出警告。
+    之后每次快照记录的纳入、剔除才是真实的时点变动。
+    """
+    snapshot_date = pd.Timestamp(snapshot_date).normalize()
+    current = pd.DataFrame({
+        '股票代码': constituents['成分券代码'].astype(str).str.zfill(6).to_numpy(),
+        '股票名称': constituents['成分券名称'].to_numpy(),
+    })
+
+    if membership is None or len(membership) == 0:
+        if '纳入日期' in constituents.columns:
+            start = pd.Series(pd.to_datetime(constituents['纳入日期'], errors='coerce').to_numpy())
+        else:
+            start = pd.Series(pd.NaT, index=current.index)
+        missing = start.isna()
+        fallback = pd.Timestamp(default_start or snapshot_date)
+        if missing.any():
+            print(f"警告：{int(missing.sum())} 只成分股缺少纳入日期，纳入日期按 {fallback.strftime('%Y-%m-%d')} 处理，"
+                  f"该日期至 {snapshot_date.strftime('%Y-%m-%d')} 之间这些股票的成分状态不是时点数据")
+        print(f"警告：首次建立成分股区间表，{snapshot_date.strftime('%Y-%m-%d')} 之前已被剔除的股票不在表中，"
+              f"该日期之前的回测仍存在幸存者偏差；此后每次更新会记录真实的纳入和剔除")
+        current['纳入日期'] = start.fillna(fallback).to_numpy()
+        current['剔除日期'] = pd.NaT
+        return current[MEMBERSHIP_COLUMNS]
+
+    membership = membership.copy()
+    open_rows = membership['剔除日期'].isna()
+    open_codes = set(membership.loc[open_rows, '股票代码'])
+    current_codes = set(current['股票代码'])
+
+    # 被剔除：关闭区间；新纳入：追加开区间
+    removed = open_rows & ~membership['股票代码'].isin(current_codes)
+    membership.loc[removed, '剔除日期'] = snapshot_date
+
+    added = current[~current['股票代码'].isin(open_codes)].copy()
+    added['纳入日期'] = snapshot_date
+    added['剔除日期'] = pd.NaT
+
+    print(f"成分股变动: 纳入 {len(added)} 只，剔除 {int(removed.sum())} 只")
+    return pd.concat([membership, added[MEMBERSHIP_COLUMNS]], ignore_index=True)
+
+
+def members_between(membership, start_date, end_date):
+    """返回在 [start_date, end_date] 期间任一时点属于指数的股票（代码、名称）"""
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    overlap = (membership['纳入日期'] <= end_date) & \
+              (membership['剔除日期'].isna() | (membership['剔除日期'] > start_date))
+    return membership.loc[overlap, ['股票代码', '股票名称']].drop_duplicates('股票代码')
+
+
+class MembershipMask:
+    """
+    日期 × 股票 的布尔成分矩阵
+
+    Parameters:
+    membership: DataFrame, 成分股区间表
+    dates: array-like, 交易日（升序）
+    codes: array-like, 股票代码（矩阵列顺序）
+
+    纳入日期当天起算为成分股，剔除日期当天起不再是成分股。
+    """
+
+    def __init__(self, membership, dates, codes):
+        self.dates = pd.DatetimeIndex(dates).sort_values()
+        self.codes = pd.Index(codes)
+
+        col = self.codes.get_indexer(membership['股票代码'])
+        keep = col >= 0
+        col = col[keep]
+        start = self.dates.searchsorted(membership.loc[keep, '纳入日期'].to_numpy(), side='left')
+        removal = membership.loc[keep, '剔除日期']
+        has_end = removal.notna().to_numpy()
+        end = np.full(len(col), len(self.dates))
+        end[has_end] = self.dates.searchsorted(removal[has_end].to_numpy(), side='left')
+
+        # 差分数组：区间起点 +1、终点 -1，按日期累加即得到每天的成分状态
+        diff = np.zeros((len(self.dates) + 1, len(self.codes)), dtype=np.int32)
+        np.add.at(diff, (start, col), 1)
+        np.add.at(diff, (end, col), -1)
+        self.matrix = np.cumsum(diff[:-1], axis=0) > 0
+
+    def row(self, date):
+        """指定日期（或之前最近一个交易日）的成分状态，与 codes 对齐的布尔数组"""
+        pos = self.dates.searchsorted(pd.Timestamp(date), side='right') - 1
+        if pos < 0:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.matrix[pos]
+
+    def members(self, date):
+        """指定日期的成分股代码数组"""
+        return self.codes[self.row(date)].to_numpy()
+
+    def frame(self):
+        """以DataFrame形式返回完整成分矩阵"""
+        return pd.DataFrame(self.matrix, index=self.dates, columns=self.codes)
+
+
+def main(universe='hs300'):
+    """用最新成分股名单更新本地区间表"""
+    import akshare as ak
+    from universes import get_universe, universe_files
+
+    config = get_universe(universe)
+    if config['index'] is None:
+        print(f"{config['名称']}没有对应的指数成分股接口，请使用 get_hs300_data.py {universe} 更新")
+        return
+
+    membership_file = universe_files(universe)['membership']
+    print(f"正在获取{config['名称']}成分股（含纳入日期）...")
+    cons = ak.index_stock_cons(symbol=config['index'])
+    cons = cons.rename(columns={'品种代码': '成分券代码', '品种名称': '成分券名称'})
+
+    membership = load_membership(membership_file) if os.path.exists(membership_file) else None
+    membership = record_snapshot(membership, cons, pd.Timestamp.today())
+    save_membership(membership, membership_file)
+    print(f"成分股区间表已保存到 {membership_file}，共 {len(membership)} 条记录")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else 'hs300')
@@ -1,64 +1,69 @@
 import pandas as pd
 import numpy as np
 
+from portfolio_allocation import build_allocation, allocation_summary
+from date_utils import parse_dates
+
+# 投资组合参数
+TOTAL_CAPITAL = 3000000   # 总投资金额（元）
+TOP_N = 30                # 持有动量分数前N名
+LOT_SIZE = 100            # 每手股数
+TARGET_MONTH = '2025-08'  # 以该月最后一个交易日的开盘价建仓
+
+
+def load_indexed_prices(file_path):
+    """读取历史行情，并建立 (日期, 股票代码) 有序索引，便于按日期一次取出横截面"""
+    stock_data = pd.read_csv(file_path, usecols=['日期', '股票代码', '股票名称', '开盘', '收盘'],
+                             dtype={'股票代码': str})
+    stock_data['股票代码'] = stock_data['股票代码'].str.zfill(6)
+    stock_data['日期'] = parse_dates(stock_data['日期'])
+    return stock_data.set_index(['日期', '股票代码']).sort_index()
+
+
+def last_trading_day_of_month(indexed_prices, month):
+    """在有序日期索引上二分查找指定月份的最后一个交易日"""
+    dates = indexed_prices.index.get_level_values('日期')
+    month_end = pd.Period(month, freq='M').end_time
+    pos = dates.searchsorted(month_end, side='right') - 1
+    if pos < 0 or dates[pos].strftime('%Y-%m') != month:
+        return None
+    return dates[pos]
+
+
 # 读取动量分值文件
-momentum_scores = pd.read_csv('../data/momentum_scores.csv')
+momentum_scores = pd.read_csv('../data/momentum_scores.csv', dtype={'股票代码': str})
+momentum_scores['股票代码'] = momentum_scores['股票代码'].str.zfill(6)
 # 按动量分数降序排序，取前30名
-top_30_stocks = momentum_scores.sort_values('动量分数', ascending=False).head(30)
-
-# 读取股票数据文件，指定数据类型
-stock_data = pd.read_csv('../data/hs300_stock_data.csv', header=None, dtype={1: str})
-
-# 设置列名（根据数据格式推断）
-# 从之前查看的数据来看，列应该是：日期,股票代码,开盘价,收盘价,最高价,最低价,成交量,成交额,涨跌幅,换手率,振幅,量比,股票名称
-stock_data.columns = ['date', 'stock_code', 'open', 'close', 'high', 'low', 'volume', 'amount', 
-                     'pct_change', 'turnover_rate', 'amplitude', 'volume_ratio', 'stock_name']
-
-# 转换价格列为数值类型
-stock_data['open'] = pd.to_numeric(stock_data['open'], errors='coerce')
-stock_data['close'] = pd.to_numeric(stock_data['close'], errors='coerce')
-stock_data['high'] = pd.to_numeric(stock_data['high'], errors='coerce')
-stock_data['low'] = pd.to_numeric(stock_data['low'], errors='coerce')
-
-# 获取2025年8月最后一个交易日的数据
-august_2025_data = stock_data[stock_data['date'].str.startswith('2025-08')]
-last_trading_day = august_2025_data['date'].max()
-
-print(f"2025年8月最后一个交易日: {last_trading_day}")
-
-# 获取最后交易日的所有股票数据
-last_day_data = stock_data[stock_data['date'] == last_trading_day]
-
-# 为前30只股票查找开盘价
-portfolio_data = []
-for _, stock in top_30_stocks.iterrows():
-    stock_code = str(stock['股票代码']).zfill(6)  # 确保股票代码是6位
-    stock_name = stock['股票名称']
-    
-    # 在最后交易日数据中查找该股票
-    stock_info = last_day_data[last_day_data['stock_code'] == stock_code]
-    
-    if not stock_info.empty:
-        open_price = stock_info['open'].iloc[0]
-        # 计算购买股数（100000元 / 开盘价，向下取整）- 每只股票投资10万元
-        shares = int(100000 / open_price)
-        portfolio_data.append({
-            '股票代码': stock_code,
-            '股票名称': stock_name,
-            '开盘价': open_price,
-            '购买股数': shares,
-            '投资金额': shares * open_price
-        })
-    else:
-        print(f"警告: 未找到股票 {stock_code} ({stock_name}) 在 {last_trading_day} 的数据")
-
-# 创建投资组合DataFrame
-portfolio_df = pd.DataFrame(portfolio_data)
-
-# 计算总投资金额
-total_investment = portfolio_df['投资金额'].sum()
-print(f"总投资金额: {total_investment:.2f} 元")
-print(f"目标投资金额: 3,000,000 元")
+top_30_stocks = momentum_scores.sort_values('动量分数', ascending=False).head(TOP_N)
+
+# 读取股票数据文件，建立索引
+stock_data = load_indexed_prices('../data/hs300_stock_data.csv')
+
+# 获取2025年8月最后一个交易日
+last_trading_day = last_trading_day_of_month(stock_data, TARGET_MONTH)
+if last_trading_day is None:
+    raise ValueError(f"行情数据中没有 {TARGET_MONTH} 的交易日，无法建仓")
+print(f"2025年8月最后一个交易日: {last_trading_day.strftime('%Y-%m-%d')}")
+
+# 一次取出当天所有股票的横截面，再按前30名的代码对齐
+last_day_data = stock_data.xs(last_trading_day, level='日期')
+snapshot = last_day_data.reindex(top_30_stocks['股票代码'])
+snapshot['股票名称'] = top_30_stocks['股票名称'].to_numpy()
+
+missing = snapshot['开盘'].isna()
+for stock_code, stock_name in snapshot.loc[missing, '股票名称'].items():
+    print(f"警告: 未找到股票 {stock_code} ({stock_name}) 在 {last_trading_day.strftime('%Y-%m-%d')} 的数据")
+snapshot = snapshot[~missing].reset_index()
+
+# 整手约束下一次性分配全部资金（等权重目标）
+portfolio_df = build_allocation(snapshot, TOTAL_CAPITAL, price_col='开盘', lot_size=LOT_SIZE)
+portfolio_df = portfolio_df.rename(columns={'买入价': '开盘价'})
+summary = allocation_summary(portfolio_df, TOTAL_CAPITAL)
+
+print(f"总投资金额: {summary['投资金额']:.2f} 元")
+print(f"目标投资金额: {TOTAL_CAPITAL:,} 元")
+print(f"剩余现金: {summary['剩余现金']:.2f} 元")
+print(f"权重偏离(绝对值之和): {summary['权重偏离(绝对值之和)'] * 100:.2f}%")
 
 # 保存结果到CSV文件
 output_file = '../data/momentum_investment_portfolio.csv'
@@ -66,4 +71,4 @@ portfolio_df[['股票代码', '股票名称', '购买股数']].to_csv(output_fil
 
 print(f"投资组合已保存到 {output_file}")
 print("\n前10只股票的投资详情:")
-print(portfolio_df.head(10).to_string(index=False))
+print(portfolio_df[['股票代码', '股票名称', '开盘价', '购买股数', '投资金额']].head(10).to_string(index=False))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+股票历史数据质量检查
+功能：
+1. 在整张长格式数据表上向量化检查，不逐只股票循环：
+   - 重复的 (股票代码, 日期) 行
+   - 相对全市场交易日历缺失的交易日（每只股票在其首末日期之间）
+   - 零成交量 / 停牌日
+   - 非正价格、最高价低于最低价
+   - 相邻交易日收盘价跳变超过涨跌停幅度，疑似未复权的送转、拆股
+2. 按股票的统计只做一次分组聚合，其余检查都是整列的布尔运算
+3. 输出紧凑的问题报告（每个问题一行：股票代码、日期、问题类型、数值），
+   获取数据后和加载数据时都可以运行
+
+   python data_quality.py ../data/hs300_stock_data.csv
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from date_utils import parse_dates
+
+PRICE_COLUMNS = ['开盘', '收盘', '最高', '最低']
+REPORT_COLUMNS = ['股票代码', '日期', '问题类型', '数值']
+
+# A股单日涨跌幅上限为30%（北交所），超过 ln(1.45) 的对数收益率基本只可能来自未复权的除权除息
+JUMP_THRESHOLD = np.log(1.45)
+
+
+def _issues(frame, mask, issue, values=None):
+    """取出 mask 为真的行，整理为报告格式"""
+    rows = frame.loc[mask, ['股票代码', '日期']].copy()
+    rows['问题类型'] = issue
+    rows['数值'] = np.nan if values is None else np.asarray(values)[np.asarray(mask)]
+    return rows
+
+
+def validate_history(df, calendar=None, jump_threshold=JUMP_THRESHOLD):
+    """
+    检查长格式日线数据
+
+    Parameters:
+    df: DataFrame, 日期（已解析）、股票代码、价格列，可选 成交量
+    calendar: array-like, 交易日历；默认使用数据中出现过的全部日期
+    jump_threshold: float, 相邻交易日收盘价对数变化的绝对值超过该值时记为疑似未复权
+
+    Returns:
+    DataFrame: 问题报告（股票代码、日期、问题类型、数值），按股票代码、日期排序；
+               缺失交易日为每只股票一行，日期为第一个缺失日，数值为缺失天数
+    """
+    data = df.sort_values(['股票代码', '日期'], kind='mergesort').reset_index(drop=True)
+    reports = []
+
+    # 1. 重复的 (股票代码, 日期)
+    # 与价格存储一致，同一 (股票代码, 日期) 以最后写入的一行为准，之前的各行记为重复
+    duplicated = data.duplicated(['股票代码', '日期'], keep='last').to_numpy()
+    reports.append(_issues(data, duplicated, '重复行'))
+    unique = data[~duplicated].reset_index(drop=True)
+
+    # 2. 缺失交易日：一次分组得到每只股票的首末日期和交易日数，与日历中首末日期之间的交易日数比较
+    calendar = pd.DatetimeIndex(np.sort(pd.unique(unique['日期'])) if calendar is None else calendar).sort_values()
+    stats = unique.groupby('股票代码', sort=True)['日期'].agg(['min', 'max', 'size'])
+    start_pos = calendar.searchsorted(stats['min'].to_numpy(), side='left')
+    end_pos = calendar.searchsorted(stats['max'].to_numpy(), side='right')
+    missing = (end_pos - start_pos) - stats['size'].to_numpy()
+    if (missing > 0).any():
+        # 第一个缺失日：股票自己的交易日与日历逐位比较，第一个不一致的位置
+        code_pos = unique['股票代码'].map(pd.Series(np.arange(len(stats)), index=stats.index)).to_numpy()
+        offset = np.arange(len(unique)) - np.repeat(np.cumsum(stats['size'].to_numpy()) - stats['size'].to_numpy(),
+                                                    stats['size'].to_numpy())
+        expected = calendar.to_numpy()[np.minimum(start_pos[code_pos] + offset, len(calendar) - 1)]
+        gap = unique['日期'].to_numpy() != expected
+        first_gap = pd.Series(expected[gap], index=unique['股票代码'].to_numpy()[gap])
+        first_gap = first_gap[~first_gap.index.duplicated()]
+        has_missing = stats.index[missing > 0]
+        reports.append(pd.DataFrame({
+            '股票代码': has_missing,
+            '日期': first_gap.reindex(has_missing).to_numpy(),
+            '问题类型': '缺失交易日',
+            '数值': missing[missing > 0],
+        }))
+
+    # 3. 零成交量 / 停牌
+    if '成交量' in unique.columns:
+        volume = unique['成交量'].to_numpy(dtype=float)
+        reports.append(_issues(unique, ~(volume > 0), '零成交量', volume))
+
+    # 4. 非正价格、价格不一致
+    price_cols = [c for c in PRICE_COLUMNS if c in unique.columns]
+    prices = unique[price_cols].to_numpy(dtype=float)
+    min_price = np.min(np.where(np.isnan(prices), -np.inf, prices), axis=1)
+    reports.append(_issues(unique, ~(min_price > 0), '价格非正或缺失', min_price))
+    if '最高' in unique.columns and '最低' in unique.columns:
+        high, low = unique['最高'].to_numpy(dtype=float), unique['最低'].to_numpy(dtype=float)
+        reports.append(_issues(unique, high < low, '最高价低于最低价', high - low))
+
+    # 5. 相邻交易日收盘价跳变（同一只股票的前一行）
+    close = unique['收盘'].to_numpy(dtype=float)
+    same_stock = np.r_[False, unique['股票代码'].to_numpy()[1:] == unique['股票代码'].to_numpy()[:-1]]
+    prev_close = np.r_[np.nan, close[:-1]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_change = np.log(close / prev_close)
+    jump = same_stock & (np.abs(log_change) > jump_threshold) & (min_price > 0)
+    reports.append(_issues(unique, jump, '疑似未复权跳空', np.expm1(log_change)))
+
+    report = pd.concat(reports, ignore_index=True)[REPORT_COLUMNS]
+    return report.sort_values(['股票代码', '日期'], kind='mergesort').reset_index(drop=True)
+
+
+def clean_history(df):
+    """
+    加载时的最小清洗：去掉重复的 (股票代码, 日期)（保留最后一行）和价格非正或缺失的行
+
+    缺失交易日、零成交量和疑似未复权跳空只报告不修改，由使用者决定如何处理。
+    """
+    price_cols = [c for c in PRICE_COLUMNS if c in df.columns]
+    valid = (df[price_cols] > 0).all(axis=1).to_numpy()
+    cleaned = df[valid]
+    return cleaned[~cleaned.duplicated(['股票代码', '日期'], keep='last').to_numpy()]
+
+
+def quality_report_path(data_file):
+    """数据文件对应的问题报告路径：xxx.csv -> xxx_quality.csv"""
+    return data_file.rsplit('.', 1)[0] + '_quality.csv'
+
+
+def summarize_issues(report):
+    """
+    问题汇总
+
+    Returns:
+    DataFrame: 每种问题类型的记录数和涉及股票数
+    """
+    if len(report) == 0:
+        return pd.DataFrame(columns=['记录数', '股票数'])
+    return report.groupby('问题类型').agg(记录数=('股票代码', 'size'), 股票数=('股票代码', 'nunique'))
+
+
+def print_summary(report, label='数据质量检查'):
+    """打印问题汇总"""
+    if len(report) == 0:
+        print(f"{label}: 未发现问题")
+        return
+    print(f"{label}: 发现 {len(report)} 条问题记录")
+    print(summarize_issues(report).to_string())
+
+
+def write_report(report, file_path):
+    """保存问题报告"""
+    report.to_csv(file_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+    return file_path
+
+
+def main():
+    file_path = sys.argv[1] if len(sys.argv) > 1 else '../data/hs300_stock_data.csv'
+    df = pd.read_csv(file_path, dtype={'股票代码': str})
+    df['股票代码'] = df['股票代码'].str.zfill(6)
+    df['日期'] = parse_dates(df['日期'])
+
+    report = validate_history(df)
+    print_summary(report, f"{file_path} 数据质量检查")
+    output_file = write_report(report, quality_report_path(file_path))
+    print(f"\n问题报告已保存到 {output_file}")
+
+
+if __name__ == "__main__":
+    main()
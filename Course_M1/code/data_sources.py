@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步数据源抽象
+功能：
+1. 统一的异步数据接口：指数成分股、A股日线、ETF日线、美股日线
+2. akshare / yfinance 适配器：同步接口放到线程池中执行，多个请求可以并发进行
+3. 本地回放适配器：从 ../data 下的CSV文件读取数据，并模拟网络延迟，
+   整条数据流水线可以离线运行和测试
+"""
+
+import asyncio
+import glob
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from date_utils import parse_dates
+from price_store import PRICE_COLUMNS
+
+
+class DataSource:
+    """异步数据源接口"""
+
+    async def get_constituents(self, index_symbol="000300"):
+        """获取指数成分股，返回包含 成分券代码、成分券名称 的DataFrame"""
+        raise NotImplementedError
+
+    async def get_stock_list(self):
+        """获取全部A股代码和名称，返回格式与 get_constituents 相同"""
+        raise NotImplementedError
+
+    async def get_inclusion_dates(self, index_symbol="000300"):
+        """获取指数当前成分股的纳入日期，返回包含 成分券代码、纳入日期 的DataFrame"""
+        raise NotImplementedError
+
+    async def get_daily_bars(self, stock_code, start_date, end_date, adjust="qfq"):
+        """获取A股日线数据（日期格式 YYYYMMDD）"""
+        raise NotImplementedError
+
+    async def get_etf_bars(self, symbol, start_date, end_date, adjust="qfq"):
+        """获取ETF日线数据（日期格式 YYYYMMDD）"""
+        raise NotImplementedError
+
+    async def get_adj_factors(self, stock_code):
+        """获取A股后复权因子，返回包含 股票代码、日期、复权因子 的DataFrame"""
+        raise NotImplementedError
+
+    async def get_us_bars(self, ticker, start_date, end_date, auto_adjust=True):
+        """获取美股日线数据（日期格式 YYYY-MM-DD）；auto_adjust=False 时价格不按股息调整"""
+        raise NotImplementedError
+
+
+class ExecutorDataSource(DataSource):
+    """把同步的第三方接口放到线程池中执行的数据源基类"""
+
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+
+class AkshareDataSource(ExecutorDataSource):
+    """akshare数据源（A股、指数成分股、ETF）"""
+
+    def __init__(self, max_workers=8):
+        super().__init__(max_workers)
+        import akshare as ak
+        self.ak = ak
+
+    async def get_constituents(self, index_symbol="000300"):
+        return await self._run(self.ak.index_stock_cons_csindex, symbol=index_symbol)
+
+    async def get_stock_list(self):
+        stocks = await self._run(self.ak.stock_info_a_code_name)
+        return stocks.rename(columns={'code': '成分券代码', 'name': '成分券名称'})
+
+    async def get_inclusion_dates(self, index_symbol="000300"):
+        # 新浪接口返回当前成分股及最近一次纳入指数的日期
+        cons = await self._run(self.ak.index_stock_cons, symbol=index_symbol)
+        return pd.DataFrame({
+            '成分券代码': cons['品种代码'].astype(str).str.zfill(6),
+            '纳入日期': pd.to_datetime(cons['纳入日期']),
+        })
+
+    async def get_daily_bars(self, stock_code, start_date, end_date, adjust="qfq"):
+        return await self._run(self.ak.stock_zh_a_hist, symbol=stock_code, period="daily",
+                               start_date=start_date, end_date=end_date, adjust=adjust)
+
+    async def get_etf_bars(self, symbol, start_date, end_date, adjust="qfq"):
+        return await self._run(self.ak.fund_etf_hist_em, symbol=symbol, period="daily",
+                               start_date=start_date, end_date=end_date, adjust=adjust)
+
+    async def get_adj_factors(self, stock_code):
+        # 新浪接口需要带交易所前缀的代码
+        prefix = 'sh' if stock_code.startswith('6') else 'bj' if stock_code[0] in '48' else 'sz'
+        factors = await self._run(self.ak.stock_zh_a_daily, symbol=prefix + stock_code,
+                                  adjust="hfq-factor")
+        return pd.DataFrame({
+            '股票代码': stock_code,
+            '日期': pd.to_datetime(factors['date']),
+            '复权因子': factors['hfq_factor'].astype(float),
+        })
+
+
+class YFinanceDataSource(ExecutorDataSource):
+    """yfinance数据源（美股）"""
+
+    def __init__(self, max_workers=4):
+        super().__init__(max_workers)
+        import yfinance as yf
+        self.yf = yf
+
+    async def get_us_bars(self, ticker, start_date, end_date, auto_adjust=True):
+        return await self._run(lambda: self.yf.Ticker(ticker).history(start=start_date, end=end_date,
+                                                                        auto_adjust=auto_adjust))
+
+
+class CombinedDataSource(DataSource):
+    """A股接口交给 a_share 数据源，美股接口交给 us 数据源"""
+
+    def __init__(self, a_share, us):
+        self.a_share = a_share
+        self.us = us
+
+    async def get_constituents(self, index_symbol="000300"):
+        return await self.a_share.get_constituents(index_symbol)
+
+    async def get_stock_list(self):
+        return await self.a_share.get_stock_list()
+
+    async def get_inclusion_dates(self, index_symbol="000300"):
+        return await self.a_share.get_inclusion_dates(index_symbol)
+
+    async def get_daily_bars(self, stock_code, start_date, end_date, adjust="qfq"):
+        return await self.a_share.get_daily_bars(stock_code, start_date, end_date, adjust)
+
+    async def get_etf_bars(self, symbol, start_date, end_date, adjust="qfq"):
+        return await self.a_share.get_etf_bars(symbol, start_date, end_date, adjust)
+
+    async def get_adj_factors(self, stock_code):
+        return await self.a_share.get_adj_factors(stock_code)
+
+    async def get_us_bars(self, ticker, start_date, end_date, auto_adjust=True):
+        return await self.us.get_us_bars(ticker, start_date, end_date, auto_adjust)
+
+
+class ReplayDataSource(DataSource):
+    """
+    本地文件回放数据源
+
+    Parameters:
+    data_dir: str, 数据目录
+    latency: tuple, 每次请求的模拟延迟范围（秒），(0, 0) 表示不延迟
+    max_concurrency: int, 模拟服务端同时处理的请求数
+    seed: int, 延迟随机数种子
+
+    文件约定（均位于 data_dir 下）：
+    - hs300_stock_data.csv: 前复权A股日线（get_hs300_data.py 的输出）；get_daily_bars 按 adjust 参数
+      用 adj_factors.csv 还原为不复权/后复权价格
+    - {指数代码}_constituents.csv: 成分股列表（可选 纳入日期 列），不存在时从日线文件中提取
+    - all_constituents.csv: 全部A股列表，不存在时从日线文件中提取
+    - etf_{ETF代码}.csv: ETF日线
+    - adj_factors.csv: 后复权因子表，不存在时所有股票因子均为1
+    - {美股代码}_stock_data*.csv: 美股日线（get_nvda_stock_data.py 的输出）
+    - {美股代码}_raw_prices.csv: 未按股息调整的美股日线（auto_adjust=False 时优先使用）
+    """
+
+    def __init__(self, data_dir="../data", latency=(0.05, 0.3), max_concurrency=8, seed=None):
+        self.data_dir = data_dir
+        self.latency = latency
+        self.max_concurrency = max_concurrency
+        self.random = random.Random(seed)
+        # 每个事件循环一个信号量：asyncio.Semaphore 绑定到第一次等待它的事件循环，
+        # 同一实例先后用于多次 asyncio.run（如先取行情、再取复权因子）时不能共用
+        self._semaphores = {}
+        self._cache = {}
+
+    async def _simulate_latency(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            self._semaphores = {loop: asyncio.Semaphore(self.max_concurrency)}
+            semaphore = self._semaphores[loop]
+        async with semaphore:
+            delay = self.random.uniform(*self.latency)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def _read(self, file_name, **kwargs):
+        """读取并缓存本地文件，文件不存在时返回None"""
+        if file_name not in self._cache:
+            path = os.path.join(self.data_dir, file_name)
+            self._cache[file_name] = pd.read_csv(path, **kwargs) if os.path.exists(path) else None
+        return self._cache[file_name]
+
+    def _stock_history(self):
+        df = self._read('hs300_stock_data.csv', dtype={'股票代码': str})
+        if df is None:
+            raise FileNotFoundError(os.path.join(self.data_dir, 'hs300_stock_data.csv'))
+        if '_day' not in df.columns:
+            df['股票代码'] = df['股票代码'].str.zfill(6)
+            df['_day'] = df['日期'].str.replace('-', '', regex=False).str[:8]
+        return df
+
+    async def get_constituents(self, index_symbol="000300"):
+        await self._simulate_latency()
+        cons = self._read(f'{index_symbol}_constituents.csv', dtype={'成分券代码': str})
+        if cons is not None:
+            return cons.copy()
+        history = self._stock_history()
+        cons = history.drop_duplicates('股票代码')[['股票代码', '股票名称']]
+        return cons.rename(columns={'股票代码': '成分券代码', '股票名称': '成分券名称'}).reset_index(drop=True)
+
+    async def get_stock_list(self):
+        return await self.get_constituents('all')
+
+    async def get_inclusion_dates(self, index_symbol="000300"):
+        cons = await self.get_constituents(index_symbol)
+        if '纳入日期' not in cons.columns:
+            raise ValueError(f"{index_symbol}_constituents.csv 中没有纳入日期列")
+        return cons[['成分券代码', '纳入日期']]
+
+    async def get_daily_bars(self, stock_code, start_date, end_date, adjust="qfq"):
+        await self._simulate_latency()
+        history = self._stock_history()
+        mask = (history['股票代码'] == stock_code) & \
+               (history['_day'] >= start_date) & (history['_day'] <= end_date)
+        # 与akshare返回格式一致：不包含股票名称
+        bars = history.loc[mask].drop(columns=['_day', '股票名称']).reset_index(drop=True)
+        if adjust == 'qfq':
+            return bars
+        if adjust not in ('', 'hfq'):
+            raise ValueError(f"不支持的复权方式: {adjust}")
+
+        # 回放文件保存的是前复权价格（原始价格 × 当日因子 / 最新因子），按复权因子表还原：
+        # 不复权 = 前复权 × 最新因子 / 当日因子，后复权 = 前复权 × 最新因子；没有因子表时三者相同
+        factors = self._read('adj_factors.csv', dtype={'股票代码': str})
+        if factors is None or len(bars) == 0:
+            return bars
+        factors = factors[factors['股票代码'].str.zfill(6) == stock_code]
+        if len(factors) == 0:
+            return bars
+        factor_dates = parse_dates(factors['日期'])
+        order = np.argsort(factor_dates.to_numpy(), kind='stable')
+        factor_dates = factor_dates[order]
+        values = factors['复权因子'].to_numpy(dtype=float)[order]
+        pos = factor_dates.searchsorted(parse_dates(bars['日期']), side='right') - 1
+        factor = np.where(pos >= 0, values[np.maximum(pos, 0)], 1.0)
+        scale = values[-1] / factor if adjust == '' else np.full(len(bars), values[-1])
+        cols = [c for c in PRICE_COLUMNS if c in bars.columns]
+        bars[cols] = bars[cols].to_numpy(dtype=float) * scale[:, None]
+        return bars
+
+    async def get_etf_bars(self, symbol, start_date, end_date, adjust="qfq"):
+        await self._simulate_latency()
+        etf = self._read(f'etf_{symbol}.csv')
+        if etf is None:
+            raise FileNotFoundError(os.path.join(self.data_dir, f'etf_{symbol}.csv'))
+        day = etf['日期'].astype(str).str.replace('-', '', regex=False).str[:8]
+        return etf[(day >= start_date) & (day <= end_date)].reset_index(drop=True)
+
+    async def get_adj_factors(self, stock_code):
+        await self._simulate_latency()
+        factors = self._read('adj_factors.csv', dtype={'股票代码': str})
+        if factors is None:
+            return pd.DataFrame(columns=['股票代码', '日期', '复权因子'])
+        return factors[factors['股票代码'].str.zfill(6) == stock_code].reset_index(drop=True)
+
+    async def get_us_bars(self, ticker, start_date, end_date, auto_adjust=True):
+        await self._simulate_latency()
+        raw = None if auto_adjust else self._read(f'{ticker}_raw_prices.csv', index_col=0)
+        if raw is not None:
+            data = raw
+        else:
+            files = sorted(glob.glob(os.path.join(self.data_dir, f'{ticker}_stock_data*.csv')))
+            if not files:
+                raise FileNotFoundError(os.path.join(self.data_dir, f'{ticker}_stock_data*.csv'))
+            data = self._read(os.path.basename(files[0]), index_col=0)
+            if not auto_adjust:
+                # 回放文件已按股息调整：股息已计入价格，不再重复调整
+                data = data.assign(Dividends=0.0)
+        day = data.index.str[:10]
+        return data[(day >= start_date) & (day < end_date)]
+
+
+async def fetch_adj_factors(source, stock_codes, concurrency=8):
+    """并发获取多只股票的复权因子，合并为一张表"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(stock_code):
+        async with semaphore:
+            try:
+                return await source.get_adj_factors(stock_code)
+            except Exception as e:
+                print(f"获取 {stock_code} 复权因子失败: {e}")
+                return None
+
+    results = await asyncio.gather(*[fetch_one(code) for code in stock_codes])
+    frames = [df for df in results if df is not None and len(df) > 0]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def create_live_source():
+    """创建联网数据源：A股走akshare，美股走yfinance"""
+    return CombinedDataSource(AkshareDataSource(), YFinanceDataSource())
+
+
+async def fetch_stock_bars(source, constituents, start_date, end_date, concurrency=8,
+                           adjust="qfq", start_dates=None):
+    """
+    并发获取成分股日线数据
+
+    Parameters:
+    adjust: str, 复权方式，"" 表示不复权
+    start_dates: dict, 个别股票的起始日期（增量更新时使用），未指定的使用 start_date
+
+    Returns:
+    list: 每只股票一个DataFrame（已添加股票代码、股票名称列），失败的股票被跳过
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(constituents)
+    done = 0
+
+    async def fetch_one(stock_code, stock_name):
+        nonlocal done
+        async with semaphore:
+            try:
+                stock_start = (start_dates or {}).get(stock_code, start_date)
+                stock_df = await source.get_daily_bars(stock_code, stock_start, end_date, adjust)
+            except Exception as e:
+                print(f"获取 {stock_name}({stock_code}) 数据失败: {e}")
+                return None
+        done += 1
+        stock_df['股票代码'] = stock_code
+        stock_df['股票名称'] = stock_name
+        print(f"[{done}/{total}] 成功获取 {stock_name}({stock_code}) 的历史数据，共 {len(stock_df)} 条记录")
+        return stock_df
+
+    tasks = [fetch_one(code, name) for code, name in
+             zip(constituents['成分券代码'], constituents['成分券名称'])]
+    results = await asyncio.gather(*tasks)
+    return [df for df in results if df is not None and len(df) > 0]
+
+
+async def fetch_pipeline(source, index_symbol="000300", start_date="20230901", end_date="20250831",
+                         etf_symbol="510300", us_tickers=("NVDA",),
+                         us_start="2020-01-01", us_end="2025-08-26", concurrency=8):
+    """
+    并发获取整条流水线所需的数据：成分股日线、ETF基准、美股日线
+
+    Returns:
+    dict: stocks（合并后的A股日线）、etf（ETF日线）、us（{代码: 日线}）
+    """
+    constituents = await source.get_constituents(index_symbol)
+    print(f"成功获取 {len(constituents)} 只成分股")
+
+    async def safe(coro, label):
+        try:
+            return await coro
+        except Exception as e:
+            print(f"获取{label}失败: {e}")
+            return None
+
+    stock_task = fetch_stock_bars(source, constituents, start_date, end_date, concurrency)
+    etf_task = safe(source.get_etf_bars(etf_symbol, start_date, end_date), f"ETF({etf_symbol})数据")
+    us_tasks = [safe(source.get_us_bars(t, us_start, us_end), f"{t}数据") for t in us_tickers]
+
+    stock_frames, etf_data, *us_data = await asyncio.gather(stock_task, etf_task, *us_tasks)
+
+    return {
+        'stocks': pd.concat(stock_frames, ignore_index=True) if stock_frames else None,
+        'etf': etf_data,
+        'us': dict(zip(us_tickers, us_data)),
+    }
+
+
+def main():
+    """离线演示：用本地回放数据源跑一遍完整的数据获取流水线"""
+    print("异步数据源离线演示（本地回放 + 模拟延迟）")
+    print("=" * 50)
+
+    source = ReplayDataSource('../data', latency=(0.05, 0.3), max_concurrency=8, seed=0)
+
+    start = time.perf_counter()
+    result = asyncio.run(fetch_pipeline(source, concurrency=8))
+    elapsed = time.perf_counter() - start
+
+    if result['stocks'] is not None:
+        print(f"\nA股日线: {len(result['stocks'])} 条记录，{result['stocks']['股票代码'].nunique()} 只股票")
+    for ticker, data in result['us'].items():
+        if data is not None:
+            print(f"{ticker} 日线: {len(data)} 条记录")
+    print(f"总耗时: {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
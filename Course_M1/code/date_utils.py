@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日期规范化工具
+功能：
+1. 带缓存的日期解析：只解析不重复的日期字符串（多只股票共享同一批交易日），
+   再按编码映射回整列，并使用显式格式，避免逐元素推断格式
+2. yfinance 时间戳（如 2020-01-02 00:00:00-05:00，夏令时前后偏移量不同）转为交易所当地的交易日期，
+   不再得到 object 类型的混合时区列
+3. 交易日期可以存为 int32 日序号（1970-01-01 起的天数），便于整数运算和紧凑存储
+"""
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%Y-%m-%d'
+# 指定格式解析失败时依次尝试的格式：(格式, 取前几个字符)，后者是akshare请求参数使用的 YYYYMMDD
+FALLBACK_FORMATS = [(DATE_FORMAT, 10), ('%Y%m%d', 8)]
+EXCHANGE_TIMEZONES = {
+    'US': 'America/New_York',
+    'CN': 'Asia/Shanghai',
+}
+
+
+def parse_dates(values, fmt=DATE_FORMAT):
+    """
+    带缓存的日期解析
+
+    Parameters:
+    values: array-like, 日期字符串（或已是日期类型）
+    fmt: str, 日期格式；解析失败的值依次按 FALLBACK_FORMATS 解析（前10个字符按 %Y-%m-%d，前8个字符按 %Y%m%d），
+         仍无法解析时抛出 ValueError
+
+    Returns:
+    DatetimeIndex: 不带时区的日期
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return pd.DatetimeIndex(values)
+
+    codes, uniques = pd.factorize(pd.Series(values), sort=False)
+    uniques = pd.Index(uniques).astype(str)
+    parsed = pd.to_datetime(uniques, format=fmt, errors='coerce')
+    for fallback_fmt, width in FALLBACK_FORMATS:
+        failed = parsed.isna()
+        if not failed.any():
+            break
+        parsed = parsed.where(~failed, pd.to_datetime(uniques.str[:width], format=fallback_fmt, errors='coerce'))
+    if parsed.isna().any():
+        raise ValueError(f"无法解析的日期: {list(uniques[parsed.isna()][:5])}")
+    result = parsed.take(codes)
+    # factorize 把缺失值编码为 -1，take 会取到最后一个元素，需要还原为 NaT
+    if (codes < 0).any():
+        result = result.where(codes >= 0)
+    return pd.DatetimeIndex(result)
+
+
+def exchange_dates(values, market='US'):
+    """
+    带时区偏移的时间戳转为交易所当地的交易日期（不带时区）
+
+    字符串输入时，yfinance 输出的本地时间前10个字符就是交易所当地日期，直接按固定格式解析，
+    不需要逐元素处理不同的UTC偏移；已是带时区的日期类型时先转换到交易所时区再取日期。
+
+    Parameters:
+    values: array-like, 时间戳字符串或带时区的日期
+    market: str, EXCHANGE_TIMEZONES 中的市场代码
+
+    Returns:
+    DatetimeIndex: 交易日期
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and isinstance(values.dtype, pd.DatetimeTZDtype):
+        local = pd.DatetimeIndex(values).tz_convert(EXCHANGE_TIMEZONES[market])
+        return local.tz_localize(None).normalize()
+    return parse_dates(pd.Series(values).astype(str).str[:10], DATE_FORMAT)
+
+
+def to_day_numbers(dates):
+    """日期转为 int32 日序号（1970-01-01 起的天数）"""
+    return pd.DatetimeIndex(dates).to_numpy().astype('datetime64[D]').astype(np.int32)
+
+
+def from_day_numbers(days):
+    """int32 日序号转回日期"""
+    return pd.DatetimeIndex(np.asarray(days).astype('datetime64[D]'))
+
+
+def normalize_date_column(df, column='日期', fmt=DATE_FORMAT, day_number_column=None):
+    """
+    就地规范化数据表中的日期列
+
+    Parameters:
+    df: DataFrame
+    column: str, 日期列名
+    fmt: str, 日期格式
+    day_number_column: str, 提供时额外添加该名称的 int32 日序号列
+
+    Returns:
+    DataFrame: 同一个 df
+    """
+    df[column] = parse_dates(df[column], fmt)
+    if day_number_column:
+        df[day_number_column] = to_day_numbers(df[column])
+    return df
@@ -1,14 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
+
 import pandas as pd
 
-def display_detailed_results():
-    """显示详细的动量分数结果"""
+from results_writer import format_table
+from score_snapshots import ScoreSnapshotStore
+
+def display_detailed_results(snapshot_date=None):
+    """
+    显示详细的动量分数结果
+    
+    Parameters:
+    snapshot_date: str, 历史日期；提供时从快照库读取该日（或之前最近一次）的排名
+    """
     
     # 读取动量分数结果
     try:
-        df = pd.read_csv('../data/momentum_scores.csv')
+        if snapshot_date is None:
+            df = pd.read_csv('../data/momentum_scores.csv')
+        else:
+            actual_date, df = ScoreSnapshotStore('../data/score_snapshots').ranking(snapshot_date)
+            if actual_date is None:
+                print(f"{snapshot_date} 之前没有动量分数快照")
+                return
+            print(f"快照日期: {actual_date.strftime('%Y-%m-%d')}")
+            df = df.drop(columns='排名')
         print(f"成功读取动量分数结果，共 {len(df)} 只股票")
     except Exception as e:
         print(f"读取动量分数结果失败: {e}")
@@ -16,18 +34,21 @@ def display_detailed_results():
     
     # 显示前20只股票的详细信息
     print("\n动量分数排名前20的股票（详细信息）:")
+    top_20 = df.head(20).copy()
+    top_20.insert(0, '排名', range(1, len(top_20) + 1))
+    columns = ['排名', '股票代码', '股票名称']
+    formats = {}
+    for period in ['1个月', '3个月', '6个月', '12个月']:
+        columns += [f'{period}收益率', f'{period}收益率百分位值']
+        formats[f'{period}收益率'] = '{:>7.1f}%'
+        formats[f'{period}收益率百分位值'] = '{:>7.1f}'
+    columns.append('动量分数')
+    formats['动量分数'] = '{:>7.1f}'
+    
     print("=" * 150)
-    print(f"{'排名':<4} {'股票代码':<8} {'股票名称':<10} {'1个月收益':<8} {'1个月%位':<8} {'3个月收益':<8} {'3个月%位':<8} {'6个月收益':<8} {'6个月%位':<8} {'12个月收益':<8} {'12个月%位':<8} {'动量分数':<8}")
+    print(format_table(top_20[columns], formats))
     print("=" * 150)
     
-    for i, (idx, row) in enumerate(df.head(20).iterrows(), 1):
-        print(f"{i:<4} {row['股票代码']:<8} {row['股票名称']:<10} "
-              f"{row['1个月收益率']:>7.1f}% {row['1个月收益率百分位值']:>7.1f} "
-              f"{row['3个月收益率']:>7.1f}% {row['3个月收益率百分位值']:>7.1f} "
-              f"{row['6个月收益率']:>7.1f}% {row['6个月收益率百分位值']:>7.1f} "
-              f"{row['12个月收益率']:>7.1f}% {row['12个月收益率百分位值']:>7.1f} "
-              f"{row['动量分数']:>7.1f}")
-    
     # 显示统计信息
     print(f"\n统计信息:")
     print(f"股票总数: {len(df)}")
@@ -46,4 +67,4 @@ def display_detailed_results():
     print(f"文件包含以下列: {', '.join(df.columns.tolist())}")
 
 if __name__ == "__main__":
-    display_detailed_results()
+    display_detailed_results(sys.argv[1] if len(sys.argv) > 1 else None)
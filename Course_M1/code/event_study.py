@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件研究（Event Study）分析模块
+功能：
+1. 根据收益率z分数自动识别大涨/大跌事件，或从本地事件文件读取事件
+2. 一次性向量化提取所有事件窗口，计算异常收益率(AR)和累计异常收益率(CAR)
+3. 从本地事件标签文件关联事件说明，替代硬编码的文字时间线
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import warnings
+warnings.filterwarnings('ignore')
+
+from date_utils import parse_dates, exchange_dates
+
+
+def load_nvda_returns(file_path):
+    """读取yfinance格式的单只股票数据，返回 日期 × 股票代码 的日收益率矩阵"""
+    df = pd.read_csv(file_path)
+    # yfinance日期已是交易所当地时间，直接截取日期部分按固定格式解析
+    df['Date'] = exchange_dates(df['Date'], 'US')
+    close = df.set_index('Date')['Close'].sort_index()
+    returns = close.pct_change().to_frame('NVDA')
+    return returns.iloc[1:]
+
+
+def load_hs300_returns(file_path):
+    """读取沪深300成分股历史数据，返回 日期 × 股票代码 的日收益率矩阵"""
+    df = pd.read_csv(file_path, usecols=['日期', '股票代码', '收盘'],
+                     dtype={'股票代码': str})
+    df['股票代码'] = df['股票代码'].str.zfill(6)
+    df['日期'] = parse_dates(df['日期'])
+    close = df.pivot_table(index='日期', columns='股票代码', values='收盘').sort_index()
+    # 停牌日不向前填充，避免复牌首日的收益率被摊到停牌期间
+    returns = close / close.ffill().shift(1) - 1
+    return returns.iloc[1:]
+
+
+def detect_events(returns, z_threshold=3.0, lookback=60, min_periods=20):
+    """
+    根据收益率z分数识别事件
+
+    Parameters:
+    returns: DataFrame, 日期 × 股票代码 的日收益率矩阵
+    z_threshold: float, |z| 超过该阈值视为事件
+    lookback: int, 计算均值和标准差的滚动窗口（只使用事件日之前的数据）
+    min_periods: int, 滚动窗口最少有效样本数
+
+    Returns:
+    DataFrame: 事件列表，包含 日期、股票代码、收益率、z分数、方向
+    """
+    rolling = returns.rolling(lookback, min_periods=min_periods)
+    mean = rolling.mean().shift(1)
+    std = rolling.std().shift(1)
+    z = ((returns - mean) / std).to_numpy()
+
+    # 一次性找出所有超过阈值的 (日期, 股票) 位置
+    with np.errstate(invalid='ignore'):
+        rows, cols = np.nonzero(np.abs(z) >= z_threshold)
+
+    events = pd.DataFrame({
+        '日期': returns.index[rows],
+        '股票代码': returns.columns[cols],
+        '收益率': returns.to_numpy()[rows, cols],
+        'z分数': z[rows, cols],
+    })
+    events['方向'] = np.where(events['收益率'] > 0, '上涨', '下跌')
+    return events.sort_values(['日期', '股票代码']).reset_index(drop=True)
+
+
+def load_events(file_path):
+    """从本地CSV读取事件列表（至少包含 日期、股票代码 两列）"""
+    events = pd.read_csv(file_path, dtype={'股票代码': str})
+    events['日期'] = pd.to_datetime(events['日期'], format='%Y-%m-%d')
+    return events
+
+
+def attach_event_labels(events, labels, tolerance_days=3):
+    """
+    为事件关联本地标签文件中的事件说明
+
+    标签日期与价格反应日期常有错位（如盘后发布财报，次日才反映到股价），
+    因此按股票代码做最近日期匹配，容差为 tolerance_days 个自然日。
+    """
+    if labels is None or len(labels) == 0:
+        return events
+
+    label_cols = [c for c in labels.columns if c not in ('日期', '股票代码')]
+    left = events.sort_values('日期')
+    right = labels.rename(columns={'日期': '标签日期'}).sort_values('标签日期')
+
+    merged = pd.merge_asof(
+        left, right, left_on='日期', right_on='标签日期', by='股票代码',
+        direction='nearest', tolerance=pd.Timedelta(days=tolerance_days)
+    )
+    return merged[list(events.columns) + ['标签日期'] + label_cols] \
+        .sort_values(['日期', '股票代码']).reset_index(drop=True)
+
+
+def compute_event_windows(returns, events, window=(-5, 10), estimation=(-120, -11),
+                          market=None, min_estimation=20):
+    """
+    计算所有事件窗口的异常收益率和累计异常收益率
+
+    Parameters:
+    returns: DataFrame, 日期 × 股票代码 的日收益率矩阵
+    events: DataFrame, 包含 日期、股票代码 两列的事件列表
+    window: tuple, 事件窗口（相对事件日的交易日偏移，含两端）
+    estimation: tuple, 估计窗口（相对事件日的交易日偏移，含两端）
+    market: Series, 市场收益率；提供时使用市场调整模型，否则使用均值调整模型
+    min_estimation: int, 估计窗口最少有效样本数，不足时该事件的AR为NaN
+
+    Returns:
+    dict: ar/car 为 事件 × 偏移 的DataFrame，events 为对齐后的事件列表
+    """
+    values = returns.to_numpy(dtype=float)
+    n_days = values.shape[0]
+
+    if market is not None:
+        market = market.reindex(returns.index).to_numpy(dtype=float)
+        values = values - market[:, None]
+
+    # 事件日映射为行号（非交易日顺延到下一个交易日），股票代码映射为列号
+    row_idx = returns.index.searchsorted(events['日期'].to_numpy(), side='left')
+    col_idx = returns.columns.get_indexer(events['股票代码'])
+    keep = (row_idx < n_days) & (col_idx >= 0)
+    events = events.loc[keep].reset_index(drop=True)
+    row_idx, col_idx = row_idx[keep], col_idx[keep]
+
+    # 估计窗口均值：利用累计和一次求出所有事件的区间均值
+    filled = np.nan_to_num(values)
+    counts = (~np.isnan(values)).astype(np.int64)
+    csum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(filled, axis=0)])
+    ccnt = np.vstack([np.zeros((1, values.shape[1]), dtype=np.int64), np.cumsum(counts, axis=0)])
+
+    est_start = np.clip(row_idx + estimation[0], 0, n_days)
+    est_end = np.clip(row_idx + estimation[1] + 1, 0, n_days)
+    est_sum = csum[est_end, col_idx] - csum[est_start, col_idx]
+    est_cnt = ccnt[est_end, col_idx] - ccnt[est_start, col_idx]
+    if market is not None:
+        # 市场调整模型：正常收益即市场收益，已在上面扣除
+        normal = np.where(est_cnt >= min_estimation, 0.0, np.nan)
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normal = np.where(est_cnt >= min_estimation, est_sum / est_cnt, np.nan)
+
+    # 向量化提取窗口：事件数 × 窗口长度 的索引矩阵
+    offsets = np.arange(window[0], window[1] + 1)
+    win_idx = row_idx[:, None] + offsets[None, :]
+    in_range = (win_idx >= 0) & (win_idx < n_days)
+    ar = values[np.clip(win_idx, 0, n_days - 1), col_idx[:, None]] - normal[:, None]
+    ar[~in_range] = np.nan
+
+    car = np.nancumsum(ar, axis=1)
+    car[np.isnan(ar)] = np.nan
+
+    index = pd.MultiIndex.from_arrays([events['日期'], events['股票代码']],
+                                      names=['日期', '股票代码'])
+    return {
+        'events': events,
+        'ar': pd.DataFrame(ar, index=index, columns=offsets),
+        'car': pd.DataFrame(car, index=index, columns=offsets),
+    }
+
+
+def summarize_event_windows(result, car_windows=((-1, 1), (0, 5), (0, 10))):
+    """汇总每个事件的CAR，以及全部事件的平均AR/CAR"""
+    ar = result['ar']
+    events = result['events'].copy()
+
+    for start, end in car_windows:
+        cols = [c for c in ar.columns if start <= c <= end]
+        events[f'CAR[{start},{end}]'] = ar[cols].sum(axis=1, min_count=1).to_numpy()
+
+    average = pd.DataFrame({
+        '平均AR': ar.mean(),
+        '平均CAR': result['car'].mean(),
+        '事件数': ar.count(),
+    })
+    average.index.name = '偏移'
+    return events, average
+
+
+def run_event_study(returns, events=None, labels=None, market=None,
+                    window=(-5, 10), z_threshold=3.0):
+    """完整事件研究流程：识别/读取事件 -> 计算AR/CAR -> 关联标签 -> 汇总"""
+    if events is None:
+        events = detect_events(returns, z_threshold=z_threshold)
+    print(f"事件数量: {len(events)}")
+
+    result = compute_event_windows(returns, events, window=window, market=market)
+    result['events'] = attach_event_labels(result['events'], labels)
+    event_table, average = summarize_event_windows(result)
+    return event_table, average, result
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("事件研究分析工具")
+    print("=" * 80)
+
+    # 1. NVDA：自动识别大幅波动日，并关联本地事件标签
+    nvda_file = "../data/NVDA_stock_data_2020_2025.csv"
+    label_file = "../data/nvda_events.csv"
+
+    returns = load_nvda_returns(nvda_file)
+    labels = load_events(label_file) if os.path.exists(label_file) else None
+    event_table, average, _ = run_event_study(returns, labels=labels)
+
+    print("\nNVDA 大幅波动事件（|z| >= 3）:")
+    print(event_table.to_string(index=False))
+    print("\n事件窗口平均异常收益:")
+    print(average.to_string())
+
+    event_table.to_csv('../data/nvda_event_study.csv', index=False, encoding='utf-8-sig')
+    print("\n事件研究结果已保存到 '../data/nvda_event_study.csv'")
+
+    # 2. 沪深300成分股：以成分股等权平均收益作为市场收益
+    hs300_file = "../data/hs300_stock_data.csv"
+    if os.path.exists(hs300_file):
+        print("\n正在分析沪深300成分股的大幅波动事件...")
+        hs300_returns = load_hs300_returns(hs300_file)
+        market = hs300_returns.mean(axis=1)
+        event_table, average, _ = run_event_study(hs300_returns, market=market)
+
+        print("\n沪深300成分股事件窗口平均异常收益:")
+        print(average.to_string())
+
+        event_table.to_csv('../data/hs300_event_study.csv', index=False, encoding='utf-8-sig')
+        print("\n事件研究结果已保存到 '../data/hs300_event_study.csv'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+动量因子IC分析与因子衰减
+功能：
+1. 在 日期 × 股票代码 矩阵上一次性计算每个交易日的1/3/6/12个月收益率、
+   各周期百分位值和动量分数（与 calculate_momentum_score.py 的定义一致）
+2. 计算每个因子与未来1/5/20/60个交易日收益率的横截面Spearman秩相关系数（IC），
+   整个矩阵按行一次性排名，不逐日循环
+3. 输出IC均值、标准差、IC-IR、t统计量、IC为正的比例，以及IC随预测期的衰减表
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from lookback_index import CALENDAR_PERIODS as PERIODS
+from date_utils import parse_dates
+
+FORWARD_HORIZONS = [1, 5, 20, 60]
+
+
+def build_close_panel(df):
+    """由长格式历史数据构建 日期 × 股票代码 的收盘价矩阵（向前填充，对应“当天或之前最近的收盘价”）"""
+    close = df.pivot_table(index='日期', columns='股票代码', values='收盘').sort_index()
+    return close.ffill()
+
+
+def lookback_returns(close, days):
+    """
+    每个交易日相对 days 个自然日前（当天或之前最近的交易日）的收益率（%）
+
+    所有股票共用同一个日期索引，回看位置只需对日期做一次二分查找。
+    """
+    pos = close.index.searchsorted(close.index - pd.Timedelta(days=days), side='right') - 1
+    values = close.to_numpy()
+    past = np.full_like(values, np.nan)
+    has_past = pos >= 0
+    past[has_past] = values[pos[has_past]]
+    return pd.DataFrame((values / past - 1) * 100, index=close.index, columns=close.columns)
+
+
+def build_factor_panels(close, universe=None):
+    """
+    计算所有交易日的动量因子矩阵
+
+    Parameters:
+    close: DataFrame, 日期 × 股票代码 的收盘价矩阵（已向前填充）
+    universe: DataFrame of bool, 可选，日期 × 股票代码 的股票池掩码（如成分股时点掩码）
+
+    Returns:
+    dict: 因子名 -> 日期 × 股票代码 的因子矩阵，包含各周期收益率和动量分数
+    """
+    factors = {}
+    percentiles = []
+    for name, days in PERIODS:
+        returns = lookback_returns(close, days)
+        if universe is not None:
+            returns = returns.where(universe.reindex_like(returns).fillna(False).astype(bool))
+        factors[name] = returns
+        # 横截面百分位：rank(method='max', pct=True) 等价于 (valid <= x).mean()
+        percentiles.append(returns.rank(axis=1, method='max', pct=True).to_numpy() * 100)
+    factors['动量分数'] = pd.DataFrame(np.nanmean(np.stack(percentiles), axis=0),
+                                    index=close.index, columns=close.columns)
+    return factors
+
+
+def forward_returns(close, horizon, raw_close=None):
+    """
+    未来 horizon 个交易日的收益率
+
+    Parameters:
+    raw_close: DataFrame, 未填充的收盘价矩阵；提供时已停止交易（最后一个有效日期早于目标日）的股票记为NaN
+    """
+    future = close.shift(-horizon)
+    result = future / close - 1
+    if raw_close is not None:
+        last_valid = raw_close.notna().to_numpy()[::-1].cumsum(axis=0)[::-1] > 0
+        has_future = np.zeros_like(last_valid)
+        has_future[:len(close) - horizon] = last_valid[horizon:]
+        result = result.where(has_future)
+    return result
+
+
+def rank_ic(factor, forward):
+    """
+    每个交易日的横截面Spearman秩相关系数
+
+    两个矩阵先按共同有效的位置对齐，再各自按行一次性排名，逐行计算皮尔逊相关。
+
+    Returns:
+    Series: 日期 -> IC（有效股票少于3只的日期为NaN）
+    """
+    valid = factor.notna() & forward.notna()
+    x = factor.where(valid).rank(axis=1).to_numpy()
+    y = forward.where(valid).rank(axis=1).to_numpy()
+    n = valid.to_numpy().sum(axis=1)
+
+    x = x - np.nanmean(x, axis=1, keepdims=True)
+    y = y - np.nanmean(y, axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ic = np.nansum(x * y, axis=1) / np.sqrt(np.nansum(x ** 2, axis=1) * np.nansum(y ** 2, axis=1))
+    ic[n < 3] = np.nan
+    return pd.Series(ic, index=factor.index)
+
+
+def ic_analysis(close, factors, horizons=FORWARD_HORIZONS, raw_close=None):
+    """
+    计算所有因子、所有预测期的IC时间序列
+
+    Returns:
+    DataFrame: 行为日期，列为 (因子, 预测期) 的MultiIndex
+    """
+    forwards = {horizon: forward_returns(close, horizon, raw_close) for horizon in horizons}
+    series = {}
+    for name, factor in factors.items():
+        for horizon, forward in forwards.items():
+            series[(name, horizon)] = rank_ic(factor, forward)
+    ic = pd.DataFrame(series)
+    ic.columns.names = ['因子', '预测期']
+    return ic
+
+
+def summarize_ic(ic):
+    """IC汇总统计：均值、标准差、IC-IR、t统计量、IC为正的比例、有效天数"""
+    count = ic.count()
+    mean = ic.mean()
+    std = ic.std()
+    summary = pd.DataFrame({
+        'IC均值': mean,
+        'IC标准差': std,
+        'IC_IR': mean / std,
+        't统计量': mean / std * np.sqrt(count),
+        'IC为正比例': (ic > 0).sum() / count,
+        '有效天数': count,
+    })
+    return summary
+
+
+def ic_decay(ic):
+    """IC衰减表：因子 × 预测期 的IC均值"""
+    factor_order = ic.columns.get_level_values('因子').unique()
+    return ic.mean().unstack('预测期').reindex(factor_order)
+
+
+def main():
+    """主函数"""
+    print("动量因子IC分析")
+    print("=" * 50)
+
+    df = pd.read_csv('../data/hs300_stock_data.csv', usecols=['日期', '股票代码', '收盘'],
+                     dtype={'股票代码': str})
+    df['股票代码'] = df['股票代码'].str.zfill(6)
+    df['日期'] = parse_dates(df['日期'])
+    print(f"成功加载数据，共 {len(df)} 条记录，股票数量: {df['股票代码'].nunique()}")
+
+    raw_close = df.pivot_table(index='日期', columns='股票代码', values='收盘').sort_index()
+    close = raw_close.ffill()
+    factors = build_factor_panels(close)
+
+    ic = ic_analysis(close, factors, FORWARD_HORIZONS, raw_close)
+    summary = summarize_ic(ic)
+    decay = ic_decay(ic)
+
+    print("\nIC汇总（Spearman秩相关）:")
+    print(summary.to_string(float_format=lambda v: f'{v:.4f}'))
+    print("\nIC衰减（IC均值 × 预测期，交易日）:")
+    print(decay.to_string(float_format=lambda v: f'{v:.4f}'))
+
+    ic.to_csv('../data/factor_ic_series.csv', encoding='utf-8-sig')
+    summary.to_csv('../data/factor_ic_summary.csv', encoding='utf-8-sig')
+    print("\nIC时间序列已保存到 ../data/factor_ic_series.csv")
+    print("IC汇总已保存到 ../data/factor_ic_summary.csv")
+
+
+if __name__ == "__main__":
+    main()
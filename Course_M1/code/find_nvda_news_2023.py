@@ -27,23 +27,19 @@ def analyze_nvda_news_period():
     print(f"目标日期: {target_date} (涨幅24.37%，历史最高单日涨幅)")
     print()
     
-    # 已知的重大事件时间线
+    # 已知的重大事件时间线（从本地事件标签文件读取）
+    events = pd.read_csv('../data/nvda_events.csv', dtype={'股票代码': str})
+    events['日期'] = pd.to_datetime(events['日期'], format='%Y-%m-%d')
+    events = events[(events['日期'] >= start_date) & (events['日期'] <= end_date)]
+
     print("关键事件时间线:")
     print("-" * 50)
-    print("2023-05-24: 英伟达发布2024财年第一季度财报")
-    print("           营收71.9亿美元，超出预期")
-    print("           数据中心业务营收创纪录")
-    print("           对第二季度营收给出强劲指引")
-    print()
-    print("2023-05-28: NVIDIA在COMPUTEX 2023发布重大公告")
-    print("           推出新一代AI芯片和平台")
-    print("           与主要云服务提供商建立合作伙伴关系")
-    print()
-    print("2023-05-30: 多家投行上调英伟达目标价")
-    print("           分析师看好AI芯片需求前景")
-    print()
-    print("2023-06-01: 媒体报道英伟达成为AI热潮最大受益者")
-    print("           ChatGPT等生成式AI应用推动需求激增")
+    for _, event in events.iterrows():
+        print(f"{event['日期'].strftime('%Y-%m-%d')}: {event['事件']}")
+        for detail in str(event['详情']).split('；'):
+            print(f"           {detail}")
+        print()
+    print("更多事件窗口的异常收益分析请运行 event_study.py")
     
     print()
     print("关键因素分析:")
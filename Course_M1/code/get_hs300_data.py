@@ -1,31 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import akshare as ak
+import asyncio
+import sys
 import pandas as pd
-import time
 from datetime import datetime
 import os
 
-def get_hs300_constituents():
+from data_sources import AkshareDataSource, fetch_stock_bars, fetch_adj_factors
+from price_store import PriceStore
+from constituent_history import load_membership, save_membership, record_snapshot, members_between
+from universes import PRICE_STORE_DIR, get_universe, get_universe_constituents, get_inclusion_dates, universe_files
+from data_quality import validate_history, print_summary, write_report, quality_report_path
+
+def get_hs300_constituents(source=None):
     """获取沪深300指数成分股"""
-    print("正在获取沪深300指数成分股...")
-    try:
-        # 获取沪深300指数成分股
-        hs300_df = ak.index_stock_cons_csindex(symbol="000300")
-        print(f"成功获取 {len(hs300_df)} 只沪深300成分股")
-        return hs300_df
-    except Exception as e:
-        print(f"获取沪深300成分股失败: {e}")
-        return None
+    return get_universe_constituents('hs300', source)
 
-def get_stock_history_data(stock_code, stock_name, start_date, end_date):
+def get_stock_history_data(stock_code, stock_name, start_date, end_date, source=None):
     """获取单只股票的历史前复权数据"""
     try:
         # 获取前复权日线数据
-        stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", 
-                                     start_date=start_date, end_date=end_date, 
-                                     adjust="qfq")
+        source = source or AkshareDataSource()
+        stock_df = asyncio.run(source.get_daily_bars(stock_code, start_date, end_date, adjust="qfq"))
         
         # 添加股票代码和名称列
         stock_df['股票代码'] = stock_code
@@ -37,59 +34,105 @@ def get_stock_history_data(stock_code, stock_name, start_date, end_date):
         print(f"获取 {stock_name}({stock_code}) 数据失败: {e}")
         return None
 
-def main():
+def main(source=None, concurrency=8, universe='hs300'):
+    """
+    获取股票池成分股的历史数据
+    
+    Parameters:
+    source: DataSource, 数据源，默认使用akshare
+    concurrency: int, 并发请求数
+    universe: str, 股票池：hs300 / csi500 / csi1000 / all（所有股票池共用同一个价格存储）
+    """
     # 设置时间范围
     start_date = "20230901"
     end_date = "20250831"
     
     # 输出文件路径
-    output_file = "../data/hs300_stock_data.csv"
+    universe_name = get_universe(universe)['名称']
+    files = universe_files(universe)
+    output_file = files['data']
+    membership_file = files['membership']
+    store_dir = PRICE_STORE_DIR
     
-    print("开始获取沪深300成分股历史数据...")
+    print(f"开始获取{universe_name}成分股历史数据...")
     print(f"时间范围: {start_date} 至 {end_date}")
     
-    # 获取沪深300成分股
-    hs300_df = get_hs300_constituents()
-    if hs300_df is None or len(hs300_df) == 0:
-        print("无法获取沪深300成分股，程序退出")
+    # 获取成分股
+    source = source or AkshareDataSource()
+    cons_df = get_universe_constituents(universe, source)
+    if cons_df is None or len(cons_df) == 0:
+        print(f"无法获取{universe_name}成分股，程序退出")
         return
     
     # 显示成分股信息
-    print("\n沪深300成分股前10只:")
-    print(hs300_df[['成分券代码', '成分券名称']].head(10))
+    print(f"\n{universe_name}成分股前10只:")
+    print(cons_df[['成分券代码', '成分券名称']].head(10))
     
-    all_data = []
-    total_stocks = len(hs300_df)
+    # 更新成分股时点区间表，并补充时间范围内曾经属于指数、但已被剔除的股票
+    # 首次建表时用指数的纳入日期确定现有成分股的区间起点，而不是把今天的名单回溯到起始日期
+    membership = load_membership(membership_file) if os.path.exists(membership_file) else None
+    snapshot = cons_df
+    if membership is None:
+        inclusion = get_inclusion_dates(universe, source)
+        if inclusion is not None:
+            snapshot = cons_df.drop(columns=['纳入日期'], errors='ignore').merge(
+                inclusion.drop_duplicates('成分券代码', keep='last'), on='成分券代码', how='left')
+    membership = record_snapshot(membership, snapshot, datetime.today(), default_start=start_date)
+    save_membership(membership, membership_file)
     
-    print(f"\n开始批量获取 {total_stocks} 只股票的历史数据...")
+    history_members = members_between(membership, start_date, end_date)
+    removed = history_members[~history_members['股票代码'].isin(cons_df['成分券代码'])]
+    if len(removed) > 0:
+        print(f"补充 {len(removed)} 只期间内被剔除的历史成分股")
+        cons_df = pd.concat([
+            cons_df[['成分券代码', '成分券名称']],
+            removed.rename(columns={'股票代码': '成分券代码', '股票名称': '成分券名称'})
+        ], ignore_index=True)
     
-    # 遍历所有成分股获取数据
-    for i, (index, row) in enumerate(hs300_df.iterrows(), 1):
-        stock_code = row['成分券代码']
-        stock_name = row['成分券名称']
-        
-        print(f"\n[{i}/{total_stocks}] 正在获取 {stock_name}({stock_code}) 的数据...")
-        
-        # 获取股票历史数据
-        stock_data = get_stock_history_data(stock_code, stock_name, start_date, end_date)
-        
-        if stock_data is not None and len(stock_data) > 0:
-            all_data.append(stock_data)
-        
-        # 添加延迟避免请求过于频繁
-        time.sleep(0.1)
+    total_stocks = len(cons_df)
+    
+    # 价格存储只保存不复权数据：已有的股票只增量获取最后日期之后的行情
+    # （多个股票池共用同一个存储，其他股票池已下载过的股票同样只做增量更新）
+    store = PriceStore(store_dir)
+    last_dates = store.last_dates()
+    start_dates = {code: (day + pd.Timedelta(days=1)).strftime('%Y%m%d')
+                   for code, day in last_dates.items()}
+    n_incremental = int(cons_df['成分券代码'].isin(list(start_dates)).sum())
+    
+    print(f"\n开始并发获取 {total_stocks} 只股票的不复权历史数据（并发数 {concurrency}，"
+          f"增量更新 {n_incremental} 只）...")
     
-    if not all_data:
+    # 并发获取所有成分股数据，并发数限制代替逐只请求之间的固定延迟
+    all_data = asyncio.run(fetch_stock_bars(source, cons_df, start_date, end_date, concurrency,
+                                            adjust="", start_dates=start_dates))
+    
+    if all_data:
+        store.append_prices(pd.concat(all_data, ignore_index=True))
+    elif len(last_dates) == 0:
         print("没有获取到任何股票数据，程序退出")
         return
     
-    # 合并所有数据
-    print("\n正在合并所有股票数据...")
-    combined_df = pd.concat(all_data, ignore_index=True)
+    # 复权因子只追加新增的行（新的除权除息日），不需要重新下载历史行情
+    print("\n正在获取复权因子...")
+    factors = asyncio.run(fetch_adj_factors(source, cons_df['成分券代码'].tolist(), concurrency))
+    if factors is not None:
+        added = store.append_factors(factors)
+        print(f"新增复权因子 {added} 条")
+    
+    # 读取时计算前复权价格，输出与原来格式一致的CSV
+    print("\n正在生成前复权数据...")
+    combined_df = store.load('qfq', codes=cons_df['成分券代码'].astype(str).str.zfill(6).tolist(),
+                             start_date=start_date, end_date=end_date)
+    
+    # 数据质量检查：重复行、缺失交易日、零成交量、非正价格、疑似未复权跳空
+    print("\n正在检查数据质量...")
+    report = validate_history(combined_df)
+    print_summary(report)
+    print(f"问题报告已保存到 {write_report(report, quality_report_path(output_file))}")
     
     # 保存到CSV文件
     print(f"正在保存数据到 {output_file}...")
-    combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    combined_df.to_csv(output_file, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
     
     print(f"数据保存完成！共 {len(combined_df)} 条记录")
     
@@ -107,4 +150,5 @@ def main():
     print(f"总记录数: {len(combined_df)}")
 
 if __name__ == "__main__":
-    main()
+    # python get_hs300_data.py [hs300|csi500|csi1000|all]
+    main(universe=sys.argv[1] if len(sys.argv) > 1 else 'hs300')
@@ -4,15 +4,25 @@
 """
 获取英伟达(NVDA)股票历史数据并保存为CSV文件
 时间范围：2020-01-01 到 2025-08-26
+
+获取未按股息调整的原始日线，根据 Dividends 列生成复权因子表，
+再按因子计算前复权价格保存（与 yfinance 默认的 auto_adjust 结果口径一致）。
+原始日线和复权因子表同时保存，新的分红只会在因子表中增加一行。
 """
 
-import yfinance as yf
+import asyncio
 import pandas as pd
 import os
 
-def get_nvda_stock_data():
+from data_sources import YFinanceDataSource
+from price_store import factors_from_actions, adjust_with_factors
+
+def get_nvda_stock_data(source=None):
     """
     获取NVDA股票历史数据并保存为CSV文件
+    
+    Parameters:
+    source: DataSource, 数据源，默认使用yfinance
     """
     # 股票代码和时间范围
     ticker = "NVDA"
@@ -21,19 +31,30 @@ def get_nvda_stock_data():
     
     # 输出文件路径
     output_file = "../data/NVDA_stock_data_2020_2025.csv"
+    raw_file = f"../data/{ticker}_raw_prices.csv"
+    factor_file = f"../data/{ticker}_adj_factors.csv"
     
     print(f"正在获取 {ticker} 股票数据 ({start_date} 到 {end_date})...")
     
     try:
-        # 获取股票数据
-        stock = yf.Ticker(ticker)
-        data = stock.history(start=start_date, end=end_date)
+        # 获取未按股息调整的原始数据（yfinance 的价格已按拆股调整）
+        source = source or YFinanceDataSource()
+        raw = asyncio.run(source.get_us_bars(ticker, start_date, end_date, auto_adjust=False))
         
-        if data.empty:
+        if raw.empty:
             print("未获取到数据，请检查股票代码和时间范围")
             return
         
-        # 保存为CSV文件
+        # 由 Dividends 列生成复权因子表，按需计算前复权价格
+        factors = factors_from_actions(raw, ticker)
+        data = adjust_with_factors(raw, factors, adjust='qfq').drop(columns=['Adj Close'], errors='ignore')
+        print(f"除息次数: {len(factors) - 1}")
+        
+        # 保存原始数据、复权因子表和前复权数据
+        raw.to_csv(raw_file)
+        factors.to_csv(factor_file, index=False, date_format='%Y-%m-%d')
+        print(f"原始数据已保存到: {raw_file}")
+        print(f"复权因子表已保存到: {factor_file}")
         data.to_csv(output_file)
         print(f"数据已保存到: {output_file}")
         print(f"数据形状: {data.shape}")
@@ -49,8 +70,8 @@ def get_nvda_stock_data():
         print("3. Low: 最低价 - 交易日内的最低价格")
         print("4. Close: 收盘价 - 交易日结束时的股票价格")
         print("5. Volume: 成交量 - 交易日内的股票交易数量")
-        print("6. Dividends: 股息 - 如果有股息支付的话")
-        print("7. Stock Splits: 股票分割 - 如果有股票分割的话")
+        print("6. Dividends: 股息 - 如果有股息支付的话（已计入前复权价格和复权因子表）")
+        print("7. Stock Splits: 股票分割 - 如果有股票分割的话（yfinance 价格已按拆股调整）")
         
         # 显示基本统计信息
         print(f"\n数据统计信息:")
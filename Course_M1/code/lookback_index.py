@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回看收益率索引
+功能：
+1. 全部历史数据按 (股票代码, 日期) 排成一个有序数组，键为 股票编号 × 2^20 + int32日序号，
+   任意日期、任意一批股票的“当天或之前最近一行”用一次 searchsorted 定位
+2. 两种回看方式：
+   - calendar：自然日偏移（30/90/180/365天），与原有“≤ 目标日期”的定义完全一致
+   - trading：交易日偏移（21/63/126/252个交易日），直接在该股票的行号上减去偏移量，纯整数运算，
+     不受春节等长假影响
+3. 停牌显式处理：每行记录其在全市场交易日历中的位置，可以算出回看窗口内的停牌天数，
+   超过 max_gap 的股票该周期收益率记为NaN
+"""
+
+import numpy as np
+import pandas as pd
+
+from date_utils import to_day_numbers
+
+CALENDAR_PERIODS = [
+    ('1个月收益率', 30),
+    ('3个月收益率', 90),
+    ('6个月收益率', 180),
+    ('12个月收益率', 365),
+]
+TRADING_DAY_PERIODS = [
+    ('1个月收益率', 21),
+    ('3个月收益率', 63),
+    ('6个月收益率', 126),
+    ('12个月收益率', 252),
+]
+LOOKBACK_MODES = {'calendar': CALENDAR_PERIODS, 'trading': TRADING_DAY_PERIODS}
+
+_KEY_SHIFT = 1 << 20  # 日序号 < 2^20（约到4840年），股票编号占高位
+
+
+class LookbackIndex:
+    """
+    按 (股票代码, 日期) 排序的收盘价数组及回看查询
+
+    Parameters:
+    df: DataFrame, 长格式历史数据（日期、股票代码、收盘，可选股票名称）
+    """
+
+    def __init__(self, df):
+        data = df[['股票代码', '日期', '收盘'] + (['股票名称'] if '股票名称' in df.columns else [])]
+        data = data.sort_values(['股票代码', '日期'], kind='mergesort')
+
+        self.code_ids, self.codes = pd.factorize(data['股票代码'], sort=True)
+        self.days = to_day_numbers(data['日期'])
+        self.close = data['收盘'].to_numpy(dtype=float)
+        self.keys = self.code_ids.astype(np.int64) * _KEY_SHIFT + self.days
+
+        # 每只股票在数组中的起止行号
+        self.stock_start = np.searchsorted(self.code_ids, np.arange(len(self.codes)), side='left')
+        self.stock_end = np.searchsorted(self.code_ids, np.arange(len(self.codes)), side='right')
+
+        # 全市场交易日历，以及每一行在日历中的位置（用于计算停牌天数）
+        self.calendar = np.unique(self.days)
+        self.market_pos = np.searchsorted(self.calendar, self.days)
+
+        if '股票名称' in data.columns:
+            # 与原实现一致：取该股票第一条记录的名称
+            self.names = data['股票名称'].to_numpy()[self.stock_start]
+        else:
+            self.names = np.array(self.codes, dtype=object)
+
+    def code_index(self, codes=None):
+        """股票代码 -> 股票编号；不存在的代码返回 -1"""
+        if codes is None:
+            return np.arange(len(self.codes))
+        return self.codes.get_indexer(pd.Index(codes).astype(str))
+
+    def asof_rows(self, code_ids, day):
+        """
+        每只股票在 day（日序号，可以是数组）当天或之前最近一行的行号；没有数据的为 -1
+        """
+        day = np.asarray(day)
+        rows = np.searchsorted(self.keys, code_ids.astype(np.int64) * _KEY_SHIFT + day, side='right') - 1
+        valid = (code_ids >= 0) & (rows >= self.stock_start[np.clip(code_ids, 0, None)])
+        return np.where(valid, rows, -1)
+
+    def lookback_returns(self, calculation_date, mode='calendar', codes=None, periods=None, max_gap=None):
+        """
+        计算指定日期一批股票的各周期收益率（%）
+
+        Parameters:
+        calculation_date: 计算日期
+        mode: str, 'calendar'（自然日偏移）或 'trading'（交易日偏移）
+        codes: list, 股票代码（None 表示全部股票）
+        periods: list of (列名, 偏移量)，默认按 mode 取 CALENDAR_PERIODS / TRADING_DAY_PERIODS
+        max_gap: int, 回看窗口内允许的最多停牌交易日数；超过时该周期收益率为NaN（None 表示不限制）
+
+        Returns:
+        DataFrame: 股票代码, 股票名称, 各周期收益率, 最大停牌天数（只含计算日期前有数据的股票）
+        """
+        periods = periods or LOOKBACK_MODES[mode]
+        day = to_day_numbers([pd.Timestamp(calculation_date)])[0]
+        code_ids = self.code_index(codes)
+        code_ids = code_ids[code_ids >= 0]
+
+        latest = self.asof_rows(code_ids, day)
+        has_data = latest >= 0
+        code_ids, latest = code_ids[has_data], latest[has_data]
+        latest_close = self.close[latest]
+
+        result = pd.DataFrame({
+            '股票代码': np.asarray(self.codes)[code_ids],
+            '股票名称': self.names[code_ids],
+        })
+        max_gaps = np.zeros(len(code_ids), dtype=np.int64)
+        for name, offset in periods:
+            if mode == 'calendar':
+                past = self.asof_rows(code_ids, day - offset)
+            else:
+                # 交易日偏移：该股票自己的行号直接减去偏移量
+                past = latest - offset
+                past = np.where(past >= self.stock_start[code_ids], past, -1)
+            valid = past >= 0
+            safe_past = np.where(valid, past, 0)
+
+            returns = np.where(valid, (latest_close / self.close[safe_past] - 1) * 100, np.nan)
+            if mode == 'trading':
+                # 窗口内全市场交易日数 - 该股票交易日数 = 停牌天数
+                gap = np.where(valid, self.market_pos[latest] - self.market_pos[safe_past] - offset, 0)
+                max_gaps = np.maximum(max_gaps, gap)
+                if max_gap is not None:
+                    returns = np.where(gap > max_gap, np.nan, returns)
+            result[name] = returns
+        result['停牌天数'] = max_gaps
+        result['最新交易日'] = pd.DatetimeIndex(self.days[latest].astype('datetime64[D]'))
+        return result
+
+
+def percentile_scores(returns, periods=None):
+    """
+    在收益率表上计算各周期百分位值和动量分数（整列一次排名）
+
+    rank(method='max', pct=True) 等价于原实现的 (valid <= x).mean()，NaN 不参与排名。
+    """
+    periods = periods or [name for name, _ in CALENDAR_PERIODS]
+    result = returns.copy()
+    percentile_cols = []
+    for period in periods:
+        col = f'{period}百分位值'
+        result[col] = result[period].rank(method='max', pct=True) * 100
+        percentile_cols.append(col)
+    result['动量分数'] = result[percentile_cols].mean(axis=1)
+    return result
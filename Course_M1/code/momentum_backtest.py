@@ -3,26 +3,103 @@
 
 import pandas as pd
 import numpy as np
-import akshare as ak
+import argparse
+import asyncio
+import os
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from data_sources import AkshareDataSource
+from date_utils import parse_dates, normalize_date_column, to_day_numbers
+from constituent_history import load_membership, MembershipMask
+from portfolio_weights import build_returns_panel, rebalance_weights
+from results_writer import ResultsWriter, details_frame, format_table
+from significance import monthly_universe_returns
+from chart_rendering import line_chart_spec, render_charts
+from lookback_index import LookbackIndex, LOOKBACK_MODES, percentile_scores
+from sector_neutral import load_industry_map, attach_industry, sector_neutral_scores, select_with_sector_cap
+from universes import PRICE_STORE_DIR, get_universe, universe_files, load_universe_panel
+from price_store import PriceStore
+from arrow_exchange import ARROW_DIR, arrow_available, export_backtest
+from risk_model import FactorRiskModel
+from data_quality import validate_history, clean_history, print_summary
+from checkpoint import BacktestCheckpoint, config_fingerprint, restore_details
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 回测月份（每月第一个交易日调仓）
+BACKTEST_MONTHS = [
+    (2025, 1), (2025, 2), (2025, 3), (2025, 4),
+    (2025, 5), (2025, 6), (2025, 7), (2025, 8)
+]
+
+# 检查点根目录（每个股票池一个子目录）
+CHECKPOINT_DIR = '../data/checkpoints'
+
 class MomentumBacktest:
-    def __init__(self, data_file='hs300_stock_data.csv'):
+    def __init__(self, data_file='hs300_stock_data.csv', data_source=None, membership_file=None,
+                 weighting='equal', cov_window=60, results_writer=None,
+                 industry_file=None, sector_neutral=False, max_per_sector=None,
+                 lookback='calendar', max_gap=None, universe='hs300',
+                 months=None, checkpoint_dir=None, checkpoint_every=1,
+                 price_data=None, membership_mask=None):
         """
         初始化回测类
         
         Parameters:
         data_file: str, 历史数据文件路径
+        data_source: DataSource, 获取基准ETF数据的数据源，默认使用akshare
+        membership_file: str, 成分股时点区间表路径；提供时每个调仓日只对当时的成分股打分
+        weighting: str, 加权方案：equal / score / inverse_vol / min_variance / risk_parity
+        cov_window: int, 估计协方差矩阵使用的交易日窗口长度
+        results_writer: ResultsWriter, 提供时持仓明细边回测边写入磁盘，不在内存中保留
+        industry_file: str, 行业映射表路径（股票代码, 行业）
+        sector_neutral: bool, 是否在行业内部计算百分位值（行业中性动量分数）
+        max_per_sector: int, 选股时每个行业最多入选的股票数量
+        lookback: str, 回看方式：calendar（30/90/180/365个自然日）/ trading（21/63/126/252个交易日）
+        max_gap: int, trading 模式下回看窗口内允许的最多停牌交易日数，超过时该周期收益率为NaN
+        universe: str, 股票池：hs300 / csi500 / csi1000 / all，决定基准ETF
+        months: list of (年, 月), 回测月份，默认 BACKTEST_MONTHS
+        checkpoint_dir: str, 检查点目录；提供时每完成 checkpoint_every 个调仓期写一次检查点，
+                        再次运行时跳过已完成的调仓期
+        checkpoint_every: int, 写检查点的间隔（调仓期数）
+        price_data: DataFrame, 预先加载的长格式日线（如 universes.load_universe_panel 的结果，
+                    多个股票池、多个回测配置共用一份）；提供时不再读取 data_file
+        membership_mask: MembershipMask, 预先生成的成分矩阵；提供时不再读取 membership_file
         """
         self.data_file = data_file
+        self.data_source = data_source
+        self.membership_file = membership_file
+        self.membership_mask = membership_mask
+        self.price_data = price_data
+        self.weighting = weighting
+        self.cov_window = cov_window
+        self.returns_panel = None
+        self.results_writer = results_writer
+        self.industry_file = industry_file
+        self.industry_map = None
+        self.sector_neutral = sector_neutral
+        self.max_per_sector = max_per_sector
+        self.lookback = lookback
+        self.max_gap = max_gap
+        self.lookback_index = None
+        self.universe = universe
+        self.benchmark = get_universe(universe)
+        self.trading_days = None
+        self.etf_returns = None
+        self.momentum_scores = {}
+        self.quantile_returns = None
+        self.rebalance_weights = []
+        self.risk_report = None
+        self.data_issues = None
+        self.months = list(months or BACKTEST_MONTHS)
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint = None
         self.df = None
         self.portfolio_returns = []
         self.portfolio_details = []
@@ -31,12 +108,32 @@ class MomentumBacktest:
         """加载历史数据"""
         print("正在加载历史数据...")
         try:
-            self.df = pd.read_csv(self.data_file)
+            self.df = self.price_data.copy() if self.price_data is not None else pd.read_csv(self.data_file)
             self.df['股票代码'] = self.df['股票代码'].astype(str).str.zfill(6)
-            self.df['日期'] = pd.to_datetime(self.df['日期'])
+            normalize_date_column(self.df, '日期', day_number_column='日序号')
+            
+            # 数据质量检查：问题记录保存在 data_issues 中；重复行和非正价格的行不参与计算
+            self.data_issues = validate_history(self.df)
+            print_summary(self.data_issues)
+            self.df = clean_history(self.df).reset_index(drop=True)
+            self.trading_days = pd.DatetimeIndex(np.sort(self.df['日期'].unique()))
+            self.lookback_index = LookbackIndex(self.df)
             print(f"成功加载数据，共 {len(self.df)} 条记录")
             print(f"股票数量: {self.df['股票代码'].nunique()}")
             print(f"数据时间范围: {self.df['日期'].min()} 至 {self.df['日期'].max()}")
+            
+            if self.membership_mask is not None:
+                print(f"使用共享加载的成分矩阵（{len(self.membership_mask.codes)} 只股票）")
+            elif self.membership_file:
+                membership = load_membership(self.membership_file)
+                self.membership_mask = MembershipMask(
+                    membership, self.df['日期'].unique(), self.df['股票代码'].unique()
+                )
+                print(f"已加载成分股时点区间表，共 {len(membership)} 条记录")
+            
+            if self.industry_file:
+                self.industry_map = load_industry_map(self.industry_file)
+                print(f"已加载行业映射表，共 {self.industry_map.nunique()} 个行业")
             return True
         except Exception as e:
             print(f"加载数据失败: {e}")
@@ -44,9 +141,10 @@ class MomentumBacktest:
     
     def get_trading_days(self, start_date, end_date):
         """获取指定时间范围内的交易日"""
-        mask = (self.df['日期'] >= start_date) & (self.df['日期'] <= end_date)
-        trading_days = sorted(self.df.loc[mask, '日期'].unique())
-        return trading_days
+        # 在有序的交易日历上二分查找，不再逐行扫描全部历史数据
+        start = self.trading_days.searchsorted(pd.Timestamp(start_date), side='left')
+        end = self.trading_days.searchsorted(pd.Timestamp(end_date), side='right')
+        return list(self.trading_days[start:end])
     
     def get_first_trading_day_of_month(self, year, month):
         """获取指定年月的第一个交易日"""
@@ -57,101 +155,99 @@ class MomentumBacktest:
         trading_days = self.get_trading_days(start_date, end_date)
         return trading_days[0] if trading_days else None
     
-    def calculate_momentum_score(self, calculation_date):
+    def calculate_momentum_score(self, calculation_date, top_n=30):
         """
         计算指定日期的动量分数
         
         Parameters:
         calculation_date: datetime, 计算日期
+        top_n: int, 返回动量分数最高的前N只股票；None 表示返回全部股票
         
         Returns:
         DataFrame: 包含动量分数的股票列表
         """
         print(f"\n计算 {calculation_date.strftime('%Y-%m-%d')} 的动量分数...")
         
-        # 计算各个时间段的起始日期
-        one_month_ago = calculation_date - timedelta(days=30)
-        three_months_ago = calculation_date - timedelta(days=90)
-        six_months_ago = calculation_date - timedelta(days=180)
-        twelve_months_ago = calculation_date - timedelta(days=365)
+        # 只对计算日期当天的指数成分股打分（未提供区间表时使用全部股票）
+        if self.membership_mask is not None:
+            stock_codes = self.membership_mask.members(calculation_date)
+        else:
+            stock_codes = None
         
-        results = []
-        
-        # 筛选计算日期之前的数据
-        historical_data = self.df[self.df['日期'] <= calculation_date]
-        
-        for stock_code in self.df['股票代码'].unique():
-            stock_data = historical_data[historical_data['股票代码'] == stock_code].copy()
-            stock_data = stock_data.sort_values('日期')
-            
-            if len(stock_data) == 0:
-                continue
-                
-            # 获取股票名称
-            stock_name = stock_data['股票名称'].iloc[0]
-            
-            try:
-                # 最新收盘价（计算日期当天或之前最近的）
-                latest_data = stock_data[stock_data['日期'] <= calculation_date]
-                if len(latest_data) == 0:
-                    continue
-                latest_close = latest_data.iloc[-1]['收盘']
-                
-                # 计算各时间段收益率
-                def get_return(target_date):
-                    target_data = stock_data[stock_data['日期'] <= target_date]
-                    if len(target_data) > 0:
-                        target_close = target_data.iloc[-1]['收盘']
-                        return (latest_close / target_close - 1) * 100
-                    else:
-                        return np.nan
-                
-                one_month_return = get_return(one_month_ago)
-                three_months_return = get_return(three_months_ago)
-                six_months_return = get_return(six_months_ago)
-                twelve_months_return = get_return(twelve_months_ago)
-                
-                results.append({
-                    '股票代码': stock_code,
-                    '股票名称': stock_name,
-                    '1个月收益率': one_month_return,
-                    '3个月收益率': three_months_return,
-                    '6个月收益率': six_months_return,
-                    '12个月收益率': twelve_months_return
-                })
-                
-            except (IndexError, ValueError):
-                continue
-        
-        # 创建结果DataFrame
-        result_df = pd.DataFrame(results)
+        # 各周期收益率：在 (股票代码, 日期) 有序数组上批量定位回看行号
+        result_df = self.lookback_index.lookback_returns(
+            calculation_date, mode=self.lookback, codes=stock_codes, max_gap=self.max_gap
+        )
+        result_df = result_df.drop(columns=['最新交易日'] if self.lookback == 'trading' else ['最新交易日', '停牌天数'])
         
         if len(result_df) == 0:
             return result_df
         
         # 计算百分位值
-        periods = ['1个月收益率', '3个月收益率', '6个月收益率', '12个月收益率']
-        
-        for period in periods:
-            valid_returns = result_df[period].dropna()
-            if len(valid_returns) > 0:
-                result_df[f'{period}百分位值'] = result_df[period].apply(
-                    lambda x: (valid_returns <= x).mean() * 100 if pd.notna(x) else np.nan
-                )
-            else:
-                result_df[f'{period}百分位值'] = np.nan
+        periods = [name for name, _ in LOOKBACK_MODES[self.lookback]]
+        
+        if self.sector_neutral and self.industry_map is not None:
+            # 行业中性：各周期百分位值在行业内部计算（一次分组排名）
+            result_df = sector_neutral_scores(result_df, self.industry_map, periods=periods)
+            result_df = result_df.sort_values('动量分数', ascending=False)
+            if top_n is not None:
+                result_df = self.select_top(result_df, top_n)
+            print(f"成功计算 {len(result_df)} 只股票的行业中性动量分数")
+            return result_df
         
-        # 计算动量分数（百分位值的平均值）
-        percentile_cols = [f'{period}百分位值' for period in periods]
-        result_df['动量分数'] = result_df[percentile_cols].mean(axis=1)
+        # 各周期百分位值（整列一次排名）及动量分数（百分位值的平均值）
+        result_df = percentile_scores(result_df, periods)
         
         # 按动量分数排序，选择前30名
-        result_df = result_df.sort_values('动量分数', ascending=False).head(30)
+        result_df = result_df.sort_values('动量分数', ascending=False)
+        if top_n is not None:
+            result_df = self.select_top(result_df, top_n)
         
         print(f"成功计算 {len(result_df)} 只股票的动量分数")
         return result_df
     
-    def calculate_monthly_return(self, stock_list, start_date, end_date):
+    def select_top(self, momentum_scores, top_n=30):
+        """
+        按动量分数选出前N只股票；设置了 max_per_sector 时每个行业最多入选 max_per_sector 只
+        
+        Parameters:
+        momentum_scores: DataFrame, calculate_momentum_score 的结果
+        top_n: int, 入选股票数量
+        
+        Returns:
+        DataFrame: 入选股票，按动量分数降序
+        """
+        if self.max_per_sector is None or self.industry_map is None:
+            return momentum_scores.sort_values('动量分数', ascending=False).head(top_n)
+        if '行业' not in momentum_scores.columns:
+            momentum_scores = attach_industry(momentum_scores, self.industry_map)
+        return select_with_sector_cap(momentum_scores, top_n, self.max_per_sector)
+    
+    def calculate_portfolio_weights(self, periods):
+        """
+        批量计算所有调仓日的组合权重
+        
+        Parameters:
+        periods: list, 每个调仓期的字典（包含 date 调仓日、stocks 入选股票）
+        
+        Returns:
+        list: 每个调仓期一个 {股票代码: 权重} 字典
+        """
+        code_lists = [p['stocks']['股票代码'].tolist() for p in periods]
+        if self.weighting != 'equal' and self.returns_panel is None:
+            self.returns_panel = build_returns_panel(self.df)
+        
+        weights = rebalance_weights(
+            self.returns_panel,
+            [p['date'] for p in periods],
+            code_lists,
+            scores=[p['stocks']['动量分数'].to_numpy() for p in periods],
+            scheme=self.weighting,
+            window=self.cov_window
+        )
+        return [dict(zip(codes, w)) for codes, w in zip(code_lists, weights)]
+    
+    def calculate_monthly_return(self, stock_list, start_date, end_date, weights=None):
         """
         计算投资组合在指定月份的收益率
         
@@ -159,38 +255,30 @@ class MomentumBacktest:
         stock_list: list, 股票代码列表
         start_date: datetime, 月初日期
         end_date: datetime, 月末日期
+        weights: dict, {股票代码: 权重}，默认等权重
         
         Returns:
         dict: 包含每只股票收益率和组合总收益率的字典
         """
         print(f"计算投资组合 {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')} 的收益率...")
         
-        stock_returns = {}
-        valid_returns = []
+        # 月初、月末价格：在 (股票代码, 日期) 有序数组上批量定位当天或之前最近一行
+        stock_list = np.asarray(stock_list, dtype=str)
+        code_ids = self.lookback_index.code_index(stock_list)
+        start_rows = self.lookback_index.asof_rows(code_ids, to_day_numbers([start_date])[0])
+        end_rows = self.lookback_index.asof_rows(code_ids, to_day_numbers([end_date])[0])
+        valid = (start_rows >= 0) & (end_rows >= 0)
         
-        for stock_code in stock_list:
-            stock_data = self.df[self.df['股票代码'] == stock_code].copy()
-            stock_data = stock_data.sort_values('日期')
-            
-            # 获取月初价格
-            start_data = stock_data[stock_data['日期'] <= start_date]
-            if len(start_data) == 0:
-                continue
-            start_price = start_data.iloc[-1]['收盘']
-            
-            # 获取月末价格
-            end_data = stock_data[stock_data['日期'] <= end_date]
-            if len(end_data) == 0:
-                continue
-            end_price = end_data.iloc[-1]['收盘']
-            
-            # 计算收益率
-            monthly_return = (end_price / start_price - 1) * 100
-            stock_returns[stock_code] = monthly_return
-            valid_returns.append(monthly_return)
+        close = self.lookback_index.close
+        valid_returns = (close[end_rows[valid]] / close[start_rows[valid]] - 1) * 100
+        stock_returns = dict(zip(stock_list[valid], valid_returns))
+        valid_weights = [weights.get(code, 0.0) if weights else 1.0 for code in stock_list[valid]]
         
-        # 计算等权重投资组合收益率
-        portfolio_return = np.mean(valid_returns) if valid_returns else 0
+        # 计算加权投资组合收益率（缺失数据的股票权重按比例分配给其余股票）
+        if len(valid_returns) > 0 and sum(valid_weights) > 0:
+            portfolio_return = np.average(valid_returns, weights=valid_weights)
+        else:
+            portfolio_return = 0
         
         return {
             'stock_returns': stock_returns,
@@ -198,21 +286,67 @@ class MomentumBacktest:
             'valid_stocks': len(valid_returns)
         }
     
-    def run_backtest(self):
-        """运行回测"""
+    def checkpoint_config(self):
+        """影响回测结果的参数（用于计算检查点指纹）"""
+        return {
+            'data_file': self.data_file, 'membership_file': self.membership_file,
+            'weighting': self.weighting, 'cov_window': self.cov_window,
+            'industry_file': self.industry_file, 'sector_neutral': self.sector_neutral,
+            'max_per_sector': self.max_per_sector, 'lookback': self.lookback, 'max_gap': self.max_gap,
+            'universe': self.universe, 'months': self.months,
+        }
+    
+    def restore_checkpoint(self):
+        """
+        从检查点恢复已完成的调仓期
+        
+        Returns:
+        set: 已完成调仓期的调仓日
+        """
+        self.checkpoint = BacktestCheckpoint(
+            self.checkpoint_dir, config_fingerprint(self.checkpoint_config(), self.data_file)
+        )
+        state = self.checkpoint.load()
+        if state is None:
+            self.checkpoint.clear()
+            return set()
+        
+        periods, holdings = state
+        for detail in restore_details(holdings):
+            self.rebalance_weights.append((detail['date'], detail['weights']))
+            if self.results_writer is not None:
+                self.results_writer.write_period(detail)
+            else:
+                self.portfolio_details.append(detail)
+        self.portfolio_returns = periods.to_dict('records')
+        print(f"从检查点恢复 {len(self.portfolio_returns)} 个已完成的调仓期")
+        return set(periods['date'])
+    
+    def run_backtest(self, resume=True):
+        """
+        运行回测
+        
+        Parameters:
+        resume: bool, 设置了 checkpoint_dir 时是否从检查点继续；False 表示清除检查点重新运行
+        """
         print("开始运行动量策略回测...")
         print("="*50)
         
         if not self.load_data():
             return
         
-        # 定义回测时间范围
-        backtest_months = [
-            (2025, 1), (2025, 2), (2025, 3), (2025, 4),
-            (2025, 5), (2025, 6), (2025, 7), (2025, 8)
-        ]
-        
-        for year, month in backtest_months:
+        completed = set()
+        if self.checkpoint_dir:
+            if not resume:
+                BacktestCheckpoint(self.checkpoint_dir, None).clear()
+            completed = self.restore_checkpoint()
+            if self.checkpoint.complete:
+                print("检查点显示回测已全部完成，跳过计算")
+                return
+        
+        # 第一阶段：确定每个月的调仓日和入选股票（跳过检查点中已完成的调仓期）
+        periods = []
+        for year, month in self.months:
             print(f"\n{'='*60}")
             print(f"处理 {year}年{month}月")
             print(f"{'='*60}")
@@ -224,16 +358,19 @@ class MomentumBacktest:
                 continue
             
             print(f"该月第一个交易日: {first_trading_day.strftime('%Y-%m-%d')}")
+            if first_trading_day in completed:
+                print("该调仓期已在检查点中完成，跳过")
+                continue
             
-            # 计算动量分数并选择前30只股票
-            momentum_scores = self.calculate_momentum_score(first_trading_day)
+            # 计算全部股票的动量分数（分位数回测复用），再选择前30只股票
+            momentum_scores = self.calculate_momentum_score(first_trading_day, top_n=None)
+            self.momentum_scores[first_trading_day] = momentum_scores
             if len(momentum_scores) == 0:
                 print("无法计算动量分数")
                 continue
             
             # 获取前30只股票
-            top_30_stocks = momentum_scores.head(30)
-            selected_stocks = top_30_stocks['股票代码'].tolist()
+            top_30_stocks = self.select_top(momentum_scores, 30)
             
             print(f"\n{year}年{month}月投资组合（前30只股票）:")
             print(f"{'排名':<4} {'股票代码':<8} {'股票名称':<10} {'动量分数':<10}")
@@ -255,28 +392,50 @@ class MomentumBacktest:
                 print("该月无交易日数据")
                 continue
             
-            last_trading_day = month_trading_days[-1]
+            periods.append({
+                'year': year,
+                'month': month,
+                'date': first_trading_day,
+                'end_date': month_trading_days[-1],
+                'stocks': top_30_stocks
+            })
+        
+        if not periods:
+            if self.checkpoint is not None:
+                self.checkpoint.flush(complete=True)
+            return
+        
+        # 第二阶段：一次性计算所有调仓日的权重，再逐月计算收益率
+        print(f"\n使用 {self.weighting} 加权方案计算组合权重...")
+        all_weights = self.calculate_portfolio_weights(periods)
+        
+        for period, weights in zip(periods, all_weights):
+            year, month = period['year'], period['month']
+            first_trading_day = period['date']
+            top_30_stocks = period['stocks']
+            selected_stocks = top_30_stocks['股票代码'].tolist()
             
             # 计算月收益率
             monthly_results = self.calculate_monthly_return(
-                selected_stocks, first_trading_day, last_trading_day
+                selected_stocks, first_trading_day, period['end_date'], weights
             )
             
             print(f"\n{year}年{month}月投资组合收益率:")
-            print(f"{'股票代码':<8} {'股票名称':<10} {'月收益率':<10}")
-            print("-" * 35)
+            print(f"{'股票代码':<8} {'股票名称':<10} {'权重':<8} {'月收益率':<10}")
+            print("-" * 45)
             
             for stock_code in selected_stocks:
                 if stock_code in monthly_results['stock_returns']:
                     stock_name = top_30_stocks[top_30_stocks['股票代码'] == stock_code]['股票名称'].iloc[0]
                     return_rate = monthly_results['stock_returns'][stock_code]
-                    print(f"{stock_code:<8} {stock_name:<10} {return_rate:>8.2f}%")
+                    print(f"{stock_code:<8} {stock_name:<10} {weights[stock_code] * 100:>6.2f}% {return_rate:>8.2f}%")
             
             portfolio_return = monthly_results['portfolio_return']
             print(f"\n投资组合总收益率: {portfolio_return:.2f}%")
             print(f"有效股票数量: {monthly_results['valid_stocks']}/30")
             
             # 保存结果
+            self.rebalance_weights.append((first_trading_day, weights))
             self.portfolio_returns.append({
                 'year': year,
                 'month': month,
@@ -285,30 +444,155 @@ class MomentumBacktest:
                 'valid_stocks': monthly_results['valid_stocks']
             })
             
-            self.portfolio_details.append({
+            detail = {
                 'year': year,
                 'month': month,
                 'date': first_trading_day,
                 'stocks': top_30_stocks,
-                'returns': monthly_results['stock_returns']
-            })
+                'returns': monthly_results['stock_returns'],
+                'weights': weights
+            }
+            if self.results_writer is not None:
+                self.results_writer.write_period(detail)
+            else:
+                self.portfolio_details.append(detail)
+            
+            # 定期写检查点：已完成的调仓期、持仓和净值
+            if self.checkpoint is not None:
+                self.checkpoint.record(self.portfolio_returns[-1], detail)
+                if len(self.checkpoint.periods) % self.checkpoint_every == 0:
+                    self.checkpoint.flush()
+        
+        if self.checkpoint is not None:
+            self.checkpoint.flush(complete=True)
+            print(f"\n检查点已保存到 {self.checkpoint_dir}")
     
-    def get_hs300_etf_data(self):
-        """获取沪深300ETF基金数据"""
-        print("\n获取沪深300ETF基金(510300)数据...")
+    def run_quantile_backtest(self, n_quantiles=10):
+        """
+        分位数组合回测：每个调仓日按动量分数把全部股票分成 n_quantiles 组，
+        同时计算各组（等权）及多空组合（最高组 - 最低组）的月收益率
+        
+        所有调仓期的分组结果拼成一张长表，按 (调仓期, 分组) 一次分组求均值，
+        不需要把回测重复运行 n_quantiles 次。
+        
+        Parameters:
+        n_quantiles: int, 分组数量，10 为十分位；第 n_quantiles 组为动量最强的一组
+        
+        Returns:
+        DataFrame: 每个调仓期一行，包含 Q1..Qn 和 多空 的月收益率（%）
+        """
+        print(f"\n开始运行 {n_quantiles} 分位数组合回测...")
+        if self.df is None and not self.load_data():
+            return None
+        
+        # 复用 run_backtest 已计算的动量分数；缺少的月份（如从检查点恢复的调仓期）补算
+        for year, month in self.months:
+            first_trading_day = self.get_first_trading_day_of_month(year, month)
+            if first_trading_day is not None and first_trading_day not in self.momentum_scores:
+                self.momentum_scores[first_trading_day] = self.calculate_momentum_score(
+                    first_trading_day, top_n=None
+                )
+        
+        dates = sorted(d for d, scores in self.momentum_scores.items() if len(scores) > 0)
+        if not dates:
+            print("无法计算动量分数")
+            return None
+        
+        # 每个调仓期的持有区间：调仓日至当月最后一个交易日
+        start_dates = pd.DatetimeIndex(dates)
+        month_ends = start_dates + pd.offsets.MonthEnd(0)
+        end_dates = self.trading_days[self.trading_days.searchsorted(month_ends, side='right') - 1]
+        
+        # 所有调仓期的分数拼成长表，组内按排名百分位一次性分组
+        scores = pd.concat(
+            [self.momentum_scores[d][['股票代码', '动量分数']].assign(period=i) for i, d in enumerate(dates)],
+            ignore_index=True
+        ).dropna(subset=['动量分数'])
+        pct_rank = scores.groupby('period')['动量分数'].rank(method='first', pct=True)
+        scores['quantile'] = np.ceil(pct_rank * n_quantiles).astype(int)
+        
+        # 从 调仓期 × 股票 的收益率矩阵中取出每行对应的持有期收益率
+        returns = monthly_universe_returns(self.df, start_dates, end_dates)
+        cols = returns.columns.get_indexer(scores['股票代码'])
+        values = returns.to_numpy()[scores['period'].to_numpy(), np.clip(cols, 0, None)]
+        scores['monthly_return'] = np.where(cols >= 0, values, np.nan) * 100
+        
+        table = scores.groupby(['period', 'quantile'])['monthly_return'].mean().unstack('quantile')
+        table = table.reindex(columns=range(1, n_quantiles + 1))
+        table.columns = [f'Q{q}' for q in table.columns]
+        table['多空'] = table[f'Q{n_quantiles}'] - table['Q1']
+        
+        table.insert(0, 'date', start_dates[table.index])
+        table.insert(0, 'month', start_dates[table.index].month)
+        table.insert(0, 'year', start_dates[table.index].year)
+        self.quantile_returns = table.reset_index(drop=True)
+        
+        return_cols = [c for c in self.quantile_returns.columns if c.startswith('Q') or c == '多空']
+        display = self.quantile_returns[return_cols].copy()
+        display.insert(0, '年月', [f"{y}-{m:02d}" for y, m in zip(self.quantile_returns['year'],
+                                                                  self.quantile_returns['month'])])
+        print("\n各分位数组合月收益率（%，Q1为动量最弱）:")
+        print(format_table(display, {c: '{:>7.2f}' for c in return_cols}))
+        
+        cumulative = ((1 + self.quantile_returns[return_cols] / 100).prod() - 1) * 100
+        print("\n各分位数组合累计收益率（%）:")
+        print(format_table(cumulative.to_frame('累计收益率').T, {c: '{:>7.2f}' for c in return_cols}))
+        return self.quantile_returns
+    
+    def run_risk_analysis(self, cov_window=252):
+        """
+        每个调仓日组合的风险分解：因子暴露（市场、规模、波动率、动量）、因子风险、特异风险和预测波动率
+        
+        风险模型在全部历史上一次性拟合（所有交易日的横截面回归批量求解），
+        每个调仓日只使用截至当日的因子收益率和残差。
+        
+        Parameters:
+        cov_window: int, 估计因子协方差和特异方差使用的交易日窗口
+        
+        Returns:
+        DataFrame: 每个调仓期一行
+        """
+        if not self.rebalance_weights:
+            print("没有调仓记录，请先运行回测")
+            return None
+        
+        print("\n拟合因子风险模型...")
+        model = FactorRiskModel(self.df, cov_window=cov_window)
+        report = model.rebalance_report(self.rebalance_weights)
+        report.insert(0, 'month', report['date'].dt.month)
+        report.insert(0, 'year', report['date'].dt.year)
+        self.risk_report = report
+        
+        display = report.drop(columns=['year', 'month'])
+        display['date'] = display['date'].dt.strftime('%Y-%m-%d')
+        print("\n各调仓日组合风险分解（风险为年化波动率，%）:")
+        print(format_table(display, {c: '{:>8.3f}' for c in display.columns if c != 'date'}))
+        return report
+    
+    def get_benchmark_etf_data(self):
+        """获取股票池对应的基准ETF基金数据"""
+        etf_symbol = self.benchmark['etf']
+        print(f"\n获取{self.benchmark['名称']}基准ETF基金({etf_symbol})数据...")
         try:
-            # 获取沪深300ETF基金数据
-            etf_data = ak.fund_etf_hist_em(symbol="510300", period="daily", 
-                                         start_date="20250101", end_date="20250831", 
-                                         adjust="qfq")
+            if self.data_source is None:
+                self.data_source = AkshareDataSource()
+            first_year, first_month = self.months[0]
+            last_year, last_month = self.months[-1]
+            start = f"{first_year}{first_month:02d}01"
+            end = (pd.Timestamp(last_year, last_month, 1) + pd.offsets.MonthEnd(0)).strftime('%Y%m%d')
+            etf_data = asyncio.run(self.data_source.get_etf_bars(etf_symbol, start, end))
             
-            etf_data['日期'] = pd.to_datetime(etf_data['日期'])
+            etf_data['日期'] = parse_dates(etf_data['日期'])
             print(f"成功获取ETF数据，共 {len(etf_data)} 条记录")
             return etf_data
         except Exception as e:
             print(f"获取ETF数据失败: {e}")
             return None
     
+    def get_hs300_etf_data(self):
+        """获取沪深300ETF基金数据（hs300 股票池的基准）"""
+        return self.get_benchmark_etf_data()
+    
     def calculate_cumulative_returns(self):
         """计算累计收益率并绘图对比"""
         if not self.portfolio_returns:
@@ -322,20 +606,18 @@ class MomentumBacktest:
         portfolio_df['cumulative_return'] = (1 + portfolio_df['portfolio_return'] / 100).cumprod() - 1
         
         print("\n投资组合月度收益率:")
-        print(f"{'年月':<8} {'月收益率':<10} {'累计收益率':<12}")
-        print("-" * 35)
-        for _, row in portfolio_df.iterrows():
-            print(f"{row['year']}-{row['month']:02d}   {row['portfolio_return']:>8.2f}%   {row['cumulative_return']*100:>10.2f}%")
+        print(self._format_monthly_table(portfolio_df['year'], portfolio_df['month'],
+                                         portfolio_df['portfolio_return'], portfolio_df['cumulative_return']))
         
-        # 获取沪深300ETF数据
-        etf_data = self.get_hs300_etf_data()
+        # 获取基准ETF数据
+        etf_data = self.get_benchmark_etf_data()
         if etf_data is None:
             print("无法获取ETF数据，跳过对比")
             return
         
         # 计算ETF月度收益率
         etf_monthly_returns = []
-        for year, month in [(2025, 1), (2025, 2), (2025, 3), (2025, 4), (2025, 5), (2025, 6), (2025, 7), (2025, 8)]:
+        for year, month in self.months:
             # 获取该月第一个和最后一个交易日
             start_date = datetime(year, month, 1)
             if month == 12:
@@ -357,11 +639,10 @@ class MomentumBacktest:
         etf_df = pd.DataFrame(etf_monthly_returns)
         etf_df['cumulative_return'] = (1 + etf_df['monthly_return'] / 100).cumprod() - 1
         
-        print("\n沪深300ETF月度收益率:")
-        print(f"{'年月':<8} {'月收益率':<10} {'累计收益率':<12}")
-        print("-" * 35)
-        for _, row in etf_df.iterrows():
-            print(f"{int(row['year'])}-{int(row['month']):02d}   {row['monthly_return']:>8.2f}%   {row['cumulative_return']*100:>10.2f}%")
+        print(f"\n基准ETF({self.benchmark['etf']})月度收益率:")
+        print(self._format_monthly_table(etf_df['year'], etf_df['month'],
+                                         etf_df['monthly_return'], etf_df['cumulative_return']))
+        self.etf_returns = etf_df
         
         # 绘制对比图
         self.plot_comparison(portfolio_df, etf_df)
@@ -372,99 +653,227 @@ class MomentumBacktest:
         
         print(f"\n最终累计收益率对比:")
         print(f"动量策略投资组合: {final_portfolio_return:.2f}%")
-        print(f"沪深300ETF基金:   {final_etf_return:.2f}%")
+        print(f"基准ETF({self.benchmark['etf']}):   {final_etf_return:.2f}%")
         print(f"超额收益:         {final_portfolio_return - final_etf_return:.2f}%")
     
+    def _format_monthly_table(self, years, months, monthly_return, cumulative_return):
+        """月度收益率表格（整体格式化输出）"""
+        table = pd.DataFrame({
+            '年月': [f"{int(y)}-{int(m):02d}" for y, m in zip(years, months)],
+            '月收益率': monthly_return.to_numpy(),
+            '累计收益率': cumulative_return.to_numpy() * 100,
+        })
+        return format_table(table, {'月收益率': '{:>8.2f}%', '累计收益率': '{:>10.2f}%'})
+    
     def plot_comparison(self, portfolio_df, etf_df):
-        """绘制投资组合与ETF的收益率对比图"""
-        plt.figure(figsize=(12, 8))
-        
-        # 创建时间轴
-        months = [f"{row['year']}-{row['month']:02d}" for _, row in portfolio_df.iterrows()]
-        
-        # 绘制累计收益率曲线
-        plt.plot(months, portfolio_df['cumulative_return'] * 100, 
-                marker='o', linewidth=2, label='Momentum Strategy Portfolio', color='blue')
-        plt.plot(months, etf_df['cumulative_return'] * 100, 
-                marker='s', linewidth=2, label='CSI 300 ETF (510300)', color='red')
-        
-        # 设置图表样式
-        plt.title('Cumulative Returns Comparison: Momentum Strategy vs CSI 300 ETF', 
-                 fontsize=16, fontweight='bold', pad=20)
-        plt.xlabel('Month', fontsize=12)
-        plt.ylabel('Cumulative Return (%)', fontsize=12)
-        plt.legend(fontsize=12, loc='upper left')
-        plt.grid(True, alpha=0.3)
-        
-        # 旋转x轴标签
-        plt.xticks(rotation=45)
-        
-        # 添加零线
-        plt.axhline(y=0, color='black', linestyle='--', alpha=0.5)
-        
-        # 调整布局
-        plt.tight_layout()
-        
-        # 保存图片
-        plt.savefig('momentum_strategy_comparison.png', dpi=300, bbox_inches='tight')
+        """绘制投资组合与ETF的收益率对比图（Agg后端渲染，不弹出窗口）"""
+        months = [f"{y}-{m:02d}" for y, m in zip(portfolio_df['year'], portfolio_df['month'])]
+        spec = line_chart_spec(
+            'momentum_strategy_comparison.png',
+            [{'x': months, 'y': portfolio_df['cumulative_return'].to_numpy() * 100,
+              'label': 'Momentum Strategy Portfolio', 'color': 'blue', 'marker': 'o'},
+             {'x': months, 'y': etf_df['cumulative_return'].to_numpy() * 100,
+              'label': f"{self.benchmark['label']} ETF ({self.benchmark['etf']})", 'color': 'red', 'marker': 's'}],
+            title=f"Cumulative Returns Comparison: Momentum Strategy vs {self.benchmark['label']} ETF",
+            xlabel='Month', ylabel='Cumulative Return (%)', date_axis=False,
+            figsize=(12, 8), dpi=300, max_points=None, zero_line=True
+        )
+        render_charts([spec])
         print("\n对比图已保存为: momentum_strategy_comparison.png")
-        
-        # 显示图片
-        plt.show()
     
-    def save_detailed_results(self):
-        """保存详细的回测结果"""
+    def save_detailed_results(self, html_report=False, arrow_dir=None):
+        """
+        保存详细的回测结果
+        
+        Parameters:
+        html_report: bool, 使用 results_writer 时是否额外生成自包含的HTML报告
+        arrow_dir: str, 提供且安装了pyarrow时，另外把价格面板、动量分数矩阵和回测结果导出为 Arrow IPC 文件
+        """
         if not self.portfolio_returns:
             return
         
+        if arrow_dir is not None and arrow_available():
+            paths = export_backtest(self, arrow_dir, prefix=self.universe)
+            print(f"\nArrow IPC 文件已导出到 {arrow_dir}: {', '.join(os.path.basename(p) for p in paths.values())}")
+        
         # 保存月度收益率
         portfolio_df = pd.DataFrame(self.portfolio_returns)
         portfolio_df['cumulative_return'] = (1 + portfolio_df['portfolio_return'] / 100).cumprod() - 1
-        portfolio_df.to_csv('momentum_backtest_results.csv', index=False, encoding='utf-8-sig')
         
-        # 保存每月的投资组合详情
-        detailed_results = []
-        for detail in self.portfolio_details:
-            for _, stock in detail['stocks'].iterrows():
-                stock_code = stock['股票代码']
-                monthly_return = detail['returns'].get(stock_code, np.nan)
-                detailed_results.append({
-                    'year': detail['year'],
-                    'month': detail['month'],
-                    'date': detail['date'],
-                    'stock_code': stock_code,
-                    'stock_name': stock['股票名称'],
-                    'momentum_score': stock['动量分数'],
-                    'monthly_return': monthly_return
-                })
+        if self.results_writer is not None:
+            # 明细已在回测过程中流式写入，这里只需写汇总并关闭文件
+            writer = self.results_writer
+            writer.write_summary(portfolio_df)
+            writer.close()
+            print("\n详细结果已保存:")
+            print(f"- {writer.summary_path}: 月度收益率汇总")
+            print(f"- {writer.details_path}: 每月投资组合详情（共 {writer.rows_written} 行）")
+            if self.quantile_returns is not None:
+                quantile_path = os.path.join(writer.output_dir, f'{writer.prefix}_quantile_returns.csv')
+                self.quantile_returns.to_csv(quantile_path, index=False, encoding='utf-8-sig')
+                print(f"- {quantile_path}: 分位数组合月收益率")
+            if self.risk_report is not None:
+                risk_path = os.path.join(writer.output_dir, f'{writer.prefix}_risk_report.csv')
+                self.risk_report.to_csv(risk_path, index=False, encoding='utf-8-sig')
+                print(f"- {risk_path}: 调仓日组合风险分解")
+            if html_report:
+                report_path = writer.write_html_report(
+                    portfolio_df, self.etf_returns,
+                    benchmark_label=f"{self.benchmark['label']} ETF ({self.benchmark['etf']})"
+                )
+                print(f"- {report_path}: HTML回测报告")
+            return
+        
+        portfolio_df.to_csv('momentum_backtest_results.csv', index=False, encoding='utf-8-sig')
         
-        detailed_df = pd.DataFrame(detailed_results)
+        # 保存每月的投资组合详情（各期明细一次性拼接）
+        detailed_df = pd.concat([details_frame(detail) for detail in self.portfolio_details],
+                                ignore_index=True)
         detailed_df.to_csv('momentum_portfolio_details.csv', index=False, encoding='utf-8-sig')
         
         print("\n详细结果已保存:")
         print("- momentum_backtest_results.csv: 月度收益率汇总")
         print("- momentum_portfolio_details.csv: 每月投资组合详情")
+        
+        if self.quantile_returns is not None:
+            self.quantile_returns.to_csv('momentum_quantile_returns.csv', index=False, encoding='utf-8-sig')
+            print("- momentum_quantile_returns.csv: 分位数组合月收益率")
+        
+        if self.risk_report is not None:
+            self.risk_report.to_csv('momentum_risk_report.csv', index=False, encoding='utf-8-sig')
+            print("- momentum_risk_report.csv: 调仓日组合风险分解")
+
+
+def summarize_periods(periods):
+    """回测月收益率序列的汇总：调仓期数、累计收益率、平均月收益率（%）"""
+    returns = pd.DataFrame(periods)['portfolio_return'] if len(periods) else pd.Series(dtype=float)
+    return {
+        'periods': len(returns),
+        'cumulative_return': float(((1 + returns / 100).prod() - 1) * 100),
+        'mean_monthly_return': float(returns.mean()),
+    }
+
+
+def run_parameter_sweep(configs, data_file, checkpoint_dir='../data/checkpoints', resume=True,
+                        output_file='sweep_summary.csv', **common):
+    """
+    参数扫描：逐个配置运行回测，每个配置使用独立的检查点目录
+    
+    中断后重新运行时，已完成的配置直接从检查点读取结果，未完成的配置从最后一个完成的调仓期继续。
+    
+    Parameters:
+    configs: list of dict, 每个配置的 MomentumBacktest 参数（如 weighting、lookback）
+    data_file: str, 历史数据文件路径
+    checkpoint_dir: str, 检查点根目录，每个配置按指纹建立子目录
+    resume: bool, 是否从已有检查点继续
+    output_file: str, 汇总表路径，每完成一个配置更新一次
+    **common: 所有配置共用的 MomentumBacktest 参数
+    
+    Returns:
+    DataFrame: 每个配置一行（配置参数、调仓期数、累计收益率、平均月收益率）
+    """
+    rows = []
+    for i, config in enumerate(configs, 1):
+        print(f"\n参数扫描 [{i}/{len(configs)}]: {config}")
+        backtest = MomentumBacktest(data_file, **common, **config)
+        fingerprint = config_fingerprint(backtest.checkpoint_config(), data_file)
+        backtest.checkpoint_dir = os.path.join(checkpoint_dir, fingerprint)
+        
+        checkpoint = BacktestCheckpoint(backtest.checkpoint_dir, fingerprint)
+        if resume and checkpoint.load() is not None and checkpoint.complete:
+            print("检查点显示该配置已完成，直接读取结果")
+            periods = checkpoint.periods
+        else:
+            backtest.run_backtest(resume=resume)
+            periods = backtest.portfolio_returns
+        
+        rows.append({**config, 'checkpoint': fingerprint, **summarize_periods(periods)})
+        summary = pd.DataFrame(rows)
+        summary.to_csv(output_file, index=False, encoding='utf-8-sig')
+    
+    summary = pd.DataFrame(rows)
+    print("\n参数扫描结果:")
+    print(summary.round(2).to_string(index=False))
+    print(f"\n汇总表已保存到 {output_file}")
+    return summary
 
 
-def main():
-    """主函数"""
-    print("多周期动量策略回测系统")
+def main(universe='hs300', sweep=False, resume=True, stream=False, html_report=False, from_store=False):
+    """
+    主函数
+    
+    Parameters:
+    universe: str, 股票池：hs300 / csi500 / csi1000 / all
+    sweep: bool, 运行加权方案 × 回看方式的参数扫描，而不是单次回测
+    resume: bool, 是否从检查点继续（中断后重新运行时跳过已完成的调仓期和配置）
+    stream: bool, 持仓明细边回测边写入压缩的列式文件（Parquet / gzip CSV），不在内存中保留
+    html_report: bool, 额外生成自包含的HTML报告（需要 stream）
+    from_store: bool, 从公共价格存储共享加载行情和成分矩阵（load_universe_panel），而不是读取股票池的CSV
+    """
+    print(f"多周期动量策略回测系统（{get_universe(universe)['名称']}）")
     print("="*50)
     
-    # 创建回测实例
-    backtest = MomentumBacktest('../data/hs300_stock_data.csv')
+    # 创建回测实例（存在成分股时点区间表时使用，以消除幸存者偏差）
+    files = universe_files(universe)
+    membership_file = files['membership']
+    membership_file = membership_file if os.path.exists(membership_file) else None
+    checkpoint_dir = os.path.join(CHECKPOINT_DIR, universe)
+    
+    # 共享加载：行情只读取一次，参数扫描的所有配置共用同一份面板和成分矩阵
+    data_file = files['data']
+    shared = {}
+    if from_store:
+        price_data, masks = load_universe_panel([universe])
+        shared = {'price_data': price_data, 'membership_mask': masks[universe]}
+        # 检查点指纹跟随价格存储的原始行情文件
+        data_file = PriceStore(PRICE_STORE_DIR).raw_file
+        print(f"已从价格存储共享加载 {price_data['股票代码'].nunique()} 只股票的行情")
+    
+    if sweep:
+        configs = [{'weighting': weighting, 'lookback': lookback}
+                   for weighting in ['equal', 'score', 'inverse_vol', 'risk_parity']
+                   for lookback in ['calendar', 'trading']]
+        run_parameter_sweep(configs, data_file, checkpoint_dir=os.path.join(checkpoint_dir, 'sweep'),
+                            resume=resume, output_file=f'{universe}_sweep_summary.csv',
+                            membership_file=membership_file, universe=universe, **shared)
+        return
+    
+    backtest = MomentumBacktest(
+        data_file,
+        membership_file=membership_file,
+        universe=universe,
+        checkpoint_dir=checkpoint_dir,
+        results_writer=ResultsWriter('.', prefix='momentum') if stream or html_report else None,
+        **shared
+    )
+    
+    # 运行回测（每完成一个调仓期写一次检查点，中断后重新运行从断点继续）
+    backtest.run_backtest(resume=resume)
+    
+    # 十分位组合回测（复用上面已计算的动量分数）
+    backtest.run_quantile_backtest(n_quantiles=10)
     
-    # 运行回测
-    backtest.run_backtest()
+    # 各调仓日组合的因子暴露和风险分解
+    backtest.run_risk_analysis()
     
     # 计算累计收益率并绘图对比
     backtest.calculate_cumulative_returns()
     
-    # 保存详细结果
-    backtest.save_detailed_results()
+    # 保存详细结果（同时导出 Arrow IPC 文件，供 Jupyter / 其他进程内存映射读取）
+    backtest.save_detailed_results(html_report=html_report, arrow_dir=ARROW_DIR)
     
     print("\n回测完成！")
 
 
 if __name__ == "__main__":
-    main()
+    # python momentum_backtest.py [hs300|csi500|csi1000|all] [--sweep] [--no-resume] [--stream] [--html] [--from-store]
+    parser = argparse.ArgumentParser(description='多周期动量策略回测')
+    parser.add_argument('universe', nargs='?', default='hs300', help='股票池：hs300 / csi500 / csi1000 / all')
+    parser.add_argument('--sweep', action='store_true', help='运行加权方案 × 回看方式的参数扫描')
+    parser.add_argument('--no-resume', dest='resume', action='store_false', help='忽略已有检查点，重新运行')
+    parser.add_argument('--stream', action='store_true', help='持仓明细流式写入 Parquet / gzip CSV，不在内存中保留')
+    parser.add_argument('--html', dest='html_report', action='store_true', help='额外生成自包含的HTML报告（隐含 --stream）')
+    parser.add_argument('--from-store', action='store_true', help='从公共价格存储共享加载行情和成分矩阵')
+    args = parser.parse_args()
+    main(args.universe, sweep=args.sweep, resume=args.resume, stream=args.stream, html_report=args.html_report,
+         from_store=args.from_store)
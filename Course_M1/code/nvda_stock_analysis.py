@@ -10,13 +10,18 @@ NVDA股票数据分析脚本
 4. 计算年化收益率和年化波动率
 """
 
+import os
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime
 import seaborn as sns
 
+from chart_rendering import line_chart_spec, histogram_spec, render_charts
+from date_utils import exchange_dates
+from arrow_exchange import ARROW_DIR, arrow_available, write_arrow
+
 # 设置中文字体支持
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
@@ -29,7 +34,7 @@ def load_and_preprocess_data(file_path):
     df = pd.read_csv(file_path)
     
     # 转换日期列
-    df['Date'] = pd.to_datetime(df['Date'])
+    df['Date'] = exchange_dates(df['Date'], 'US')
     df.set_index('Date', inplace=True)
     
     # 确保数据按日期排序
@@ -57,39 +62,24 @@ def calculate_daily_returns(df):
     
     return df
 
-def plot_cumulative_returns(df):
-    """绘制累计收益趋势图"""
-    print("\n正在绘制累计收益趋势图...")
-    
-    plt.figure(figsize=(14, 8))
-    
-    # 绘制累计收益率
-    plt.plot(df.index, df['Cumulative_Return'] * 100, 
-             linewidth=2, color='blue', label='累计收益率')
-    
-    # 设置图表标题和标签
-    plt.title('NVDA股票累计收益率趋势 (2020-2025)', fontsize=16, fontweight='bold')
-    plt.xlabel('日期', fontsize=12)
-    plt.ylabel('累计收益率 (%)', fontsize=12)
-    
-    # 设置日期格式
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-    
-    # 添加网格
-    plt.grid(True, alpha=0.3)
-    
-    # 添加图例
-    plt.legend(fontsize=12)
-    
-    # 调整布局
-    plt.tight_layout()
-    
-    # 保存图表
-    plt.savefig('nvda_cumulative_returns.png', dpi=300, bbox_inches='tight')
-    plt.show()
-    
-    print("累计收益趋势图已保存为 'nvda_cumulative_returns.png'")
+def plot_cumulative_returns(df, render=True):
+    """
+    绘制累计收益趋势图（长序列降采样后用Agg后端渲染）
+    
+    Parameters:
+    render: bool, 是否立即渲染；False 时只返回图表描述，由调用方批量并行渲染
+    """
+    spec = line_chart_spec(
+        'nvda_cumulative_returns.png',
+        [{'x': df.index.to_numpy(), 'y': df['Cumulative_Return'].to_numpy() * 100,
+          'label': '累计收益率', 'color': 'blue'}],
+        title='NVDA股票累计收益率趋势 (2020-2025)', xlabel='日期', ylabel='累计收益率 (%)'
+    )
+    if render:
+        print("\n正在绘制累计收益趋势图...")
+        render_charts([spec])
+        print("累计收益趋势图已保存为 'nvda_cumulative_returns.png'")
+    return spec
 
 def find_top_returns(df):
     """找到收益率最大和最小的前十日期"""
@@ -150,38 +140,31 @@ def calculate_annualized_metrics(df):
     
     return annualized_return, annualized_volatility
 
-def plot_daily_returns_distribution(df):
-    """绘制每日收益率分布图"""
-    print("\n正在绘制每日收益率分布图...")
-    
-    plt.figure(figsize=(12, 6))
-    
-    # 绘制直方图
-    plt.hist(df['Daily_Return'] * 100, bins=50, alpha=0.7, 
-             color='skyblue', edgecolor='black')
+def plot_daily_returns_distribution(df, render=True):
+    """
+    绘制每日收益率分布图
     
+    Parameters:
+    render: bool, 是否立即渲染；False 时只返回图表描述，由调用方批量并行渲染
+    """
     # 添加统计信息
     mean_return = df['Daily_Return'].mean() * 100
     std_return = df['Daily_Return'].std() * 100
     
-    plt.axvline(mean_return, color='red', linestyle='--', 
-                linewidth=2, label=f'均值: {mean_return:.2f}%')
-    plt.axvline(mean_return + std_return, color='orange', linestyle=':', 
-                linewidth=1, label=f'±1标准差')
-    plt.axvline(mean_return - std_return, color='orange', linestyle=':', 
-                linewidth=1)
-    
-    plt.title('NVDA每日收益率分布 (2020-2025)', fontsize=14, fontweight='bold')
-    plt.xlabel('日收益率 (%)', fontsize=12)
-    plt.ylabel('频次', fontsize=12)
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig('nvda_daily_returns_distribution.png', dpi=300, bbox_inches='tight')
-    plt.show()
-    
-    print("每日收益率分布图已保存为 'nvda_daily_returns_distribution.png'")
+    spec = histogram_spec(
+        'nvda_daily_returns_distribution.png', df['Daily_Return'].to_numpy() * 100, bins=50,
+        title='NVDA每日收益率分布 (2020-2025)', xlabel='日收益率 (%)',
+        vlines=[
+            {'x': mean_return, 'label': f'均值: {mean_return:.2f}%', 'color': 'red'},
+            {'x': mean_return + std_return, 'label': '±1标准差', 'color': 'orange', 'linestyle': ':', 'linewidth': 1},
+            {'x': mean_return - std_return, 'color': 'orange', 'linestyle': ':', 'linewidth': 1},
+        ]
+    )
+    if render:
+        print("\n正在绘制每日收益率分布图...")
+        render_charts([spec])
+        print("每日收益率分布图已保存为 'nvda_daily_returns_distribution.png'")
+    return spec
 
 def main():
     """主函数"""
@@ -199,8 +182,8 @@ def main():
         # 2. 计算收益率
         df = calculate_daily_returns(df)
         
-        # 3. 绘制累计收益趋势图
-        plot_cumulative_returns(df)
+        # 3. 准备累计收益趋势图（与分布图一起并行渲染）
+        chart_specs = [plot_cumulative_returns(df, render=False)]
         
         # 4. 找到收益率极值
         top_gains, top_losses = find_top_returns(df)
@@ -208,12 +191,19 @@ def main():
         # 5. 计算年化指标
         annualized_return, annualized_volatility = calculate_annualized_metrics(df)
         
-        # 6. 绘制收益率分布图
-        plot_daily_returns_distribution(df)
+        # 6. 并行渲染累计收益趋势图和收益率分布图
+        chart_specs.append(plot_daily_returns_distribution(df, render=False))
+        print("\n正在渲染图表...")
+        for path in render_charts(chart_specs):
+            print(f"图表已保存为 '{path}'")
         
         # 7. 保存分析结果到CSV
         df[['Close', 'Daily_Return', 'Cumulative_Return']].to_csv('nvda_analysis_results.csv')
         print(f"\n分析结果已保存到 'nvda_analysis_results.csv'")
+        if arrow_available():
+            arrow_file = write_arrow(df[['Close', 'Daily_Return', 'Cumulative_Return']],
+                                     os.path.join(ARROW_DIR, 'nvda_analysis_results.arrow'))
+            print(f"Arrow IPC 文件已保存到 '{arrow_file}'")
         
         print("\n" + "=" * 80)
         print("分析完成！")
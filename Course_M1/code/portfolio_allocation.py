@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+整手约束下的资金分配
+功能：
+1. 按目标权重把资金分配到各只股票，买入数量必须是整手（A股1手=100股）
+2. 同时兼顾两个目标：剩余现金尽量少、实际权重尽量贴近目标权重
+3. 全部持仓一次性向量化求解，数百只股票也只需毫秒级
+"""
+
+import pandas as pd
+import numpy as np
+
+
+def allocate_lots(prices, weights, capital, lot_size=100, fill_cash=True):
+    """
+    整手约束下的资金分配
+
+    Parameters:
+    prices: array-like, 每只股票的买入价格
+    weights: array-like, 目标权重（会自动归一化）
+    capital: float, 可用资金
+    lot_size: int, 每手股数
+    fill_cash: bool, 跟踪误差无法再改善后，是否继续用剩余现金加仓以减少闲置资金
+
+    Returns:
+    ndarray: 每只股票的买入手数；价格非正或缺失（停牌、无行情）的股票买入0手，其目标资金分给其余股票
+
+    算法：先按目标金额向下取整得到基础手数；之后每一轮为每只股票考虑"再加一手"，
+    按平方跟踪误差的改善量 c·(2d − c)（c为一手金额，d为距目标金额的差额）排序，
+    在现金约束内按累计金额一次取前缀。每轮每只股票最多加一手，通常几轮即可收敛。
+    """
+    prices = np.asarray(prices, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    # 一手金额为0时"再加一手"永远买得起，贪心循环不会结束；这类股票不参与分配
+    tradable = np.isfinite(prices) & (prices > 0)
+    if not tradable.all():
+        lots = np.zeros(len(prices), dtype=np.int64)
+        if tradable.any():
+            lots[tradable] = allocate_lots(prices[tradable], weights[tradable], capital, lot_size, fill_cash)
+        return lots
+
+    weights = weights / weights.sum()
+
+    lot_cost = prices * lot_size
+    target = weights * capital
+    lots = np.floor(target / lot_cost)
+    cash = capital - (lots * lot_cost).sum()
+
+    def add_round(allow_worse):
+        nonlocal cash
+        gap = target - lots * lot_cost
+        gain = lot_cost * (2 * gap - lot_cost)
+        candidate = lot_cost <= cash
+        if not allow_worse:
+            candidate &= gain > 0
+        if not candidate.any():
+            return False
+
+        idx = np.flatnonzero(candidate)
+        idx = idx[np.argsort(-gain[idx], kind='stable')]
+        # 候选都买得起，前缀至少包含一手
+        spend = np.cumsum(lot_cost[idx])
+        take = idx[spend <= cash]
+
+        lots[take] += 1
+        cash -= lot_cost[take].sum()
+        return True
+
+    # 第一阶段：只加能降低跟踪误差的手数
+    while add_round(allow_worse=False):
+        pass
+
+    # 第二阶段：用剩余现金加仓，优先选对跟踪误差影响最小的股票
+    if fill_cash:
+        while add_round(allow_worse=True):
+            pass
+
+    return lots.astype(np.int64)
+
+
+def build_allocation(snapshot, capital, price_col='开盘', weights=None, lot_size=100, fill_cash=True):
+    """
+    根据单日横截面行情生成整手持仓表
+
+    Parameters:
+    snapshot: DataFrame, 包含 股票代码、股票名称 和价格列
+    capital: float, 可用资金
+    price_col: str, 买入价格列
+    weights: array-like, 目标权重，默认等权重
+    lot_size: int, 每手股数
+
+    Returns:
+    DataFrame: 股票代码、股票名称、买入价、购买股数、投资金额、目标权重、实际权重
+    """
+    prices = snapshot[price_col].to_numpy(dtype=float)
+    if weights is None:
+        weights = np.ones(len(snapshot))
+    weights = np.asarray(weights, dtype=float) / np.sum(weights)
+
+    lots = allocate_lots(prices, weights, capital, lot_size, fill_cash)
+    shares = lots * lot_size
+    # 未买入的股票（价格缺失时）投资金额为0，而不是 0 × NaN
+    invested = np.where(shares > 0, shares * prices, 0.0)
+
+    return pd.DataFrame({
+        '股票代码': snapshot['股票代码'].to_numpy(),
+        '股票名称': snapshot['股票名称'].to_numpy(),
+        '买入价': prices,
+        '购买股数': shares,
+        '投资金额': invested,
+        '目标权重': weights,
+        '实际权重': invested / capital,
+    })
+
+
+def allocation_summary(allocation, capital):
+    """分配结果摘要：投资金额、剩余现金、跟踪误差"""
+    invested = allocation['投资金额'].sum()
+    deviation = allocation['实际权重'] - allocation['目标权重']
+    return {
+        '投资金额': invested,
+        '剩余现金': capital - invested,
+        '资金使用率': invested / capital,
+        '权重偏离(绝对值之和)': deviation.abs().sum(),
+        '权重偏离(均方根)': np.sqrt((deviation ** 2).mean()),
+    }
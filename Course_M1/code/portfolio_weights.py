@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+投资组合加权方案
+功能：
+1. 支持等权重、动量分数加权、波动率倒数加权、最小方差（只做多）、风险平价五种方案
+2. 从共享的日收益率矩阵中一次性取出所有调仓日的估计窗口（批量 × 窗口 × 股票），
+   批量计算 Ledoit-Wolf 收缩协方差矩阵
+3. 各加权方案都对整批调仓日同时求解，避免逐月循环
+"""
+
+import pandas as pd
+import numpy as np
+
+WEIGHTING_SCHEMES = ['equal', 'score', 'inverse_vol', 'min_variance', 'risk_parity']
+
+
+def build_returns_panel(df):
+    """由长格式历史数据构建 日期 × 股票代码 的日收益率矩阵"""
+    close = df.pivot_table(index='日期', columns='股票代码', values='收盘').sort_index()
+    # 停牌日保持NaN，复牌日收益率相对停牌前最后一个收盘价计算
+    return close / close.ffill().shift(1) - 1
+
+
+def gather_windows(returns_panel, end_dates, code_lists, window=60):
+    """
+    一次性取出所有调仓日的估计窗口
+
+    Parameters:
+    returns_panel: DataFrame, 日期 × 股票代码 的日收益率矩阵
+    end_dates: list, 每个调仓日（窗口取该日之前的 window 个交易日，不含当天）
+    code_lists: list of list, 每个调仓日的股票代码，长度需一致
+    window: int, 估计窗口长度（交易日）
+
+    Returns:
+    ndarray: (调仓日数, window, 股票数) 的收益率数组，不足的部分为NaN
+    """
+    values = returns_panel.to_numpy(dtype=float)
+    end_pos = returns_panel.index.searchsorted(pd.DatetimeIndex(end_dates), side='left')
+    rows = end_pos[:, None] - np.arange(window, 0, -1)[None, :]
+    cols = np.array([returns_panel.columns.get_indexer(codes) for codes in code_lists])
+
+    valid = (rows[:, :, None] >= 0) & (cols[:, None, :] >= 0)
+    blocks = values[np.clip(rows, 0, None)[:, :, None], np.clip(cols, 0, None)[:, None, :]]
+    blocks[~valid] = np.nan
+    return blocks
+
+
+def ledoit_wolf_batch(blocks, min_periods=20):
+    """
+    批量 Ledoit-Wolf 收缩协方差估计（收缩目标为 μI）
+
+    Parameters:
+    blocks: ndarray, (批量, 窗口, 股票数) 的收益率数组，可含NaN
+    min_periods: int, 有效样本数不足时该股票的方差用同批其他股票的中位数代替
+
+    Returns:
+    tuple: (协方差数组 (批量, 股票数, 股票数), 收缩强度数组 (批量,))
+    """
+    counts = np.sum(~np.isnan(blocks), axis=1)
+    mean = np.nanmean(blocks, axis=1)
+    x = np.nan_to_num(blocks - mean[:, None, :])
+    n = blocks.shape[1]
+    p = blocks.shape[2]
+
+    sample = np.einsum('bti,btj->bij', x, x) / n
+
+    # 有效样本太少的股票：方差替换为同批中位数，协方差置零
+    sparse = counts < min_periods
+    if sparse.any():
+        diag = np.einsum('bii->bi', sample).copy()
+        median_var = np.nanmedian(np.where(sparse, np.nan, diag), axis=1)
+        median_var = np.where(np.isnan(median_var), np.nanmean(diag, axis=1), median_var)
+        for b, i in zip(*np.nonzero(sparse)):
+            sample[b, i, :] = 0.0
+            sample[b, :, i] = 0.0
+            sample[b, i, i] = median_var[b]
+
+    mu = np.einsum('bii->b', sample) / p
+    identity = np.eye(p)[None, :, :]
+    delta = np.sum((sample - mu[:, None, None] * identity) ** 2, axis=(1, 2)) / p
+
+    # Σ_k ||x_k x_k' − S||² = Σ_k ||x_k||⁴ − n·||S||²
+    norms = np.sum(x ** 2, axis=2)
+    beta_bar = (np.sum(norms ** 2, axis=1) - n * np.sum(sample ** 2, axis=(1, 2))) / (n ** 2 * p)
+    beta = np.minimum(np.maximum(beta_bar, 0.0), delta)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shrinkage = np.where(delta > 0, beta / delta, 1.0)
+    cov = shrinkage[:, None, None] * mu[:, None, None] * identity + (1 - shrinkage[:, None, None]) * sample
+    return cov, shrinkage
+
+
+def _normalize(weights):
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def risk_parity_batch(cov, max_iter=500, tol=1e-10):
+    """批量风险平价权重：迭代 w ← sqrt(w / (Σw)) 直到各股票风险贡献相等"""
+    w = _normalize(1.0 / np.sqrt(np.einsum('bii->bi', cov)))
+    for _ in range(max_iter):
+        marginal = np.einsum('bij,bj->bi', cov, w)
+        new_w = _normalize(np.sqrt(w / marginal))
+        if np.max(np.abs(new_w - w)) < tol:
+            return new_w
+        w = new_w
+    return w
+
+
+def _project_simplex(v):
+    """把每行投影到单纯形 {w >= 0, sum(w) = 1} 上（欧氏距离最近的点）"""
+    u = -np.sort(-v, axis=1)
+    css = np.cumsum(u, axis=1) - 1
+    k = np.arange(1, v.shape[1] + 1)
+    rho = np.sum(u - css / k > 0, axis=1)
+    theta = css[np.arange(len(v)), rho - 1] / rho
+    return np.maximum(v - theta[:, None], 0.0)
+
+
+def min_variance_batch(cov, max_iter=5000, tol=1e-12):
+    """
+    批量只做多最小方差权重：min w'Σw，约束 sum(w) = 1、w >= 0
+
+    加速投影梯度法（FISTA）：沿梯度 2Σw 走一步（步长 1 / 2λmax），再投影回单纯形。
+    目标函数为凸二次函数，收敛到约束问题的最优解；无约束解本身非负时两者相同。
+    """
+    step = 1.0 / (2 * np.linalg.eigvalsh(cov)[:, -1])
+    w = np.full(cov.shape[:2], 1.0 / cov.shape[1])
+    y = w
+    t = 1.0
+    for _ in range(max_iter):
+        grad = 2 * np.einsum('bij,bj->bi', cov, y)
+        new_w = _project_simplex(y - step[:, None] * grad)
+        new_t = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = new_w + (t - 1) / new_t * (new_w - w)
+        if np.max(np.abs(new_w - w)) < tol:
+            return new_w
+        w, t = new_w, new_t
+    return w
+
+
+def compute_weights(scheme, cov=None, scores=None):
+    """
+    批量计算加权方案
+
+    Parameters:
+    scheme: str, 加权方案（见 WEIGHTING_SCHEMES）
+    cov: ndarray, (批量, 股票数, 股票数) 协方差数组（风险类方案需要）
+    scores: ndarray, (批量, 股票数) 动量分数（score 方案需要）
+
+    Returns:
+    ndarray: (批量, 股票数) 的权重，每行之和为1
+    """
+    if scheme == 'equal':
+        shape = scores.shape if scores is not None else cov.shape[:2]
+        return np.full(shape, 1.0 / shape[1])
+    if scheme == 'score':
+        positive = np.clip(scores, 0, None)
+        # 入选股票的分数全为0时无法按分数分配，退化为等权重
+        positive[positive.sum(axis=1) == 0] = 1.0
+        return _normalize(positive)
+    if scheme == 'inverse_vol':
+        return _normalize(1.0 / np.sqrt(np.einsum('bii->bi', cov)))
+    if scheme == 'min_variance':
+        return min_variance_batch(cov)
+    if scheme == 'risk_parity':
+        return risk_parity_batch(cov)
+    raise ValueError(f"不支持的加权方案: {scheme}")
+
+
+def rebalance_weights(returns_panel, rebalance_dates, code_lists, scores=None,
+                      scheme='equal', window=60):
+    """
+    计算所有调仓日的组合权重
+
+    每个调仓日的股票数量可以不同：按股票数量分组，每组一次批量计算。
+
+    Returns:
+    list of ndarray: 与 code_lists 一一对应的权重数组
+    """
+    weights = [None] * len(code_lists)
+    sizes = np.array([len(codes) for codes in code_lists])
+
+    for size in np.unique(sizes):
+        batch = np.flatnonzero(sizes == size)
+        batch_scores = None
+        if scores is not None:
+            batch_scores = np.array([scores[i] for i in batch], dtype=float)
+
+        if scheme == 'equal':
+            for i in batch:
+                weights[i] = np.full(size, 1.0 / size)
+            continue
+
+        cov = None
+        if scheme in ('inverse_vol', 'min_variance', 'risk_parity'):
+            blocks = gather_windows(returns_panel, [rebalance_dates[i] for i in batch],
+                                    [code_lists[i] for i in batch], window)
+            cov, _ = ledoit_wolf_batch(blocks)
+
+        batch_weights = compute_weights(scheme, cov=cov, scores=batch_scores)
+        for j, i in enumerate(batch):
+            weights[i] = batch_weights[j]
+    return weights
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+支持除权除息的价格存储
+功能：
+1. 只保存不复权的原始日线，以及每只股票一张紧凑的后复权因子表
+2. 读取时按需计算前复权/后复权价格（按股票做as-of合并，全表向量化）
+3. 分红、送转等公司行为只需追加一行复权因子，不会使已保存的历史数据失效
+4. 美股（yfinance）：由 Dividends 列生成同样格式的复权因子表，按需计算复权价格
+"""
+
+import pandas as pd
+import numpy as np
+import os
+
+from date_utils import parse_dates
+
+PRICE_COLUMNS = ['开盘', '收盘', '最高', '最低']
+
+
+class PriceStore:
+    """
+    原始价格 + 复权因子存储
+
+    Parameters:
+    store_dir: str, 存储目录，包含 raw_prices.csv 和 adj_factors.csv
+
+    复权因子为后复权累计因子（上市首日为1，每次除权除息后相乘）：
+    - 后复权价格 = 原始价格 × 当日因子
+    - 前复权价格 = 原始价格 × 当日因子 / 最新因子
+    """
+
+    def __init__(self, store_dir='../data/price_store'):
+        self.store_dir = store_dir
+        self.raw_file = os.path.join(store_dir, 'raw_prices.csv')
+        self.factor_file = os.path.join(store_dir, 'adj_factors.csv')
+        os.makedirs(store_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def _append(self, df, file_path):
+        """
+        追加写入CSV（文件不存在时写表头）
+
+        文件已存在时按已有表头对齐列顺序，缺少的列写为空值；出现表头中没有的列时抛出 ValueError，
+        不写入错位的数据
+        """
+        write_header = not os.path.exists(file_path)
+        if not write_header:
+            header = pd.read_csv(file_path, nrows=0, encoding='utf-8-sig').columns
+            unknown = df.columns.difference(header)
+            if len(unknown) > 0:
+                raise ValueError(f"{file_path} 的表头中没有这些列: {list(unknown)}")
+            df = df.reindex(columns=header)
+        df.to_csv(file_path, mode='a', header=write_header, index=False,
+                  encoding='utf-8-sig' if write_header else 'utf-8', date_format='%Y-%m-%d')
+
+    def append_prices(self, df):
+        """追加原始（不复权）日线数据"""
+        df = df.copy()
+        df['股票代码'] = df['股票代码'].astype(str).str.zfill(6)
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+        self._append(df, self.raw_file)
+
+    def append_factors(self, factors):
+        """
+        追加复权因子，已存在的 (股票代码, 日期) 不会重复写入
+
+        Parameters:
+        factors: DataFrame, 包含 股票代码、日期、复权因子 三列
+        """
+        factors = factors[['股票代码', '日期', '复权因子']].copy()
+        factors['股票代码'] = factors['股票代码'].astype(str).str.zfill(6)
+        factors['日期'] = pd.to_datetime(factors['日期'])
+
+        existing = self.load_factors()
+        if existing is not None:
+            known = pd.MultiIndex.from_frame(existing[['股票代码', '日期']])
+            is_new = ~pd.MultiIndex.from_frame(factors[['股票代码', '日期']]).isin(known)
+            factors = factors[is_new]
+
+        if len(factors) > 0:
+            self._append(factors, self.factor_file)
+        return len(factors)
+
+    def record_corporate_action(self, stock_code, ex_date, prev_close,
+                                cash_dividend=0.0, share_ratio=0.0):
+        """
+        记录一次除权除息，只追加一行复权因子
+
+        Parameters:
+        stock_code: str, 股票代码
+        ex_date: str or datetime, 除权除息日
+        prev_close: float, 股权登记日收盘价
+        cash_dividend: float, 每股现金分红
+        share_ratio: float, 每股送转股数（如10送4为0.4）
+        """
+        factors = self.load_factors()
+        last_factor = 1.0
+        if factors is not None:
+            stock_factors = factors[(factors['股票代码'] == stock_code) &
+                                    (factors['日期'] < pd.Timestamp(ex_date))]
+            if len(stock_factors) > 0:
+                last_factor = stock_factors['复权因子'].iloc[-1]
+
+        # 除权参考价 = (前收盘 - 每股分红) / (1 + 每股送转)
+        reference_price = (prev_close - cash_dividend) / (1 + share_ratio)
+        new_factor = last_factor * prev_close / reference_price
+
+        return self.append_factors(pd.DataFrame({
+            '股票代码': [stock_code], '日期': [ex_date], '复权因子': [new_factor]
+        }))
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def load_factors(self):
+        """读取复权因子表，文件不存在时返回None"""
+        if not os.path.exists(self.factor_file):
+            return None
+        factors = pd.read_csv(self.factor_file, dtype={'股票代码': str})
+        factors['股票代码'] = factors['股票代码'].str.zfill(6)
+        factors['日期'] = parse_dates(factors['日期'])
+        return factors.sort_values(['股票代码', '日期']).reset_index(drop=True)
+
+    def load_raw(self, codes=None, start_date=None, end_date=None):
+        """读取原始日线，同一 (股票代码, 日期) 保留最后写入的一行"""
+        raw = pd.read_csv(self.raw_file, dtype={'股票代码': str})
+        raw['股票代码'] = raw['股票代码'].str.zfill(6)
+        raw['日期'] = parse_dates(raw['日期'])
+
+        mask = pd.Series(True, index=raw.index)
+        if codes is not None:
+            mask &= raw['股票代码'].isin(codes)
+        if start_date is not None:
+            mask &= raw['日期'] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= raw['日期'] <= pd.Timestamp(end_date)
+
+        raw = raw[mask].drop_duplicates(['股票代码', '日期'], keep='last')
+        return raw.sort_values(['股票代码', '日期']).reset_index(drop=True)
+
+    def last_dates(self):
+        """每只股票已保存的最后日期，用于增量更新"""
+        if not os.path.exists(self.raw_file):
+            return pd.Series(dtype='datetime64[ns]')
+        raw = pd.read_csv(self.raw_file, usecols=['股票代码', '日期'], dtype={'股票代码': str})
+        raw['股票代码'] = raw['股票代码'].str.zfill(6)
+        return pd.to_datetime(raw.groupby('股票代码')['日期'].max(), format='%Y-%m-%d')
+
+    def load(self, adjust='qfq', codes=None, start_date=None, end_date=None):
+        """
+        读取日线数据并按需复权
+
+        Parameters:
+        adjust: str, 'qfq' 前复权 / 'hfq' 后复权 / None 不复权
+        codes: list, 股票代码列表，None 表示全部
+        start_date, end_date: 日期范围
+
+        前复权以复权因子表中该股票的最新因子为基准，
+        与只截取部分日期范围无关，因此同一天的前复权价格在不同查询中保持一致。
+        """
+        raw = self.load_raw(codes, start_date, end_date)
+        if adjust is None:
+            return raw
+
+        factors = self.load_factors()
+        if factors is None or len(factors) == 0:
+            return raw
+
+        # 每行日线匹配当日生效的复权因子（因子表日期 <= 交易日期的最后一行）
+        merged = pd.merge_asof(
+            raw.sort_values('日期'), factors.sort_values('日期'),
+            on='日期', by='股票代码', direction='backward'
+        )
+        factor = merged['复权因子'].fillna(1.0).to_numpy()
+
+        if adjust == 'qfq':
+            latest = factors.groupby('股票代码')['复权因子'].last()
+            factor = factor / merged['股票代码'].map(latest).fillna(1.0).to_numpy()
+        elif adjust != 'hfq':
+            raise ValueError(f"不支持的复权方式: {adjust}")
+
+        price_cols = [c for c in PRICE_COLUMNS if c in merged.columns]
+        merged[price_cols] = merged[price_cols].to_numpy(dtype=float) * factor[:, None]
+        merged = merged.drop(columns='复权因子')
+        return merged.sort_values(['股票代码', '日期']).reset_index(drop=True)
+
+
+def _index_dates(data):
+    """以日期（可能带时区和时间）为索引的日线 -> 不带时区的交易日"""
+    return pd.to_datetime(pd.Index(data.index).astype(str).str[:10], format='%Y-%m-%d')
+
+
+def factors_from_actions(data, stock_code):
+    """
+    根据yfinance的 Dividends 列生成紧凑的复权因子表
+
+    yfinance 即使使用 auto_adjust=False，Open/High/Low/Close 和 Dividends 也已经按拆股调整，
+    拆股不会造成价格跳变，因此因子只在除息日变化：因子 *= 前收盘 / (前收盘 - 每股股息)。
+
+    Parameters:
+    data: DataFrame, 未按股息调整的日线数据（yfinance 使用 auto_adjust=False 获取），以日期为索引
+    stock_code: str, 股票代码
+
+    Returns:
+    DataFrame: 只包含除息日（以及首日因子1.0）的复权因子表
+    """
+    close = data['Close'].to_numpy(dtype=float)
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    dividends = data.get('Dividends', pd.Series(0.0, index=data.index)).to_numpy(dtype=float)
+
+    event = dividends > 0
+    event[0] = False
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(event, prev_close / (prev_close - dividends), 1.0)
+    factor = np.cumprod(ratio)
+
+    keep = event.copy()
+    keep[0] = True
+    dates = _index_dates(data)
+    return pd.DataFrame({
+        '股票代码': stock_code,
+        '日期': dates[keep],
+        '复权因子': factor[keep],
+    })
+
+
+def adjust_with_factors(data, factors, adjust='qfq', price_columns=('Open', 'High', 'Low', 'Close')):
+    """
+    按复权因子表调整单只股票的日线（如yfinance数据），与 PriceStore.load 的计算方式一致
+
+    Parameters:
+    data: DataFrame, 原始日线，以日期为索引
+    factors: DataFrame, 该股票的复权因子表（日期、复权因子）
+    adjust: str, 'qfq' 前复权 / 'hfq' 后复权
+    price_columns: tuple, 需要调整的价格列
+
+    Returns:
+    DataFrame: 价格列调整后的副本
+    """
+    factors = factors.sort_values('日期')
+    values = factors['复权因子'].to_numpy(dtype=float)
+    pos = pd.DatetimeIndex(factors['日期']).searchsorted(_index_dates(data), side='right') - 1
+    factor = np.where(pos >= 0, values[np.maximum(pos, 0)], 1.0)
+
+    if adjust == 'qfq':
+        factor = factor / values[-1]
+    elif adjust != 'hfq':
+        raise ValueError(f"不支持的复权方式: {adjust}")
+
+    adjusted = data.copy()
+    cols = [c for c in price_columns if c in adjusted.columns]
+    adjusted[cols] = adjusted[cols].to_numpy(dtype=float) * factor[:, None]
+    return adjusted
+
+
+def main():
+    """打印价格存储概况，并演示前复权/后复权读取"""
+    store = PriceStore('../data/price_store')
+    if not os.path.exists(store.raw_file):
+        print(f"价格存储为空，请先运行 get_hs300_data.py")
+        return
+
+    factors = store.load_factors()
+    last_dates = store.last_dates()
+    print(f"股票数量: {len(last_dates)}")
+    print(f"复权因子记录数: {0 if factors is None else len(factors)}")
+
+    qfq = store.load('qfq')
+    print(f"前复权日线: {len(qfq)} 条记录")
+    print(qfq.head())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地嵌入式查询库（SQLite）
+功能：
+1. 把沪深300历史行情、动量分数、回测结果导入一个本地SQLite文件，
+   行情按块导入，不需要一次性把CSV全部读进内存
+2. 在 (股票代码, 日期) 和 日期 上建立索引，常见问题用SQL直接回答，毫秒级返回
+3. 提供简单的Python接口和命令行：
+
+   python query_db.py build [--data-dir ../data] [--results-dir .]
+   python query_db.py top30 --min-months 3
+   python query_db.py avg-amount
+   python query_db.py history 300502 --start 2025-01-01 --end 2025-03-31
+   python query_db.py sql "SELECT COUNT(*) FROM prices"
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+DEFAULT_DB = '../data/momentum.db'
+# momentum_backtest.py 把回测结果写入运行目录（code/）
+DEFAULT_RESULTS_DIR = '.'
+
+NAMED_QUERIES = {
+    # 进入前30名至少 min_months 个月的股票
+    'top30': """
+        SELECT stock_code AS 股票代码, MAX(stock_name) AS 股票名称,
+               COUNT(DISTINCT year * 100 + month) AS 入选月数,
+               ROUND(AVG(momentum_score), 2) AS 平均动量分数
+        FROM portfolio_details
+        GROUP BY stock_code
+        HAVING 入选月数 >= :min_months
+        ORDER BY 入选月数 DESC, 平均动量分数 DESC
+    """,
+    # 每月持仓股票在持有月份内的平均成交额
+    'avg-amount': """
+        SELECT d.year AS 年, d.month AS 月,
+               COUNT(DISTINCT d.stock_code) AS 持仓数,
+               ROUND(AVG(p.成交额) / 1e8, 2) AS 平均成交额_亿元
+        FROM portfolio_details d
+        JOIN prices p
+          ON p.股票代码 = d.stock_code
+         AND p.日期 BETWEEN d.date AND date(d.date, 'start of month', '+1 month', '-1 day')
+        GROUP BY d.year, d.month
+        ORDER BY d.year, d.month
+    """,
+    # 单只股票的历史行情
+    'history': """
+        SELECT 日期, 开盘, 收盘, 最高, 最低, 成交量, 成交额
+        FROM prices
+        WHERE 股票代码 = :code AND 日期 BETWEEN :start AND :end
+        ORDER BY 日期
+    """,
+}
+
+
+class MomentumDB:
+    """
+    动量策略本地查询库
+
+    Parameters:
+    db_path: str, SQLite数据库文件路径
+    """
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+
+    def close(self):
+        self.conn.close()
+
+    def _insert_or_replace(self, table, chunk):
+        """按块写入，(股票代码, 日期) 重复的行以后写入的为准"""
+        columns = ', '.join(f'"{c}"' for c in chunk.columns)
+        placeholders = ', '.join('?' * len(chunk.columns))
+        rows = chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist()
+        self.conn.executemany(f'INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})', rows)
+
+    def build(self, data_dir='../data', results_dir=DEFAULT_RESULTS_DIR, chunksize=100000):
+        """
+        从CSV结果文件（重新）构建数据库
+
+        Parameters:
+        data_dir: str, 数据目录（历史行情、动量分数）
+        results_dir: str, 回测结果目录（momentum_backtest.py 的输出位置，默认为运行目录）
+        chunksize: int, 导入行情时每块的行数
+        """
+        cur = self.conn.cursor()
+        for table in ['prices', 'scores', 'backtest_results', 'portfolio_details']:
+            cur.execute(f'DROP TABLE IF EXISTS {table}')
+
+        # 1. 行情：分块读取、分块写入
+        price_file = os.path.join(data_dir, 'hs300_stock_data.csv')
+        if os.path.exists(price_file):
+            print("正在导入历史行情...")
+            total = 0
+            for chunk in pd.read_csv(price_file, dtype={'股票代码': str}, chunksize=chunksize):
+                chunk['股票代码'] = chunk['股票代码'].str.zfill(6)
+                chunk['日期'] = chunk['日期'].astype(str).str[:10]
+                if total == 0:
+                    # 先建表和唯一索引，重复的 (股票代码, 日期) 在写入时替换（与价格存储一致，保留最后一行）
+                    chunk.head(0).to_sql('prices', self.conn, index=False)
+                    cur.execute('CREATE UNIQUE INDEX idx_prices_code_date ON prices (股票代码, 日期)')
+                self._insert_or_replace('prices', chunk)
+                total += len(chunk)
+            cur.execute('CREATE INDEX idx_prices_date ON prices (日期)')
+            stored = cur.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+            print(f"行情导入完成，共 {stored} 条记录" +
+                  (f"（合并重复行 {total - stored} 条）" if total > stored else ""))
+
+        # 2. 动量分数
+        score_file = os.path.join(data_dir, 'momentum_scores.csv')
+        if os.path.exists(score_file):
+            scores = pd.read_csv(score_file, dtype={'股票代码': str})
+            scores['股票代码'] = scores['股票代码'].str.zfill(6)
+            scores.to_sql('scores', self.conn, index=False)
+            cur.execute('CREATE INDEX idx_scores_code ON scores (股票代码)')
+            print(f"动量分数导入完成，共 {len(scores)} 条记录")
+
+        # 3. 回测结果
+        result_file = os.path.join(results_dir, 'momentum_backtest_results.csv')
+        if os.path.exists(result_file):
+            results = pd.read_csv(result_file)
+            results['date'] = results['date'].astype(str).str[:10]
+            results.to_sql('backtest_results', self.conn, index=False)
+            print(f"回测结果导入完成，共 {len(results)} 条记录")
+
+        detail_files = [os.path.join(results_dir, f) for f in
+                        ['momentum_portfolio_details.parquet', 'momentum_portfolio_details.csv.gz',
+                         'momentum_portfolio_details.csv']]
+        # 流式写入（--stream）和普通CSV两种输出可能同时存在，取最近一次回测写入的文件
+        existing = [f for f in detail_files if os.path.exists(f)]
+        detail_file = max(existing, key=os.path.getmtime) if existing else None
+        if detail_file is not None:
+            if detail_file.endswith('.parquet'):
+                details = pd.read_parquet(detail_file)
+            else:
+                details = pd.read_csv(detail_file, dtype={'stock_code': str})
+            details['stock_code'] = details['stock_code'].astype(str).str.zfill(6)
+            details['date'] = details['date'].astype(str).str[:10]
+            details.to_sql('portfolio_details', self.conn, index=False)
+            cur.execute('CREATE INDEX idx_details_code ON portfolio_details (stock_code, date)')
+            cur.execute('CREATE INDEX idx_details_period ON portfolio_details (year, month)')
+            print(f"持仓明细导入完成，共 {len(details)} 条记录")
+
+        cur.execute('ANALYZE')
+        self.conn.commit()
+
+    def query(self, sql, params=None):
+        """执行SQL，返回DataFrame"""
+        return pd.read_sql_query(sql, self.conn, params=params or {})
+
+    def named(self, name, **params):
+        """执行预定义查询"""
+        return self.query(NAMED_QUERIES[name], params)
+
+    def top30_frequency(self, min_months=3):
+        """进入前30名至少 min_months 个月的股票"""
+        return self.named('top30', min_months=min_months)
+
+    def holdings_avg_amount(self):
+        """每月持仓股票在持有月份内的平均成交额"""
+        return self.named('avg-amount')
+
+    def stock_history(self, code, start='1900-01-01', end='2999-12-31'):
+        """单只股票的历史行情"""
+        return self.named('history', code=str(code).zfill(6), start=start, end=end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='动量策略本地查询库')
+    parser.add_argument('--db', default=DEFAULT_DB, help='数据库文件路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='从CSV结果文件构建数据库')
+    build.add_argument('--data-dir', default='../data', help='历史行情和动量分数所在目录')
+    build.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR, help='回测结果所在目录（momentum_backtest.py 的运行目录）')
+
+    top30 = sub.add_parser('top30', help='进入前30名至少N个月的股票')
+    top30.add_argument('--min-months', type=int, default=3)
+
+    sub.add_parser('avg-amount', help='每月持仓的平均成交额')
+
+    history = sub.add_parser('history', help='单只股票的历史行情')
+    history.add_argument('code')
+    history.add_argument('--start', default='1900-01-01')
+    history.add_argument('--end', default='2999-12-31')
+
+    sql = sub.add_parser('sql', help='执行任意SQL')
+    sql.add_argument('statement')
+
+    args = parser.parse_args()
+    db = MomentumDB(args.db)
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        db.build(args.data_dir, args.results_dir)
+        result = None
+    elif args.command == 'top30':
+        result = db.top30_frequency(args.min_months)
+    elif args.command == 'avg-amount':
+        result = db.holdings_avg_amount()
+    elif args.command == 'history':
+        result = db.stock_history(args.code, args.start, args.end)
+    else:
+        result = db.query(args.statement)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if result is not None:
+        print(result.to_string(index=False))
+    print(f"\n耗时: {elapsed:.2f} 毫秒")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
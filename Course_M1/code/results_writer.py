@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回测结果输出
+功能：
+1. 把每期持仓和收益率一次性拼接成DataFrame（不再逐行iterrows）
+2. 持仓明细边回测边流式写入压缩的列式文件（有pyarrow时为Parquet，否则为gzip压缩CSV），
+   回测对象不必在内存中保留全部明细
+3. 可选生成单个自包含的HTML报告（表格 + 内嵌图片）
+"""
+
+import pandas as pd
+import base64
+import io
+import os
+
+DETAIL_COLUMNS = ['year', 'month', 'date', 'stock_code', 'stock_name',
+                  'momentum_score', 'weight', 'monthly_return']
+
+
+def details_frame(detail):
+    """把一期持仓详情（入选股票 + 收益率/权重字典）整理为明细表"""
+    stocks = detail['stocks']
+    codes = stocks['股票代码']
+    frame = pd.DataFrame({
+        'year': detail['year'],
+        'month': detail['month'],
+        'date': detail['date'],
+        'stock_code': codes.to_numpy(),
+        'stock_name': stocks['股票名称'].to_numpy(),
+        'momentum_score': stocks['动量分数'].to_numpy(),
+        'weight': codes.map(detail.get('weights') or {}).to_numpy(dtype=float),
+        'monthly_return': codes.map(detail['returns']).to_numpy(dtype=float),
+    })
+    return frame[DETAIL_COLUMNS]
+
+
+def format_table(df, formats, index=False):
+    """按列格式化后整体输出为文本表格，替代逐行print"""
+    formatters = {col: (lambda fmt: (lambda v: fmt.format(v)))(fmt) for col, fmt in formats.items()}
+    return df.to_string(index=index, formatters=formatters)
+
+
+class ResultsWriter:
+    """
+    回测结果流式写入器
+
+    Parameters:
+    output_dir: str, 输出目录
+    prefix: str, 输出文件名前缀
+    fmt: str, 明细文件格式：'parquet'（需要pyarrow）/ 'csv.gz'；None 表示自动选择
+    """
+
+    def __init__(self, output_dir='.', prefix='momentum', fmt=None):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        os.makedirs(output_dir, exist_ok=True)
+
+        if fmt is None:
+            try:
+                import pyarrow  # noqa: F401
+                fmt = 'parquet'
+            except ImportError:
+                fmt = 'csv.gz'
+        self.fmt = fmt
+        self.details_path = os.path.join(output_dir, f'{prefix}_portfolio_details.{fmt}')
+        self.summary_path = os.path.join(output_dir, f'{prefix}_backtest_results.csv')
+        self._writer = None
+        self._csv_handle = None
+        self.rows_written = 0
+
+    def write_period(self, detail):
+        """追加写入一期持仓明细"""
+        self.write_details(details_frame(detail))
+
+    def write_details(self, frame):
+        """追加写入一批明细（任意行数）"""
+        if len(frame) == 0:
+            return
+        frame = frame.copy()
+        frame['date'] = pd.to_datetime(frame['date'])
+
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.details_path, table.schema, compression='zstd')
+            self._writer.write_table(table)
+        else:
+            import gzip
+            if self._csv_handle is None:
+                self._csv_handle = gzip.open(self.details_path, 'wt', encoding='utf-8')
+                frame.to_csv(self._csv_handle, index=False, date_format='%Y-%m-%d')
+            else:
+                frame.to_csv(self._csv_handle, index=False, header=False, date_format='%Y-%m-%d')
+        self.rows_written += len(frame)
+
+    def write_summary(self, portfolio_df):
+        """写入月度收益率汇总（数据量小，保持CSV）"""
+        portfolio_df.to_csv(self.summary_path, index=False, encoding='utf-8-sig')
+
+    def close(self):
+        """关闭流式写入的明细文件"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._csv_handle is not None:
+            self._csv_handle.close()
+            self._csv_handle = None
+
+    def read_details(self):
+        """读取已写入的明细（生成报告时使用）"""
+        if not os.path.exists(self.details_path):
+            return pd.DataFrame(columns=DETAIL_COLUMNS)
+        if self.fmt == 'parquet':
+            return pd.read_parquet(self.details_path)
+        return pd.read_csv(self.details_path, dtype={'stock_code': str}, parse_dates=['date'])
+
+    def write_html_report(self, portfolio_df, etf_df=None, title='动量策略回测报告', max_detail_rows=300,
+                          benchmark_label='CSI 300 ETF (510300)'):
+        """
+        生成单个自包含的HTML报告
+
+        Parameters:
+        portfolio_df: DataFrame, 月度收益率汇总（含 cumulative_return）
+        etf_df: DataFrame, 基准月度收益率（含 cumulative_return），可选
+        benchmark_label: str, 图例中基准ETF的名称（按股票池取 universes.get_universe 的 label 和 etf）
+        max_detail_rows: int, 报告中展示的明细行数上限（完整明细见列式文件）
+        """
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        labels = [f"{y}-{m:02d}" for y, m in zip(portfolio_df['year'], portfolio_df['month'])]
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.plot(labels, portfolio_df['cumulative_return'] * 100, marker='o', label='Momentum Strategy Portfolio')
+        if etf_df is not None and len(etf_df) == len(portfolio_df):
+            ax.plot(labels, etf_df['cumulative_return'] * 100, marker='s', label=benchmark_label)
+        ax.axhline(0, color='black', linestyle='--', alpha=0.5)
+        ax.set_ylabel('Cumulative Return (%)')
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+        ax.tick_params(axis='x', rotation=45)
+        fig.tight_layout()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=100)
+        plt.close(fig)
+        chart = base64.b64encode(buffer.getvalue()).decode('ascii')
+
+        details = self.read_details()
+        summary_html = portfolio_df.to_html(index=False, float_format=lambda v: f'{v:.4f}')
+        details_html = details.head(max_detail_rows).to_html(index=False, float_format=lambda v: f'{v:.4f}')
+
+        html = f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; font-size: 13px; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+th {{ background: #f0f0f0; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<h2>累计收益率</h2>
+<img src="data:image/png;base64,{chart}" alt="cumulative returns">
+<h2>月度收益率</h2>
+{summary_html}
+<h2>持仓明细（前 {min(max_detail_rows, len(details))} 行，共 {len(details)} 行）</h2>
+{details_html}
+</body>
+</html>
+"""
+        report_path = os.path.join(self.output_dir, f'{self.prefix}_report.html')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        return report_path
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+组合风险模型（横截面因子模型）
+功能：
+1. 每个交易日的股票因子暴露：市场（全部为1）、规模（成交额/换手率估算的流通市值取对数）、
+   波动率（过去60个交易日日收益率标准差）、动量（动量分数），风格因子在横截面上标准化
+2. 所有交易日的横截面回归 r_t = X_{t-1} f_t + u_t 堆叠成 (日期, 股票, 因子) 数组，
+   用一次批量最小二乘（正规方程 + 批量伪逆）同时求解，得到因子收益率和残差
+3. 每个调仓日的组合风险分解：组合因子暴露、因子风险、特异风险和预测波动率（年化）
+"""
+
+import numpy as np
+import pandas as pd
+import time
+import warnings
+warnings.filterwarnings('ignore')
+
+from date_utils import parse_dates
+from factor_ic import build_close_panel, build_factor_panels
+
+STYLE_FACTORS = ['规模', '波动率', '动量']
+RISK_FACTORS = ['市场'] + STYLE_FACTORS
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _annualized_vol(daily_var):
+    """日度方差 -> 年化波动率（%）"""
+    return np.sqrt(daily_var * TRADING_DAYS_PER_YEAR) * 100
+
+
+def standardize(panel, clip=3.0):
+    """按行（横截面）标准化为均值0、标准差1，并截断到 ±clip"""
+    values = panel.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        z = (values - np.nanmean(values, axis=1, keepdims=True)) / np.nanstd(values, axis=1, keepdims=True)
+    return pd.DataFrame(np.clip(z, -clip, clip), index=panel.index, columns=panel.columns)
+
+
+def style_exposures(df, size_window=20, vol_window=60):
+    """
+    计算日收益率矩阵和风格因子暴露矩阵
+
+    Parameters:
+    df: DataFrame, 长格式历史数据（日期、股票代码、收盘、成交额，可选换手率）
+    size_window: int, 估算市值使用的交易日窗口（取中位数，减少单日异常成交的影响）
+    vol_window: int, 波动率窗口
+
+    Returns:
+    tuple: (日收益率矩阵, {因子名: 日期 × 股票代码 的标准化暴露矩阵})
+    """
+    close = build_close_panel(df)
+    traded = df.pivot_table(index='日期', columns='股票代码', values='收盘').reindex_like(close).notna()
+    # 停牌日（当天没有行情）不计收益率
+    returns = (close / close.shift(1) - 1).where(traded)
+
+    amount = df.pivot_table(index='日期', columns='股票代码', values='成交额').reindex_like(close)
+    if '换手率' in df.columns:
+        # 换手率（%）= 成交量 / 流通股本，成交额 / 换手率 约等于流通市值
+        turnover = df.pivot_table(index='日期', columns='股票代码', values='换手率').reindex_like(close)
+        amount = amount / turnover.where(turnover > 0) * 100
+    size = np.log(amount.where(amount > 0).rolling(size_window, min_periods=5).median())
+
+    volatility = returns.rolling(vol_window, min_periods=20).std()
+    momentum = build_factor_panels(close)['动量分数']
+
+    exposures = {
+        '规模': standardize(size),
+        '波动率': standardize(volatility),
+        '动量': standardize(momentum),
+    }
+    return returns, exposures
+
+
+def batched_regression(returns, exposures, min_stocks=20):
+    """
+    所有交易日的横截面回归一次性求解
+
+    第 t 日的收益率对第 t-1 日收盘时已知的暴露回归（含市场因子截距）。缺失值所在的
+    (日期, 股票) 在正规方程中权重为0，因此每个日期可以使用不同的股票集合。
+
+    Parameters:
+    returns: DataFrame, 日期 × 股票代码 的日收益率
+    exposures: dict, 因子名 -> 与 returns 对齐的暴露矩阵
+    min_stocks: int, 有效股票少于该数量的日期不回归
+
+    Returns:
+    tuple: (因子收益率 DataFrame（日期 × 因子）, 残差 DataFrame（日期 × 股票代码）)
+    """
+    y = returns.to_numpy(dtype=float)
+    X = np.stack([np.ones_like(y)] + [exposures[name].shift(1).to_numpy(dtype=float) for name in STYLE_FACTORS],
+                 axis=2)
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=2)
+    Xv = np.where(valid[:, :, None], X, 0.0)
+    yv = np.where(valid, y, 0.0)
+
+    # 正规方程 (X'X) f = X'y，(日期, 因子, 因子) 的批量矩阵一次求伪逆
+    xtx = np.einsum('tnk,tnl->tkl', Xv, Xv)
+    xty = np.einsum('tnk,tn->tk', Xv, yv)
+    solvable = valid.sum(axis=1) >= min_stocks
+    factor_returns = np.full((len(y), len(RISK_FACTORS)), np.nan)
+    factor_returns[solvable] = np.einsum('tkl,tl->tk', np.linalg.pinv(xtx[solvable]), xty[solvable])
+
+    residuals = np.where(valid, y - np.einsum('tnk,tk->tn', Xv, np.nan_to_num(factor_returns)), np.nan)
+    residuals[~solvable] = np.nan
+    return (pd.DataFrame(factor_returns, index=returns.index, columns=RISK_FACTORS),
+            pd.DataFrame(residuals, index=returns.index, columns=returns.columns))
+
+
+class FactorRiskModel:
+    """
+    横截面因子风险模型
+
+    Parameters:
+    df: DataFrame, 长格式历史数据
+    cov_window: int, 估计因子协方差和特异方差使用的交易日窗口
+    size_window, vol_window: int, 规模、波动率因子的窗口
+    min_periods: int, 估计特异方差所需的最少残差个数，不足时使用当日横截面中位数
+    """
+
+    def __init__(self, df, cov_window=252, size_window=20, vol_window=60, min_periods=40):
+        self.cov_window = cov_window
+        self.min_periods = min_periods
+        self.returns, self.exposures = style_exposures(df, size_window, vol_window)
+        self.factor_returns, self.residuals = batched_regression(self.returns, self.exposures)
+        self.dates = self.returns.index
+        self.codes = self.returns.columns
+
+    def _position(self, date):
+        """指定日期（或之前最近一个交易日）在日期索引中的位置"""
+        pos = self.dates.searchsorted(pd.Timestamp(date), side='right') - 1
+        if pos < 0:
+            raise ValueError(f"{pd.Timestamp(date).strftime('%Y-%m-%d')} 之前没有数据")
+        return pos
+
+    def exposure_matrix(self, date, codes=None):
+        """
+        指定日期收盘时的因子暴露
+
+        Returns:
+        DataFrame: 股票代码 × 因子（市场暴露为1；缺失的风格暴露按横截面均值0处理）
+        """
+        pos = self._position(date)
+        codes = self.codes if codes is None else pd.Index(codes)
+        matrix = pd.DataFrame({'市场': 1.0}, index=codes)
+        for name in STYLE_FACTORS:
+            matrix[name] = self.exposures[name].iloc[pos].reindex(codes).fillna(0.0).to_numpy()
+        return matrix
+
+    def factor_covariance(self, date):
+        """截至指定日期、cov_window 个交易日内因子收益率的协方差矩阵（日度）"""
+        pos = self._position(date)
+        window = self.factor_returns.iloc[max(0, pos - self.cov_window + 1):pos + 1].dropna()
+        return window.cov()
+
+    def specific_variance(self, date, codes=None):
+        """截至指定日期、cov_window 个交易日内各股票残差的方差（日度）"""
+        pos = self._position(date)
+        window = self.residuals.iloc[max(0, pos - self.cov_window + 1):pos + 1]
+        variance = window.var(ddof=1).where(window.count() >= self.min_periods)
+        variance = variance.fillna(variance.median())
+        return variance if codes is None else variance.reindex(pd.Index(codes)).fillna(variance.median())
+
+    def portfolio_risk(self, date, weights):
+        """
+        组合风险分解
+
+        Parameters:
+        date: 调仓日
+        weights: dict, {股票代码: 权重}（按权重之和归一化）
+
+        Returns:
+        dict: 各因子暴露、因子风险、特异风险、预测波动率（年化，%）及因子风险占比
+        """
+        codes = pd.Index(list(weights.keys()))
+        w = np.array(list(weights.values()), dtype=float)
+        w = w / w.sum()
+
+        x = w @ self.exposure_matrix(date, codes).to_numpy()
+        cov = self.factor_covariance(date).reindex(index=RISK_FACTORS, columns=RISK_FACTORS).to_numpy()
+        factor_var = float(x @ cov @ x)
+        specific_var = float(np.sum(w ** 2 * self.specific_variance(date, codes).to_numpy()))
+        total_var = factor_var + specific_var
+
+        result = {f'{name}暴露': value for name, value in zip(RISK_FACTORS, x)}
+        result.update({
+            '因子风险': _annualized_vol(factor_var),
+            '特异风险': _annualized_vol(specific_var),
+            '预测波动率': _annualized_vol(total_var),
+            '因子风险占比': factor_var / total_var if total_var > 0 else np.nan,
+        })
+        return result
+
+    def rebalance_report(self, rebalances):
+        """
+        每个调仓日组合的风险分解
+
+        Parameters:
+        rebalances: list of (调仓日, {股票代码: 权重})
+
+        Returns:
+        DataFrame: 每个调仓日一行
+        """
+        rows = [{'date': pd.Timestamp(date), **self.portfolio_risk(date, weights)} for date, weights in rebalances]
+        return pd.DataFrame(rows)
+
+    def factor_summary(self):
+        """因子收益率统计：年化收益率、年化波动率（%）"""
+        valid = self.factor_returns.dropna()
+        return pd.DataFrame({
+            '年化收益率': valid.mean() * TRADING_DAYS_PER_YEAR * 100,
+            '年化波动率': valid.std() * np.sqrt(TRADING_DAYS_PER_YEAR) * 100,
+        })
+
+
+def main():
+    """示例：拟合风险模型，并分解最新动量前30等权组合的风险"""
+    print("组合风险模型")
+    print("=" * 50)
+
+    df = pd.read_csv('../data/hs300_stock_data.csv', dtype={'股票代码': str})
+    df['股票代码'] = df['股票代码'].str.zfill(6)
+    df['日期'] = parse_dates(df['日期'])
+
+    start = time.perf_counter()
+    model = FactorRiskModel(df)
+    print(f"批量横截面回归: {len(model.dates)} 个交易日 × {len(model.codes)} 只股票，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+    print("\n因子收益率统计（%）:")
+    print(model.factor_summary().round(2))
+
+    scores = pd.read_csv('../data/momentum_scores.csv', dtype={'股票代码': str})
+    top_30 = scores['股票代码'].str.zfill(6).head(30)
+    latest = model.dates[-1]
+    risk = model.portfolio_risk(latest, {code: 1.0 for code in top_30})
+    print(f"\n{latest.strftime('%Y-%m-%d')} 动量前30等权组合风险分解:")
+    for key, value in risk.items():
+        print(f"  {key}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
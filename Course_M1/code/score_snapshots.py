@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+动量分数历史快照库（只追加，按日期分区）
+功能：
+1. 每次打分的结果按计算日期写入单独的分区文件 {年}/{日期}.{parquet|csv}，已有分区不覆盖
+2. 查询只读取需要的分区：
+   - 任意历史日期的排名（该日没有快照时取之前最近的一次）
+   - 单只股票在一段时间内的动量分数和排名
+   - 两个日期之间的排名变化（新进、退出、名次变动）
+3. 命令行：
+
+   python score_snapshots.py append --date 2025-08-29
+   python score_snapshots.py dates
+   python score_snapshots.py ranking 2025-06-30 --top 30
+   python score_snapshots.py history 300502 --start 2025-01-01 --end 2025-08-31
+   python score_snapshots.py changes 2025-07-31 2025-08-29 --top 30
+"""
+
+import argparse
+import glob
+import os
+
+import pandas as pd
+
+DEFAULT_STORE = '../data/score_snapshots'
+
+
+class ScoreSnapshotStore:
+    """
+    按日期分区的动量分数快照库
+
+    Parameters:
+    store_dir: str, 快照库目录
+    fmt: str, 分区文件格式：'parquet'（需要pyarrow）/ 'csv'；None 表示自动选择
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE, fmt=None):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        if fmt is None:
+            try:
+                import pyarrow  # noqa: F401
+                fmt = 'parquet'
+            except ImportError:
+                fmt = 'csv'
+        self.fmt = fmt
+
+    def _partition_path(self, snapshot_date, fmt=None):
+        snapshot_date = pd.Timestamp(snapshot_date)
+        return os.path.join(self.store_dir, f'{snapshot_date.year}',
+                            f"{snapshot_date.strftime('%Y-%m-%d')}.{fmt or self.fmt}")
+
+    def _partitions(self):
+        """日期 -> 分区文件路径（只列目录，不读文件）"""
+        paths = glob.glob(os.path.join(self.store_dir, '*', '*.parquet'))
+        paths += glob.glob(os.path.join(self.store_dir, '*', '*.csv'))
+        partitions = pd.Series(paths, index=pd.to_datetime([os.path.basename(p).split('.')[0] for p in paths]),
+                               dtype=object)
+        return partitions[~partitions.index.duplicated()].sort_index()
+
+    def _read(self, path, columns=None):
+        if path.endswith('.parquet'):
+            frame = pd.read_parquet(path, columns=columns)
+        else:
+            frame = pd.read_csv(path, usecols=columns, dtype={'股票代码': str})
+        if '股票代码' in frame.columns:
+            frame['股票代码'] = frame['股票代码'].astype(str).str.zfill(6)
+        return frame
+
+    def dates(self):
+        """已有快照的日期列表"""
+        return list(self._partitions().index)
+
+    def append(self, scores, snapshot_date):
+        """
+        追加一次打分结果
+
+        Parameters:
+        scores: DataFrame, 含 股票代码、动量分数 等列（如 momentum_scores.csv 的内容）
+        snapshot_date: 计算日期
+
+        Returns:
+        bool: 是否写入（该日期已有快照时不覆盖，返回False）
+        """
+        if pd.Timestamp(snapshot_date) in self._partitions().index:
+            print(f"{pd.Timestamp(snapshot_date).strftime('%Y-%m-%d')} 的快照已存在，跳过")
+            return False
+
+        snapshot = scores.sort_values('动量分数', ascending=False).reset_index(drop=True)
+        snapshot['股票代码'] = snapshot['股票代码'].astype(str).str.zfill(6)
+        snapshot['排名'] = snapshot['动量分数'].rank(ascending=False, method='first').astype('Int64')
+
+        path = self._partition_path(snapshot_date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        if self.fmt == 'parquet':
+            snapshot.to_parquet(tmp_path, index=False, compression='zstd')
+        else:
+            snapshot.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        os.replace(tmp_path, path)
+        return True
+
+    def ranking(self, snapshot_date, top_n=None, exact=False):
+        """
+        某个日期的排名
+
+        Parameters:
+        snapshot_date: 查询日期；exact=False 时没有该日快照则取之前最近的一次
+        top_n: int, 只返回前N名
+
+        Returns:
+        tuple: (实际快照日期, DataFrame)；没有可用快照时为 (None, 空DataFrame)
+        """
+        partitions = self._partitions()
+        snapshot_date = pd.Timestamp(snapshot_date)
+        pos = partitions.index.searchsorted(snapshot_date, side='right') - 1
+        if pos < 0 or (exact and partitions.index[pos] != snapshot_date):
+            return None, pd.DataFrame()
+        frame = self._read(partitions.iloc[pos]).sort_values('排名')
+        if top_n is not None:
+            frame = frame.head(top_n)
+        return partitions.index[pos], frame.reset_index(drop=True)
+
+    def stock_history(self, code, start=None, end=None, columns=('动量分数', '排名')):
+        """
+        单只股票在一段时间内的动量分数和排名（只读取区间内的分区，只读需要的列）
+
+        Returns:
+        DataFrame: 日期, 动量分数, 排名 ...
+        """
+        partitions = self._partitions()
+        partitions = partitions.loc[pd.Timestamp(start or partitions.index.min()):
+                                    pd.Timestamp(end or partitions.index.max())]
+        code = str(code).zfill(6)
+        rows = []
+        for snapshot_date, path in partitions.items():
+            frame = self._read(path, ['股票代码'] + list(columns))
+            row = frame[frame['股票代码'] == code]
+            if len(row):
+                rows.append(row.assign(日期=snapshot_date))
+        if not rows:
+            return pd.DataFrame(columns=['日期'] + list(columns))
+        return pd.concat(rows, ignore_index=True)[['日期'] + list(columns)]
+
+    def rank_changes(self, date_from, date_to, top_n=30):
+        """
+        两个日期之间的排名变化
+
+        Returns:
+        DataFrame: 股票代码, 股票名称, 原排名, 新排名, 名次变动, 状态（新进/退出/保持）
+        """
+        actual_from, before = self.ranking(date_from)
+        actual_to, after = self.ranking(date_to)
+        if actual_from is None or actual_to is None:
+            return pd.DataFrame()
+
+        cols = ['股票代码', '股票名称', '排名', '动量分数']
+        merged = before[cols].merge(after[cols], on='股票代码', how='outer', suffixes=('_原', '_新'))
+        merged['股票名称'] = merged['股票名称_新'].fillna(merged['股票名称_原'])
+        merged = merged.rename(columns={'排名_原': '原排名', '排名_新': '新排名'})
+        merged['名次变动'] = merged['原排名'] - merged['新排名']
+
+        in_before = merged['原排名'] <= top_n
+        in_after = merged['新排名'] <= top_n
+        merged = merged[in_before.fillna(False) | in_after.fillna(False)].copy()
+        merged['状态'] = '保持'
+        merged.loc[~(merged['原排名'] <= top_n).fillna(False), '状态'] = '新进'
+        merged.loc[~(merged['新排名'] <= top_n).fillna(False), '状态'] = '退出'
+        merged = merged.sort_values(['新排名', '原排名'])
+        return merged[['股票代码', '股票名称', '原排名', '新排名', '名次变动', '状态']].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='动量分数历史快照库')
+    parser.add_argument('--store', default=DEFAULT_STORE, help='快照库目录')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    append = sub.add_parser('append', help='把动量分数文件追加为一次快照')
+    append.add_argument('--file', default='../data/momentum_scores.csv')
+    append.add_argument('--date', required=True, help='计算日期，如 2025-08-29')
+
+    sub.add_parser('dates', help='列出已有快照日期')
+
+    ranking = sub.add_parser('ranking', help='某个日期的排名')
+    ranking.add_argument('date')
+    ranking.add_argument('--top', type=int, default=30)
+
+    history = sub.add_parser('history', help='单只股票的分数历史')
+    history.add_argument('code')
+    history.add_argument('--start')
+    history.add_argument('--end')
+
+    changes = sub.add_parser('changes', help='两个日期之间的排名变化')
+    changes.add_argument('date_from')
+    changes.add_argument('date_to')
+    changes.add_argument('--top', type=int, default=30)
+
+    args = parser.parse_args()
+    store = ScoreSnapshotStore(args.store)
+
+    if args.command == 'append':
+        scores = pd.read_csv(args.file, dtype={'股票代码': str})
+        if store.append(scores, args.date):
+            print(f"已追加 {args.date} 的快照，共 {len(scores)} 只股票")
+    elif args.command == 'dates':
+        for snapshot_date in store.dates():
+            print(snapshot_date.strftime('%Y-%m-%d'))
+    elif args.command == 'ranking':
+        actual, frame = store.ranking(args.date, args.top)
+        if actual is None:
+            print(f"{args.date} 之前没有快照")
+        else:
+            print(f"快照日期: {actual.strftime('%Y-%m-%d')}")
+            print(frame[['排名', '股票代码', '股票名称', '动量分数']].to_string(
+                index=False, float_format=lambda v: f'{v:.2f}'))
+    elif args.command == 'history':
+        frame = store.stock_history(args.code, args.start, args.end)
+        print(frame.to_string(index=False, float_format=lambda v: f'{v:.2f}'))
+    else:
+        print(store.rank_changes(args.date_from, args.date_to, args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
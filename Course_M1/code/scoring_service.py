@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地动量分数查询服务
+功能：
+1. 启动时加载一次价格数据并计算最新交易日的动量分数，结果常驻内存：
+   排名表预先整理为按名次排列的记录列表，个股分数按股票代码建立字典索引，
+   进程内查询只是一次切片或字典查找（亚毫秒级），不再需要运行脚本、读CSV
+2. 数据文件（及成分股区间表）发生变化时自动热加载：后台线程定期检查文件的修改时间和大小，
+   在新线程中重新计算完成后一次性替换内存中的快照，查询不会读到一半新一半旧的数据
+3. 通过本地HTTP端口或Unix套接字提供JSON接口：
+
+   python scoring_service.py --port 8765
+   python scoring_service.py --unix-socket /tmp/momentum.sock --universe csi500
+   python scoring_service.py --universe csi1000 --from-store   # 从公共价格存储共享加载
+
+   curl 'http://127.0.0.1:8765/ranking?top=30'
+   curl 'http://127.0.0.1:8765/stock/300502'
+   curl 'http://127.0.0.1:8765/portfolio?top=30&capital=1000000'
+   curl 'http://127.0.0.1:8765/status'
+   curl --unix-socket /tmp/momentum.sock 'http://localhost/ranking?top=10'
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from calculate_momentum_score import score_latest
+from constituent_history import load_membership, MembershipMask
+from date_utils import normalize_date_column, parse_dates
+from data_quality import clean_history
+from portfolio_allocation import build_allocation, allocation_summary
+from price_store import PriceStore
+from universes import PRICE_STORE_DIR, get_universe, universe_files, load_universe_panel
+
+
+def _json_value(value):
+    """numpy / pandas 标量转为可JSON序列化的Python值（NaN 转为 None）"""
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _check_positive(name, value):
+    """查询参数必须是正的有限数，否则抛出 ValueError（HTTP接口返回400）"""
+    if not np.isfinite(value) or value <= 0:
+        raise ValueError(f"{name} 必须为正数，收到 {value}")
+
+
+def _records(frame):
+    """DataFrame 转为字典列表（值已可JSON序列化）"""
+    columns = list(frame.columns)
+    return [{col: _json_value(v) for col, v in zip(columns, row)} for row in frame.itertuples(index=False)]
+
+
+class ScoreCache:
+    """
+    内存中的最新动量分数快照，数据文件变化时热加载
+
+    Parameters:
+    data_file: str, 长格式历史数据CSV
+    membership_file: str, 成分股时点区间表；存在时只对最新交易日的成分股打分。
+                     启动时尚不存在也会被监视，之后创建时触发重新加载
+    lookback: str, 回看方式：calendar / trading
+    max_gap: int, trading 模式下回看窗口内允许的最多停牌交易日数
+    universe: str, 股票池名称（store_dir 模式下用于生成成分矩阵）
+    store_dir: str, 提供时通过 universes.load_universe_panel 从公共价格存储读取行情和成分矩阵，
+               监视存储中的原始行情和复权因子文件，而不是 data_file
+    """
+
+    def __init__(self, data_file, membership_file=None, lookback='calendar', max_gap=None,
+                 universe='hs300', store_dir=None):
+        self.data_file = data_file
+        self.membership_file = membership_file
+        self.universe = universe
+        self.store_dir = store_dir
+        self.lookback = lookback
+        self.max_gap = max_gap
+        self.reloads = 0
+        self._snapshot = None
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload()
+
+    def _watched_files(self):
+        files = [self.data_file, self.membership_file]
+        if self.store_dir:
+            store = PriceStore(self.store_dir)
+            files = [store.raw_file, store.factor_file, self.membership_file]
+        return [f for f in files if f]
+
+    def _file_signature(self):
+        """监视文件的 (修改时间, 大小)，文件被替换、追加、创建时都会变化；不存在的文件记为 None"""
+        signature = []
+        for path in self._watched_files():
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            else:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _load_prices(self):
+        """
+        读取行情和成分矩阵
+
+        Returns:
+        tuple: (长格式日线 DataFrame, MembershipMask 或 None)
+        """
+        if self.store_dir:
+            df, masks = load_universe_panel([self.universe], self.store_dir)
+            return df, masks[self.universe]
+
+        df = pd.read_csv(self.data_file, dtype={'股票代码': str})
+        df['股票代码'] = df['股票代码'].str.zfill(6)
+        mask = None
+        if self.membership_file and os.path.exists(self.membership_file):
+            mask = MembershipMask(load_membership(self.membership_file), parse_dates(df['日期']).unique(),
+                                  df['股票代码'].unique())
+        return df, mask
+
+    def _build_snapshot(self):
+        """读取数据并计算快照（不修改当前快照）"""
+        df, mask = self._load_prices()
+        normalize_date_column(df, '日期')
+        df = clean_history(df)
+        latest_date = df['日期'].max()
+        codes = mask.members(latest_date) if mask is not None else None
+
+        scores = score_latest(df, self.lookback, self.max_gap, codes).reset_index(drop=True)
+        scores.insert(0, '排名', np.arange(1, len(scores) + 1))
+
+        # 最新交易日的开盘、收盘价（组合查询计算整手持仓时使用）
+        latest = df[df['日期'] == latest_date].drop_duplicates('股票代码', keep='last').set_index('股票代码')
+        prices = latest.reindex(scores['股票代码'])
+        for col in ('开盘', '收盘'):
+            if col in prices.columns:
+                scores[f'最新{col}'] = prices[col].to_numpy()
+
+        records = _records(scores)
+        return {
+            'as_of': latest_date,
+            'scores': scores,
+            'ranking': records,
+            'by_code': {record['股票代码']: record for record in records},
+            'loaded_at': pd.Timestamp.now(),
+        }
+
+    def reload(self):
+        """重新计算快照并一次性替换；计算失败时保留旧快照"""
+        with self._reload_lock:
+            signature = self._file_signature()
+            snapshot = self._build_snapshot()
+            self._snapshot = snapshot
+            self._signature = signature
+            self.reloads += 1
+        return snapshot
+
+    def reload_if_changed(self):
+        """
+        文件变化时重新加载
+
+        Returns:
+        bool: 是否重新加载了
+        """
+        try:
+            if self._file_signature() == self._signature:
+                return False
+            self.reload()
+            print(f"检测到数据变化，已重新加载（数据日期 {self._snapshot['as_of'].strftime('%Y-%m-%d')}）")
+            return True
+        except Exception as e:
+            # 文件正在写入或暂时不可读：保留旧快照，下次检查时重试
+            print(f"重新加载失败，继续使用旧数据: {e}")
+            return False
+
+    def start_watching(self, interval=2.0):
+        """启动后台线程，每 interval 秒检查一次文件是否变化"""
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    # ------------------------------------------------------------------
+    # 查询（只读取一次当前快照引用，热加载替换快照不影响正在进行的查询）
+    # ------------------------------------------------------------------
+    def ranking(self, top_n=30):
+        """动量分数前 top_n 名"""
+        _check_positive('top', top_n)
+        snapshot = self._snapshot
+        return {'as_of': _json_value(snapshot['as_of']), 'stocks': snapshot['ranking'][:top_n]}
+
+    def stock(self, code):
+        """单只股票的分数和排名；不在股票池中时返回None"""
+        snapshot = self._snapshot
+        record = snapshot['by_code'].get(str(code).zfill(6))
+        if record is None:
+            return None
+        return {'as_of': _json_value(snapshot['as_of']), 'total': len(snapshot['ranking']), **record}
+
+    def portfolio(self, top_n=30, capital=None, lot_size=100):
+        """
+        前 top_n 名等权组合；提供资金时按最新收盘价计算整手持仓
+
+        Returns:
+        dict: 持仓列表及（提供资金时的）分配摘要
+        """
+        _check_positive('top', top_n)
+        if capital is not None:
+            _check_positive('capital', capital)
+        snapshot = self._snapshot
+        top = snapshot['scores'].head(top_n)
+        result = {'as_of': _json_value(snapshot['as_of'])}
+        if capital is None or '最新收盘' not in top.columns:
+            holdings = top[['股票代码', '股票名称', '动量分数']].assign(目标权重=1.0 / max(len(top), 1))
+            result['holdings'] = _records(holdings)
+            return result
+
+        allocation = build_allocation(top, capital, price_col='最新收盘', lot_size=lot_size)
+        result['holdings'] = _records(allocation)
+        result['summary'] = {k: _json_value(v) for k, v in allocation_summary(allocation, capital).items()}
+        return result
+
+    def status(self):
+        snapshot = self._snapshot
+        return {
+            'data_file': self.store_dir or self.data_file,
+            'membership_file': self.membership_file,
+            'lookback': self.lookback,
+            'as_of': _json_value(snapshot['as_of']),
+            'stocks': len(snapshot['ranking']),
+            'loaded_at': snapshot['loaded_at'].strftime('%Y-%m-%d %H:%M:%S'),
+            'reloads': self.reloads,
+        }
+
+
+def make_handler(cache, quiet=True):
+    """
+    生成绑定到 cache 的请求处理类
+
+    路由：
+    GET /ranking?top=N
+    GET /stock/<股票代码>
+    GET /portfolio?top=N&capital=资金
+    GET /status
+    """
+
+    class ScoreRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split('/') if p]
+            try:
+                if parts == ['ranking']:
+                    self._send(200, cache.ranking(int(params.get('top', 30))))
+                elif len(parts) == 2 and parts[0] == 'stock':
+                    record = cache.stock(parts[1])
+                    if record is None:
+                        self._send(404, {'error': f'股票 {parts[1]} 不在股票池中'})
+                    else:
+                        self._send(200, record)
+                elif parts == ['portfolio']:
+                    capital = float(params['capital']) if 'capital' in params else None
+                    self._send(200, cache.portfolio(int(params.get('top', 30)), capital))
+                elif parts == ['status']:
+                    self._send(200, cache.status())
+                else:
+                    self._send(404, {'error': f'未知路径: {url.path}'})
+            except ValueError as e:
+                self._send(400, {'error': f'参数错误: {e}'})
+
+        def address_string(self):
+            # Unix套接字的客户端地址是空字符串
+            return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return ScoreRequestHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """监听Unix套接字的多线程HTTP服务"""
+    daemon_threads = True
+
+
+def create_server(cache, host='127.0.0.1', port=8765, unix_socket=None, quiet=True):
+    """
+    创建HTTP服务（不启动）
+
+    Parameters:
+    unix_socket: str, 提供时监听该Unix套接字路径，否则监听 host:port
+
+    Returns:
+    socketserver.BaseServer: 调用 serve_forever() 启动
+    """
+    handler = make_handler(cache, quiet)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地动量分数查询服务')
+    parser.add_argument('--universe', default='hs300', help='股票池：hs300 / csi500 / csi1000 / all')
+    parser.add_argument('--data-file', help='历史数据文件（默认按股票池取 ../data/{股票池}_stock_data.csv）')
+    parser.add_argument('--from-store', action='store_true', help='从公共价格存储共享加载行情和成分矩阵')
+    parser.add_argument('--lookback', default='calendar', choices=['calendar', 'trading'])
+    parser.add_argument('--max-gap', type=int)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help='监听Unix套接字而不是TCP端口')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='检查数据文件变化的间隔（秒）')
+    parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+    args = parser.parse_args()
+
+    get_universe(args.universe)
+    files = universe_files(args.universe)
+    data_file = args.data_file or files['data']
+    # 区间表即使启动时不存在也传入，之后创建时由监视线程加载
+    membership_file = files['membership'] if get_universe(args.universe)['index'] is not None else None
+
+    start = time.perf_counter()
+    cache = ScoreCache(data_file, membership_file, args.lookback, args.max_gap, universe=args.universe,
+                       store_dir=PRICE_STORE_DIR if args.from_store else None)
+    status = cache.status()
+    print(f"已加载 {status['stocks']} 只股票的动量分数（数据日期 {status['as_of']}），"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+    # 进程内查询耗时（最新交易日没有成分股、排名为空时跳过）
+    top = cache.ranking(1)['stocks']
+    if top:
+        n = 10000
+        code = top[0]['股票代码']
+        start = time.perf_counter()
+        for _ in range(n):
+            cache.ranking(30)
+            cache.stock(code)
+        print(f"进程内查询平均耗时: {(time.perf_counter() - start) / (2 * n) * 1e6:.1f} 微秒")
+    else:
+        print("警告: 最新交易日没有可打分的股票，排名为空")
+
+    cache.start_watching(args.poll_interval)
+    server = create_server(cache, args.host, args.port, args.unix_socket, quiet=not args.verbose)
+    address = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"服务已启动: {address}（Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        cache.stop_watching()
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
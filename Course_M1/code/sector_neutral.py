@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+行业中性动量评分
+功能：
+1. 从本地CSV加载 股票代码 -> 行业 映射（可选通过akshare一次性获取并保存）
+2. 各周期收益率的百分位值在行业内部计算：对整张表做一次 groupby(行业).rank，
+   多个日期拼在一起时按 (日期, 行业) 分组，同样只需一次调用；
+   股票数太少的行业和映射表中没有的股票（“未知”）使用全市场百分位值，不在小组内排名
+3. 选股时支持每个行业最多入选N只股票的上限，避免前30名集中在同一题材
+"""
+
+import pandas as pd
+import os
+import warnings
+warnings.filterwarnings('ignore')
+
+from lookback_index import CALENDAR_PERIODS as PERIODS
+
+INDUSTRY_FILE = '../data/industry_map.csv'
+UNKNOWN_INDUSTRY = '未知'
+# 行业内有效股票数少于该值时，行业内百分位没有意义（单只股票的行业各周期百分位都是100），改用全市场百分位
+MIN_SECTOR_SIZE = 5
+
+
+def load_industry_map(file_path=INDUSTRY_FILE):
+    """
+    读取行业映射表
+
+    Returns:
+    Series: 股票代码 -> 行业
+    """
+    industry = pd.read_csv(file_path, dtype={'股票代码': str})
+    industry['股票代码'] = industry['股票代码'].str.zfill(6)
+    return industry.drop_duplicates('股票代码').set_index('股票代码')['行业']
+
+
+def fetch_industry_map(codes=None, file_path=INDUSTRY_FILE):
+    """
+    通过akshare东方财富行业板块成分一次性获取行业映射并保存到本地
+
+    Parameters:
+    codes: list, 只保留这些股票代码（None 表示保留全部）
+
+    Returns:
+    Series: 股票代码 -> 行业
+    """
+    import akshare as ak
+
+    boards = ak.stock_board_industry_name_em()
+    frames = []
+    for board in boards['板块名称']:
+        try:
+            cons = ak.stock_board_industry_cons_em(symbol=board)
+        except Exception as e:
+            print(f"获取行业 {board} 成分股失败: {e}")
+            continue
+        frames.append(pd.DataFrame({'股票代码': cons['代码'].astype(str).str.zfill(6), '行业': board}))
+
+    industry = pd.concat(frames, ignore_index=True).drop_duplicates('股票代码')
+    if codes is not None:
+        industry = industry[industry['股票代码'].isin(list(codes))]
+    industry.to_csv(file_path, index=False, encoding='utf-8-sig')
+    print(f"行业映射已保存到 {file_path}，共 {len(industry)} 只股票")
+    return industry.set_index('股票代码')['行业']
+
+
+def attach_industry(frame, industry_map):
+    """为结果表添加行业列，映射表中没有的股票记为“未知”"""
+    frame = frame.copy()
+    frame['行业'] = frame['股票代码'].map(industry_map).fillna(UNKNOWN_INDUSTRY)
+    return frame
+
+
+def sector_neutral_scores(frame, industry_map, by=None, periods=None, min_sector_size=MIN_SECTOR_SIZE):
+    """
+    行业内百分位值与行业中性动量分数
+
+    Parameters:
+    frame: DataFrame, 含 股票代码 和各周期收益率列（可以是多个日期拼接的长表）
+    industry_map: Series, 股票代码 -> 行业
+    by: str or list, 额外的分组列（如 '日期'），长表时按 (by, 行业) 分组
+    periods: list, 收益率列名，默认为1/3/6/12个月收益率
+    min_sector_size: int, 某周期行业内有效股票数少于该值时，该行业的股票使用全市场（按 by 分组）百分位值；
+                     “未知”行业始终使用全市场百分位值
+
+    Returns:
+    DataFrame: 添加了 行业、各周期百分位值 和 动量分数 列
+    """
+    periods = periods or [name for name, _ in PERIODS]
+    frame = attach_industry(frame, industry_map)
+    by_keys = [by] if isinstance(by, str) else list(by or [])
+    keys = by_keys + ['行业']
+
+    # 一次分组排名得到所有周期的行业内百分位；rank(method='max', pct=True) 等价于 (valid <= x).mean()
+    grouped = frame.groupby(keys)[periods]
+    sector_ranks = grouped.rank(method='max', pct=True) * 100
+    global_ranks = (frame.groupby(by_keys)[periods] if by_keys else frame[periods]).rank(method='max', pct=True) * 100
+
+    # 小行业和未知行业按周期回退到全市场百分位
+    fallback = (grouped.transform('count') < min_sector_size).to_numpy() | \
+               (frame['行业'] == UNKNOWN_INDUSTRY).to_numpy()[:, None]
+    percentile_cols = [f'{period}百分位值' for period in periods]
+    frame[percentile_cols] = sector_ranks.where(~fallback, global_ranks).to_numpy()
+    frame['动量分数'] = frame[percentile_cols].mean(axis=1)
+    return frame
+
+
+def select_with_sector_cap(scores, top_n=30, max_per_sector=None, by=None):
+    """
+    按动量分数选股，每个行业最多入选 max_per_sector 只
+
+    Parameters:
+    scores: DataFrame, 含 动量分数 和 行业 列
+    by: str, 长表时的分组列（如 '日期'），每组各选 top_n 只
+
+    Returns:
+    DataFrame: 入选股票，按动量分数降序
+    """
+    ranked = scores.dropna(subset=['动量分数']).sort_values('动量分数', ascending=False, kind='mergesort')
+    keys = [by] if by else []
+    if max_per_sector is not None:
+        ranked = ranked[ranked.groupby(keys + ['行业']).cumcount() < max_per_sector]
+    if by:
+        return ranked[ranked.groupby(by).cumcount() < top_n]
+    return ranked.head(top_n)
+
+
+def sector_concentration(selected):
+    """入选股票的行业分布"""
+    return selected['行业'].value_counts().rename('入选数量')
+
+
+def main():
+    """主函数"""
+    print("行业中性动量评分")
+    print("=" * 50)
+
+    scores = pd.read_csv('../data/momentum_scores.csv', dtype={'股票代码': str})
+    scores['股票代码'] = scores['股票代码'].str.zfill(6)
+    periods = [name for name, _ in PERIODS]
+    scores = scores[['股票代码', '股票名称'] + periods]
+
+    if os.path.exists(INDUSTRY_FILE):
+        industry_map = load_industry_map(INDUSTRY_FILE)
+    else:
+        industry_map = fetch_industry_map(scores['股票代码'])
+    print(f"行业映射共 {len(industry_map)} 只股票，{industry_map.nunique()} 个行业")
+
+    global_scores = attach_industry(scores, industry_map)
+    global_pct = global_scores[periods].rank(method='max', pct=True) * 100
+    global_scores['动量分数'] = global_pct.mean(axis=1)
+    global_top = select_with_sector_cap(global_scores, top_n=30)
+
+    neutral_scores = sector_neutral_scores(scores, industry_map)
+    neutral_top = select_with_sector_cap(neutral_scores, top_n=30, max_per_sector=3)
+
+    print("\n全市场排名前30的行业分布:")
+    print(sector_concentration(global_top).head(10).to_string())
+    print("\n行业中性（每行业最多3只）前30的行业分布:")
+    print(sector_concentration(neutral_top).head(10).to_string())
+
+    print("\n行业中性动量分数前30名:")
+    print(neutral_top[['股票代码', '股票名称', '行业', '动量分数']].to_string(
+        index=False, float_format=lambda v: f'{v:.2f}'))
+
+    output_file = '../data/momentum_scores_neutral.csv'
+    neutral_scores.sort_values('动量分数', ascending=False).to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"\n结果已保存到: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+动量策略显著性检验
+功能：
+1. 分块自助法（block bootstrap）：对策略相对基准的月度超额收益重采样，
+   给出超额收益、信息比率的置信区间和p值
+2. 随机组合蒙特卡洛：每个月从同一股票池中随机抽取30只股票等权持有（如10万次），
+   比较策略的累计收益和夏普比率在随机组合分布中的位置
+3. 所有重采样以NumPy批量数组生成和计算，10万次模拟只需数秒
+"""
+
+import sys
+
+import pandas as pd
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+from date_utils import parse_dates
+from universes import get_universe, universe_files
+
+MONTHS_PER_YEAR = 12
+
+
+def sharpe_ratio(returns, axis=-1):
+    """年化夏普比率（无风险收益率按0计算），returns为月度收益率（小数）"""
+    mean = np.mean(returns, axis=axis)
+    std = np.std(returns, axis=axis, ddof=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return mean / std * np.sqrt(MONTHS_PER_YEAR)
+
+
+def monthly_universe_returns(df, start_dates, end_dates):
+    """
+    计算股票池中每只股票在每个持有期的收益率
+
+    Parameters:
+    df: DataFrame, 长格式历史数据（日期、股票代码、收盘）
+    start_dates, end_dates: 每个持有期的起止交易日
+
+    Returns:
+    DataFrame: 持有期 × 股票代码 的收益率矩阵（小数），起点无数据的为NaN
+    """
+    close = df.pivot_table(index='日期', columns='股票代码', values='收盘').sort_index().ffill()
+    start_pos = close.index.searchsorted(pd.DatetimeIndex(start_dates), side='right') - 1
+    end_pos = close.index.searchsorted(pd.DatetimeIndex(end_dates), side='right') - 1
+    values = close.to_numpy()
+    returns = values[end_pos] / values[start_pos] - 1
+    return pd.DataFrame(returns, index=pd.DatetimeIndex(start_dates), columns=close.columns)
+
+
+def block_bootstrap(excess, n_boot=100000, block_size=3, confidence=0.95, seed=0):
+    """
+    循环分块自助法检验月度超额收益
+
+    Parameters:
+    excess: array-like, 月度超额收益率（小数）
+    n_boot: int, 重采样次数
+    block_size: int, 块长度（保留收益率的短期自相关）
+    confidence: float, 置信水平
+
+    Returns:
+    dict: 观测值、置信区间、单侧p值（H0: 平均超额收益 <= 0）
+    """
+    rng = np.random.default_rng(seed)
+    excess = np.asarray(excess, dtype=float)
+    n = len(excess)
+    n_blocks = int(np.ceil(n / block_size))
+
+    # (n_boot, n_blocks) 个随机起点，展开为 (n_boot, n) 的循环索引
+    starts = rng.integers(0, n, size=(n_boot, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)[None, None, :]).reshape(n_boot, -1)[:, :n] % n
+    samples = excess[idx]
+
+    boot_mean = samples.mean(axis=1)
+    boot_cum = np.prod(1 + samples, axis=1) - 1
+    boot_ir = sharpe_ratio(samples, axis=1)
+
+    alpha = (1 - confidence) / 2
+    observed_mean = excess.mean()
+    # 在原假设下把分布平移到均值为0，计算观测值落在右尾的概率
+    p_value = (np.sum(boot_mean - observed_mean >= observed_mean) + 1) / (n_boot + 1)
+
+    return {
+        '平均月超额收益': observed_mean,
+        '平均月超额收益_CI': tuple(np.quantile(boot_mean, [alpha, 1 - alpha])),
+        '累计超额收益': np.prod(1 + excess) - 1,
+        '累计超额收益_CI': tuple(np.quantile(boot_cum, [alpha, 1 - alpha])),
+        '信息比率': sharpe_ratio(excess),
+        '信息比率_CI': tuple(np.nanquantile(boot_ir, [alpha, 1 - alpha])),
+        'p值': p_value,
+    }
+
+
+def random_portfolio_test(universe_returns, strategy_returns, n_sims=100000, n_stocks=30,
+                          chunk_size=2000, seed=0):
+    """
+    随机组合蒙特卡洛检验
+
+    Parameters:
+    universe_returns: DataFrame or ndarray, 持有期 × 股票 的收益率矩阵（NaN 表示不可选）
+    strategy_returns: array-like, 策略每个持有期的收益率（小数）
+    n_sims: int, 模拟次数
+    n_stocks: int, 每个随机组合的股票数
+    chunk_size: int, 每批模拟次数（控制内存占用）
+
+    Returns:
+    dict: 策略与随机组合分布的比较结果，以及随机组合的累计收益数组
+    """
+    rng = np.random.default_rng(seed)
+    universe = np.asarray(universe_returns, dtype=float)
+    n_periods, n_universe = universe.shape
+    valid = ~np.isnan(universe)
+    filled = np.where(valid, universe, 0.0)
+    strategy_returns = np.asarray(strategy_returns, dtype=float)
+    # 股票池不足 n_stocks 只时抽取全部股票
+    n_pick = min(n_stocks, n_universe)
+
+    sim_returns = np.empty((n_sims, n_periods))
+    for start in range(0, n_sims, chunk_size):
+        size = min(chunk_size, n_sims - start)
+        # 随机键 + argpartition 得到不放回抽样；不可选股票的键设为无穷大，排在最后
+        keys = rng.random((size, n_periods, n_universe), dtype=np.float32)
+        keys[:, ~valid] = np.inf
+        picks = np.argpartition(keys, n_pick - 1, axis=2)[:, :, :n_pick]
+        period_idx = np.arange(n_periods)[None, :, None]
+        chosen = filled[period_idx, picks]
+        counts = valid[period_idx, picks].sum(axis=2)
+        sim_returns[start:start + size] = chosen.sum(axis=2) / np.maximum(counts, 1)
+
+    sim_cum = np.prod(1 + sim_returns, axis=1) - 1
+    sim_sharpe = sharpe_ratio(sim_returns, axis=1)
+    strategy_cum = np.prod(1 + strategy_returns) - 1
+    strategy_sharpe = sharpe_ratio(strategy_returns)
+
+    return {
+        '策略累计收益': strategy_cum,
+        '随机组合累计收益_中位数': np.median(sim_cum),
+        '随机组合累计收益_95%分位': np.quantile(sim_cum, 0.95),
+        '累计收益p值': (np.sum(sim_cum >= strategy_cum) + 1) / (n_sims + 1),
+        '策略夏普比率': strategy_sharpe,
+        '随机组合夏普比率_中位数': np.nanmedian(sim_sharpe),
+        '夏普比率p值': (np.sum(sim_sharpe >= strategy_sharpe) + 1) / (n_sims + 1),
+        'simulated_cumulative': sim_cum,
+    }
+
+
+def load_benchmark_returns(start_dates, end_dates, data_source=None, universe='hs300'):
+    """获取股票池基准ETF（沪深300为510300）每个持有期的收益率，失败时返回None"""
+    import asyncio
+    try:
+        if data_source is None:
+            from data_sources import AkshareDataSource
+            data_source = AkshareDataSource()
+        start = pd.Timestamp(min(start_dates)).strftime('%Y%m%d')
+        end = pd.Timestamp(max(end_dates)).strftime('%Y%m%d')
+        etf = asyncio.run(data_source.get_etf_bars(get_universe(universe)['etf'], start, end))
+        etf['日期'] = parse_dates(etf['日期'])
+        close = etf.set_index('日期')['收盘'].sort_index()
+        start_pos = close.index.searchsorted(pd.DatetimeIndex(start_dates), side='left')
+        end_pos = close.index.searchsorted(pd.DatetimeIndex(end_dates), side='right') - 1
+        return close.to_numpy()[end_pos] / close.to_numpy()[start_pos] - 1
+    except Exception as e:
+        print(f"获取ETF数据失败: {e}")
+        return None
+
+
+def main(universe='hs300', results_file='momentum_backtest_results.csv'):
+    """
+    主函数
+
+    Parameters:
+    universe: str, 股票池：hs300 / csi500 / csi1000 / all，决定股票池数据和基准ETF
+    results_file: str, momentum_backtest.py 输出的月度收益率汇总（写在其运行目录）
+    """
+    print(f"动量策略显著性检验（{get_universe(universe)['名称']}）")
+    print("=" * 50)
+
+    results = pd.read_csv(results_file, parse_dates=['date'])
+    df = pd.read_csv(universe_files(universe)['data'], usecols=['日期', '股票代码', '收盘'],
+                     dtype={'股票代码': str})
+    df['股票代码'] = df['股票代码'].str.zfill(6)
+    df['日期'] = parse_dates(df['日期'])
+
+    # 每个持有期：月初第一个交易日到该月最后一个交易日
+    start_dates = results['date']
+    month_ends = start_dates + pd.offsets.MonthEnd(0)
+    trading_days = pd.DatetimeIndex(np.sort(df['日期'].unique()))
+    end_dates = trading_days[trading_days.searchsorted(month_ends, side='right') - 1]
+
+    strategy = results['portfolio_return'].to_numpy() / 100
+    universe_returns = monthly_universe_returns(df, start_dates, end_dates)
+
+    benchmark = load_benchmark_returns(start_dates, end_dates, universe=universe)
+    if benchmark is None:
+        print("使用股票池等权平均收益作为基准")
+        benchmark = np.nanmean(universe_returns.to_numpy(), axis=1)
+
+    print(f"\n持有期数量: {len(strategy)}，股票池规模: {universe_returns.shape[1]}")
+
+    print("\n[1] 分块自助法检验（超额收益 = 策略 - 基准）")
+    boot = block_bootstrap(strategy - benchmark, n_boot=100000)
+    for key, value in boot.items():
+        if isinstance(value, tuple):
+            print(f"  {key}: [{value[0] * 100 if '比率' not in key else value[0]:.2f}, "
+                  f"{value[1] * 100 if '比率' not in key else value[1]:.2f}]")
+        elif key in ('p值', '信息比率'):
+            print(f"  {key}: {value:.4f}")
+        else:
+            print(f"  {key}: {value * 100:.2f}%")
+
+    print("\n[2] 随机组合蒙特卡洛检验（100,000个随机30只股票等权组合）")
+    mc = random_portfolio_test(universe_returns, strategy, n_sims=100000, n_stocks=30)
+    for key, value in mc.items():
+        if key == 'simulated_cumulative':
+            continue
+        if '收益' in key and 'p值' not in key:
+            print(f"  {key}: {value * 100:.2f}%")
+        else:
+            print(f"  {key}: {value:.4f}")
+
+    summary = {k: v for k, v in {**boot, **mc}.items() if k != 'simulated_cumulative'}
+    summary = {k: (f"[{v[0]:.6f}, {v[1]:.6f}]" if isinstance(v, tuple) else v) for k, v in summary.items()}
+    output_file = '../data/significance_results.csv'
+    pd.Series(summary, name='值').to_csv(output_file, encoding='utf-8-sig', header=True)
+    print(f"\n检验结果已保存到 {output_file}")
+
+
+if __name__ == "__main__":
+    # python significance.py [hs300|csi500|csi1000|all]
+    main(sys.argv[1] if len(sys.argv) > 1 else 'hs300')
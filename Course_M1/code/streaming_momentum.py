@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+盘中实时动量评分（流式模式）
+功能：
+1. 在内存中保存每只股票回看所需的历史收盘价，交易时段内只需要最新价格
+2. 每到达一笔行情，增量更新该股票的1/3/6/12个月收益率及各周期的有序收益率结构
+3. 实时维护动量分数的有序排名：每笔行情只重算百分位可能变化的股票（收益率落在该股票新旧收益率之间的股票），
+   输出前30名的变化（新进、退出、名次变动）
+4. 行情源可插拔：本地回放文件用于测试，akshare实时行情用于盘中
+
+有序收益率和排名使用 sortedcontainers 的有序列表，插入、删除、按值定位均为 O(log n)
+（需要 pip install sortedcontainers）。
+"""
+
+import pandas as pd
+import numpy as np
+import time
+import os
+from math import isnan
+from datetime import timedelta
+import warnings
+warnings.filterwarnings('ignore')
+
+from sortedcontainers import SortedKeyList, SortedList
+
+from date_utils import parse_dates
+# 动量周期定义（自然日回看，与 calculate_momentum_score.py 共用同一份）
+from lookback_index import CALENDAR_PERIODS as PERIODS
+
+
+class SortedValues:
+    """
+    有序收益率序列（附带股票代码），插入、删除和按值定位均为 O(log n)，用于计算横截面百分位
+
+    Parameters:
+    items: iterable of (收益率, 股票代码)
+    """
+
+    def __init__(self, items=()):
+        self.items = SortedKeyList(items, key=lambda item: item[0])
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, value, key):
+        self.items.add((value, key))
+
+    def remove(self, value, key):
+        self.items.discard((value, key))
+
+    def replace(self, old, new, key):
+        """用新值替换旧值（任一为NaN时视为不存在）"""
+        if pd.notna(old):
+            self.remove(old, key)
+        if pd.notna(new):
+            self.add(new, key)
+
+    def keys_between(self, low, high):
+        """收益率落在 [low, high) 内的股票代码"""
+        return [key for _, key in self.items.irange_key(low, high, inclusive=(True, False))]
+
+    def percentile(self, value):
+        """返回 value 的百分位值，定义与批量计算一致：(收益率 <= x) 的占比 * 100"""
+        if pd.isna(value) or len(self.items) == 0:
+            return np.nan
+        return self.items.bisect_key_right(value) / len(self.items) * 100
+
+
+class TickFeed:
+    """行情源基类，迭代返回 (时间, 股票代码, 最新价)"""
+
+    def __iter__(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(TickFeed):
+    """
+    本地回放行情源
+
+    Parameters:
+    file_path: str, 回放文件，包含 时间、股票代码、价格 三列
+    speed: float, 回放速度倍数；0 表示不等待，尽快回放
+    """
+
+    def __init__(self, file_path, speed=0):
+        self.file_path = file_path
+        self.speed = speed
+
+    def __iter__(self):
+        ticks = pd.read_csv(self.file_path, dtype={'股票代码': str})
+        ticks['股票代码'] = ticks['股票代码'].str.zfill(6)
+        ticks['时间'] = pd.to_datetime(ticks['时间'], format='%Y-%m-%d %H:%M:%S')
+        ticks = ticks.sort_values('时间', kind='stable')
+
+        previous = None
+        for ts, code, price in zip(ticks['时间'], ticks['股票代码'], ticks['价格']):
+            if self.speed and previous is not None:
+                wait = (ts - previous).total_seconds() / self.speed
+                if wait > 0:
+                    time.sleep(wait)
+            previous = ts
+            yield ts, code, float(price)
+
+
+class AkshareSpotFeed(TickFeed):
+    """
+    akshare实时行情源，按固定间隔轮询沪深A股最新价
+
+    Parameters:
+    codes: iterable, 关注的股票代码
+    interval: float, 轮询间隔（秒）
+    """
+
+    def __init__(self, codes, interval=3.0):
+        self.codes = set(codes)
+        self.interval = interval
+
+    def __iter__(self):
+        import akshare as ak
+
+        while True:
+            spot = ak.stock_zh_a_spot_em()
+            spot = spot[spot['代码'].isin(self.codes)].dropna(subset=['最新价'])
+            now = pd.Timestamp.now()
+            for code, price in zip(spot['代码'], spot['最新价']):
+                yield now, code, float(price)
+            time.sleep(self.interval)
+
+
+class StreamingMomentumScorer:
+    """
+    流式动量评分器
+
+    Parameters:
+    history: DataFrame, 沪深300成分股历史数据（日期、股票代码、股票名称、收盘）
+    top_n: int, 跟踪的排名数量
+    """
+
+    def __init__(self, history, top_n=30):
+        self.top_n = top_n
+        self.session_date = None
+
+        history = history.sort_values(['股票代码', '日期'])
+        self.names = history.groupby('股票代码')['股票名称'].first().to_dict()
+
+        # 每只股票的历史日期和收盘价，按日期升序保存为数组
+        self.closes = {
+            code: (group['日期'].to_numpy(), group['收盘'].to_numpy(dtype=float))
+            for code, group in history.groupby('股票代码')
+        }
+        self.codes = list(self.closes)
+        self.position = {code: i for i, code in enumerate(self.codes)}
+
+        self.reference = {}
+        self.last_price = {code: closes[-1] for code, (_, closes) in self.closes.items()}
+        self.returns = {}
+        self.sorted_returns = {}
+        # 排名结构：每只股票的各周期百分位值和动量分数，及按 (-动量分数, 股票序号) 排序的列表
+        self.percentiles = {}
+        self.score_of = {}
+        self.ranking = SortedList()
+        self.current_top = []
+
+    def start_session(self, session_date):
+        """开始一个交易日：确定各周期的基准收盘价，并初始化收益率和有序结构"""
+        session_date = pd.Timestamp(session_date).normalize()
+        self.session_date = session_date
+
+        for code, (dates, closes) in self.closes.items():
+            refs = []
+            for _, days in PERIODS:
+                # 基准价：目标日期当天或之前最近一个交易日的收盘价
+                target = np.datetime64(session_date - timedelta(days=days))
+                pos = np.searchsorted(dates, target, side='right') - 1
+                refs.append(closes[pos] if pos >= 0 else np.nan)
+            self.reference[code] = np.array(refs)
+            self.returns[code] = (self.last_price[code] / self.reference[code] - 1) * 100
+
+        for i, (period, _) in enumerate(PERIODS):
+            items = [(r[i], code) for code, r in self.returns.items() if pd.notna(r[i])]
+            self.sorted_returns[period] = SortedValues(items)
+
+        self._rebuild_ranking()
+        self.current_top = self.top()
+        print(f"交易日 {session_date.strftime('%Y-%m-%d')} 初始化完成，跟踪 {len(self.codes)} 只股票")
+
+    def _rank_key(self, code):
+        """排名结构中的键：分数高者在前，同分按股票序号（与稳定排序一致）"""
+        return (-self.score_of[code], self.position[code])
+
+    def _compute_score(self, code, periods=range(len(PERIODS))):
+        """
+        按当前有序结构重算一只股票指定周期的百分位值，并更新动量分数（无有效百分位时分数为 -inf）
+
+        Parameters:
+        periods: iterable, 需要重算的周期序号；其余周期沿用已保存的百分位值
+        """
+        returns = self.returns[code]
+        percentiles = self.percentiles.setdefault(code, [np.nan] * len(PERIODS))
+        for i in periods:
+            percentiles[i] = self.sorted_returns[PERIODS[i][0]].percentile(returns[i])
+        valid = [p for p in percentiles if not isnan(p)]
+        self.score_of[code] = sum(valid) / len(valid) if valid else -np.inf
+
+    def _rebuild_ranking(self):
+        """重算全部股票的分数和排名（开盘初始化，或某个周期的有效股票数变化时）"""
+        for code in self.codes:
+            self._compute_score(code)
+        self.ranking = SortedList(self._rank_key(code) for code in self.codes)
+
+    def _rescore(self, code, periods):
+        """重算一只股票的分数，并在排名结构中移动它的位置（O(log n)）"""
+        old_key = self._rank_key(code)
+        self._compute_score(code, periods)
+        new_key = self._rank_key(code)
+        if new_key != old_key:
+            self.ranking.remove(old_key)
+            self.ranking.add(new_key)
+
+    def update(self, code, price):
+        """
+        处理一笔行情：更新该股票的收益率和各周期有序结构，只重算百分位可能变化的股票
+
+        某周期收益率从 old 变为 new 时，只有收益率落在 [min(old, new), max(old, new)) 内的股票
+        的 (收益率 <= x) 计数变化；有效股票数变化（NaN 与非NaN之间切换）时全部重算。
+        """
+        if code not in self.reference:
+            return False
+
+        old_returns = self.returns[code]
+        new_returns = (price / self.reference[code] - 1) * 100
+        self.returns[code] = new_returns
+        self.last_price[code] = price
+
+        # 股票代码 -> 需要重算的周期序号；该股票自身的各周期都重算
+        affected = {code: set(range(len(PERIODS)))}
+        rebuild = False
+        for i, (period, _) in enumerate(PERIODS):
+            old, new = old_returns[i], new_returns[i]
+            self.sorted_returns[period].replace(old, new, code)
+            if isnan(old) != isnan(new):
+                rebuild = True
+            elif not isnan(old) and old != new:
+                for other in self.sorted_returns[period].keys_between(min(old, new), max(old, new)):
+                    affected.setdefault(other, set()).add(i)
+
+        if rebuild:
+            self._rebuild_ranking()
+        else:
+            for affected_code, periods in affected.items():
+                self._rescore(affected_code, periods)
+        return True
+
+    def score(self, code):
+        """单只股票的当前动量分数（各周期百分位值的平均值）"""
+        score = self.score_of[code]
+        return score if np.isfinite(score) else np.nan
+
+    def scores(self):
+        """全部股票的当前动量分数"""
+        matrix = np.array([self.returns[code] for code in self.codes])
+        percentiles = np.array([self.percentiles[code] for code in self.codes], dtype=float)
+
+        result_df = pd.DataFrame(matrix, columns=[p for p, _ in PERIODS])
+        result_df.insert(0, '股票代码', self.codes)
+        result_df.insert(1, '股票名称', [self.names[c] for c in self.codes])
+        percentile_cols = [f'{period}百分位值' for period, _ in PERIODS]
+        result_df[percentile_cols] = percentiles
+        result_df['动量分数'] = result_df[percentile_cols].mean(axis=1)
+        return result_df.sort_values('动量分数', ascending=False, kind='stable')
+
+    def top(self, n=None):
+        """当前动量分数排名前n的股票代码列表"""
+        n = n or self.top_n
+        return [self.codes[i] for _, i in self.ranking.islice(0, n)]
+
+    def diff_top(self):
+        """比较当前前N名与上一次输出，返回变化（无变化时返回None）"""
+        new_top = self.top()
+        if new_top == self.current_top:
+            return None
+
+        old_rank = {code: i for i, code in enumerate(self.current_top, 1)}
+        new_rank = {code: i for i, code in enumerate(new_top, 1)}
+        changes = {
+            '新进': [c for c in new_top if c not in old_rank],
+            '退出': [c for c in self.current_top if c not in new_rank],
+            '名次变动': [(c, old_rank[c], new_rank[c]) for c in new_top
+                      if c in old_rank and old_rank[c] != new_rank[c]],
+        }
+        self.current_top = new_top
+        return changes
+
+    def run(self, feed, on_change=None):
+        """
+        消费行情源
+
+        同一时间戳的行情视为一批，批内逐笔增量更新，批结束后从排名结构取前N名与上次输出比较。
+        """
+        if on_change is None:
+            on_change = self.print_changes
+
+        batch_time = None
+        for ts, code, price in feed:
+            if self.session_date is None or ts.normalize() != self.session_date:
+                self.start_session(ts)
+            if batch_time is not None and ts != batch_time:
+                changes = self.diff_top()
+                if changes:
+                    on_change(batch_time, changes)
+            batch_time = ts
+            self.update(code, price)
+
+        if batch_time is not None:
+            changes = self.diff_top()
+            if changes:
+                on_change(batch_time, changes)
+
+    def print_changes(self, ts, changes):
+        """打印前N名变化"""
+        print(f"\n[{ts.strftime('%H:%M:%S')}] 前{self.top_n}名发生变化:")
+        for code in changes['新进']:
+            print(f"  新进: {code} {self.names[code]}")
+        for code in changes['退出']:
+            print(f"  退出: {code} {self.names[code]}")
+        for code, old, new in changes['名次变动']:
+            print(f"  {code} {self.names[code]}: 第{old}名 -> 第{new}名")
+
+
+def build_replay_from_history(history, output_file, ticks_per_stock=8, seed=0):
+    """
+    用历史数据最后一个交易日的开高低收生成本地回放文件，便于离线测试
+
+    每只股票按 开盘 -> 最高/最低 -> 收盘 的路径插值出若干笔行情，
+    时间均匀分布在 09:30-15:00 的交易时段内。
+    """
+    rng = np.random.default_rng(seed)
+    last_date = history['日期'].max()
+    day = history[history['日期'] == last_date]
+    session_date = last_date + timedelta(days=1)
+
+    n = len(day)
+    # 每只股票的价格路径：开盘、随机先到最高或最低、收盘
+    high_first = rng.random(n) < 0.5
+    mid1 = np.where(high_first, day['最高'], day['最低'])
+    mid2 = np.where(high_first, day['最低'], day['最高'])
+    anchors = np.column_stack([day['开盘'], mid1, mid2, day['收盘']])
+    steps = np.linspace(0, anchors.shape[1] - 1, ticks_per_stock)
+    prices = np.array([np.interp(steps, np.arange(anchors.shape[1]), row) for row in anchors])
+
+    session_seconds = 4 * 3600
+    offsets = np.sort(rng.integers(0, session_seconds, size=(n, ticks_per_stock)), axis=1)
+    start = pd.Timestamp(session_date.strftime('%Y-%m-%d') + ' 09:30:00')
+    # 跳过午间休市 11:30-13:00
+    offsets = np.where(offsets >= 2 * 3600, offsets + 90 * 60, offsets)
+
+    replay = pd.DataFrame({
+        '时间': (start + pd.to_timedelta(offsets.ravel(), unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+        '股票代码': np.repeat(day['股票代码'].to_numpy(), ticks_per_stock),
+        '价格': prices.ravel().round(2),
+    }).sort_values('时间', kind='stable')
+
+    replay.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"回放文件已生成: {output_file}，共 {len(replay)} 笔行情")
+
+
+def main():
+    """主函数"""
+    print("盘中实时动量评分（回放模式）")
+    print("=" * 50)
+
+    data_file = '../data/hs300_stock_data.csv'
+    replay_file = '../data/hs300_replay_ticks.csv'
+
+    print("正在读取历史数据...")
+    history = pd.read_csv(data_file, usecols=['日期', '股票代码', '股票名称', '开盘', '收盘', '最高', '最低'],
+                          dtype={'股票代码': str})
+    history['股票代码'] = history['股票代码'].str.zfill(6)
+    history['日期'] = parse_dates(history['日期'])
+    print(f"成功读取数据，共 {len(history)} 条记录")
+
+    if not os.path.exists(replay_file):
+        build_replay_from_history(history, replay_file)
+
+    scorer = StreamingMomentumScorer(history, top_n=30)
+    scorer.run(ReplayFeed(replay_file))
+
+    print("\n收盘时动量分数排名前30的股票:")
+    print(scorer.scores().head(30)[['股票代码', '股票名称', '动量分数']].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
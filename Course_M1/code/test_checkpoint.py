@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+检查点恢复测试：空检查点、已完成检查点、中断后继续
+
+   python -m pytest -q test_checkpoint.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import BacktestCheckpoint
+from momentum_backtest import MomentumBacktest
+
+
+def make_prices(n_stocks=40, start='2023-06-01', end='2025-03-31', seed=0):
+    """合成长格式日线数据"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, end)
+    frames = []
+    for i in range(n_stocks):
+        close = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, len(dates))))
+        frames.append(pd.DataFrame({
+            '日期': dates.strftime('%Y-%m-%d'),
+            '股票代码': f'{i:06d}',
+            '股票名称': f'股票{i}',
+            '开盘': close, '收盘': close, '最高': close * 1.01, '最低': close * 0.99,
+            '成交量': 1e6, '成交额': close * 1e6,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_backtest(checkpoint_dir, months, resume=True):
+    backtest = MomentumBacktest(price_data=make_prices(), months=months, checkpoint_dir=str(checkpoint_dir))
+    backtest.run_backtest(resume=resume)
+    return backtest
+
+
+def test_empty_checkpoint_loads_as_none(tmp_path):
+    BacktestCheckpoint(str(tmp_path), 'abc').flush(complete=True)
+    assert BacktestCheckpoint(str(tmp_path), 'abc').load() is None
+
+
+def test_resume_from_empty_checkpoint(tmp_path):
+    # 所选月份没有数据：第一次运行写入 completed=0 的检查点，第二次运行不应报错
+    for _ in range(2):
+        backtest = run_backtest(tmp_path, [(2030, 1)])
+        assert backtest.portfolio_returns == []
+
+
+def test_resume_from_complete_checkpoint(tmp_path):
+    months = [(2025, 1), (2025, 2), (2025, 3)]
+    first = run_backtest(tmp_path, months)
+    assert len(first.portfolio_returns) == 3
+
+    second = run_backtest(tmp_path, months)
+    assert second.checkpoint.complete
+    assert [p['portfolio_return'] for p in second.checkpoint.periods] == \
+        [p['portfolio_return'] for p in first.portfolio_returns]
+
+
+def test_resume_after_interruption(tmp_path):
+    months = [(2025, 1), (2025, 2), (2025, 3)]
+    full = run_backtest(tmp_path / 'full', months)
+
+    # 只完成前两个月后中断，再用完整月份列表继续
+    partial = BacktestCheckpoint(str(tmp_path / 'partial'), None)
+    partial.fingerprint = full.checkpoint.fingerprint
+    for period, detail in zip(full.portfolio_returns[:2], full.portfolio_details[:2]):
+        partial.record(period, detail)
+    partial.flush()
+
+    resumed = run_backtest(tmp_path / 'partial', months)
+    assert resumed.checkpoint.parts == 2
+    assert [p['portfolio_return'] for p in resumed.portfolio_returns] == \
+        [p['portfolio_return'] for p in full.portfolio_returns]
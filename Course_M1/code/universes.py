@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+股票池（沪深300 / 中证500 / 中证1000 / 全部A股）
+功能：
+1. 每个股票池的指数代码、基准ETF和本地文件命名集中定义，同一套动量流水线可以在任意股票池上运行
+2. 所有股票池共用一个价格存储（../data/price_store），同一只股票只下载、保存一份行情
+3. 共享加载：价格面板只读取一次，再为每个股票池生成各自的 日期 × 股票 成分矩阵（MembershipMask），
+   股票池之间的差别只是一组布尔掩码，不需要为每个股票池复制行情数据
+"""
+
+import asyncio
+import os
+
+import pandas as pd
+
+from constituent_history import load_membership, MembershipMask
+
+DATA_DIR = '../data'
+PRICE_STORE_DIR = '../data/price_store'
+
+# index 为 None 表示不限指数，使用全部A股
+UNIVERSES = {
+    'hs300': {'名称': '沪深300', 'index': '000300', 'etf': '510300', 'label': 'CSI 300'},
+    'csi500': {'名称': '中证500', 'index': '000905', 'etf': '510500', 'label': 'CSI 500'},
+    'csi1000': {'名称': '中证1000', 'index': '000852', 'etf': '512100', 'label': 'CSI 1000'},
+    # 全市场没有规模和流动性足够的全指ETF，基准沿用沪深300ETF
+    'all': {'名称': '全部A股', 'index': None, 'etf': '510300', 'label': 'CSI 300'},
+}
+
+
+def get_universe(name):
+    """
+    股票池配置
+
+    Returns:
+    dict: 名称、index（指数代码）、etf（基准ETF代码）、label（图表中使用的英文名）
+    """
+    if name not in UNIVERSES:
+        raise ValueError(f"不支持的股票池: {name}，可选: {', '.join(UNIVERSES)}")
+    return UNIVERSES[name]
+
+
+def universe_files(name, data_dir=DATA_DIR):
+    """
+    股票池对应的本地文件路径
+
+    Returns:
+    dict: data（前复权日线CSV）、membership（成分股时点区间表）
+    """
+    get_universe(name)
+    return {
+        'data': os.path.join(data_dir, f'{name}_stock_data.csv'),
+        'membership': os.path.join(data_dir, f'{name}_membership.csv'),
+    }
+
+
+def get_universe_constituents(name, source=None):
+    """
+    获取股票池当前的成分股
+
+    Parameters:
+    name: str, 股票池名称（UNIVERSES 的键）
+    source: DataSource, 数据源，默认使用akshare
+
+    Returns:
+    DataFrame: 成分券代码、成分券名称；失败时返回None
+    """
+    universe = get_universe(name)
+    print(f"正在获取{universe['名称']}成分股...")
+    try:
+        if source is None:
+            from data_sources import AkshareDataSource
+            source = AkshareDataSource()
+        if universe['index'] is None:
+            cons = asyncio.run(source.get_stock_list())
+        else:
+            cons = asyncio.run(source.get_constituents(universe['index']))
+        cons['成分券代码'] = cons['成分券代码'].astype(str).str.zfill(6)
+        print(f"成功获取 {len(cons)} 只{universe['名称']}成分股")
+        return cons
+    except Exception as e:
+        print(f"获取{universe['名称']}成分股失败: {e}")
+        return None
+
+
+def get_inclusion_dates(name, source=None):
+    """
+    获取股票池当前成分股的纳入日期（用于首次建立成分股区间表）
+
+    Returns:
+    DataFrame: 成分券代码、纳入日期；全部A股或数据源不支持时返回None
+    """
+    universe = get_universe(name)
+    if universe['index'] is None:
+        return None
+    try:
+        if source is None:
+            from data_sources import AkshareDataSource
+            source = AkshareDataSource()
+        dates = asyncio.run(source.get_inclusion_dates(universe['index']))
+        dates['成分券代码'] = dates['成分券代码'].astype(str).str.zfill(6)
+        return dates
+    except Exception as e:
+        print(f"获取{universe['名称']}成分股纳入日期失败: {e}")
+        return None
+
+
+def membership_masks(dates, codes, names, data_dir=DATA_DIR):
+    """
+    在同一个价格面板上为多个股票池生成成分矩阵
+
+    Parameters:
+    dates: array-like, 面板的交易日
+    codes: array-like, 面板的股票代码
+    names: list, 股票池名称
+
+    Returns:
+    dict: 股票池名称 -> MembershipMask；全部A股或没有区间表的股票池为None（使用面板中的全部股票）
+    """
+    masks = {}
+    for name in names:
+        membership_file = universe_files(name, data_dir)['membership']
+        if get_universe(name)['index'] is None or not os.path.exists(membership_file):
+            masks[name] = None
+        else:
+            masks[name] = MembershipMask(load_membership(membership_file), dates, codes)
+    return masks
+
+
+def load_universe_panel(names, store_dir=PRICE_STORE_DIR, data_dir=DATA_DIR,
+                        start_date=None, end_date=None, adjust='qfq'):
+    """
+    共享加载：从公共价格存储中一次读取所有股票池涉及的股票，并生成各股票池的成分矩阵
+
+    Parameters:
+    names: list, 股票池名称
+    store_dir: str, 价格存储目录
+    start_date, end_date: 日期范围
+    adjust: str, 复权方式
+
+    Returns:
+    tuple: (长格式日线 DataFrame, {股票池名称: MembershipMask 或 None})
+    """
+    from price_store import PriceStore
+
+    # 任一股票池为全部A股时读取全部股票，否则只读取各区间表中出现过的股票
+    codes = None
+    if all(get_universe(name)['index'] is not None for name in names):
+        frames = [load_membership(universe_files(name, data_dir)['membership'])['股票代码']
+                  for name in names if os.path.exists(universe_files(name, data_dir)['membership'])]
+        if len(frames) == len(names):
+            codes = pd.unique(pd.concat(frames, ignore_index=True))
+
+    df = PriceStore(store_dir).load(adjust, codes=codes, start_date=start_date, end_date=end_date)
+    masks = membership_masks(df['日期'].unique(), df['股票代码'].unique(), names, data_dir)
+    return df, masks